@@ -1,111 +1,226 @@
 """
 YolPedia.eu Güvenli Veri Çekici
-Strateji: Düşük Hız, Yüksek Kamuflaj (Anti-Ban)
+Strateji: Sınırlı eşzamanlılık, token bucket hız sınırı, jitter'lı geri çekilme (Anti-Ban)
 """
 
 import requests
+import base64
 import json
+import os
 import time
-import random
+import threading
 import urllib3
-from github import Github
+from concurrent.futures import ThreadPoolExecutor
+from github import Github, GithubException, InputGitTreeElement
 import re
 
+import dataset
+import metrics
+from ratelimit import TokenBucket, backoff_delay, parse_retry_after
+
 # SSL Uyarılarını Gizle
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Delta senkron durumu: son `modified`, id -> link eşlemesi, istek URL'sine bağlı ETag / Last-Modified
+SYNC_STATE_FILE = "yolpedia_sync_state.json"
+
+class CrawlError(Exception):
+    """Bir sayfa, deneme bütçesi tükenene kadar alınamadı"""
+
 class YolPediaAPI:
-    def __init__(self):
-        self.base_url = "https://yolpedia.eu/wp-json/wp/v2"
-        self.session = requests.Session()
-        
-        # == TAM KAMUFLAJ HEADERS ==
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Language': 'tr-TR,tr;q=0.9,en-US;q=0.8,en;q=0.7',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Sec-Fetch-User': '?1',
-            'Pragma': 'no-cache',
-            'Cache-Control': 'no-cache'
-        })
+    # == TAM KAMUFLAJ HEADERS ==
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+        'Accept-Language': 'tr-TR,tr;q=0.9,en-US;q=0.8,en;q=0.7',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+        'Sec-Fetch-Dest': 'document',
+        'Sec-Fetch-Mode': 'navigate',
+        'Sec-Fetch-Site': 'none',
+        'Sec-Fetch-User': '?1',
+        'Pragma': 'no-cache',
+        'Cache-Control': 'no-cache'
+    }
     
-    def get_all_posts_formatted(self, max_posts=3000):
-        all_posts = []
-        page = 1
+    RETRY_STATUS = {403, 429, 500, 502, 503, 504}
+    
+    # Sadece veri setinde tutulan alanlar istenir (_embed ve diğer ağır alanlar gelmez)
+    FIELDS = 'id,title,link,content,date,modified'
+    
+    def __init__(self, base_url="https://yolpedia.eu/wp-json/wp/v2", per_page=50,
+                 max_workers=3, rate=1.0, burst=3, max_retries=5, max_backoff=60.0, verify=False):
+        self.base_url = base_url
+        self.per_page = per_page            # WordPress en fazla 100 kabul eder
+        self.max_workers = max_workers      # Aynı anda en fazla bu kadar istek
+        self.bucket = TokenBucket(rate, burst)  # Saniyede `rate` istek, `burst` kadar ani yüklenme
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.verify = verify
+        self._local = threading.local()
+    
+    @property
+    def session(self) -> requests.Session:
+        """İş parçacığı başına bir oturum (requests.Session thread-safe değildir)"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.HEADERS)
+            self._local.session = session
+        return session
+    
+    def fetch_page(self, page, params=None, headers=None):
+        """Tek bir sayfayı hız sınırı ve yeniden deneme bütçesiyle çek: (posts, headers)
         
-        # STRATEJİ: Az iste, sıkıntı çıkmasın.
-        per_page = 20 
+        Koşullu istekte (ETag / If-Modified-Since) 304 gelirse posts None döner.
+        """
+        endpoint = f"{self.base_url}/posts"
+        query = self.page_query(page, params)
         
-        print("📡 YolPedia'ya 'insan gibi' bağlanılıyor...")
-        
-        while len(all_posts) < max_posts:
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                with metrics.REGISTRY.span('crawl_request'):
+                    response = self.session.get(endpoint, params=query, headers=headers,
+                                                timeout=30, verify=self.verify)
+            except requests.RequestException as e:
+                metrics.REGISTRY.error('crawl', e)
+                delay = backoff_delay(attempt, cap=self.max_backoff)
+                print(f"⚠️ Sayfa {page} bağlantı hatası ({e}). {delay:.1f} sn sonra tekrar...")
+                time.sleep(delay)
+                continue
+            
+            metrics.REGISTRY.increment('crawl_responses_total', status=response.status_code)
+            if response.status_code == 304:
+                return None, response.headers
+            
+            # Sayfa sınırı aşıldı: WordPress 400 + rest_post_invalid_page_number döner
+            if response.status_code == 400 and 'invalid_page_number' in response.text:
+                return [], response.headers
+            
+            # == HATA YÖNETİMİ ==
+            if response.status_code in self.RETRY_STATUS:
+                delay = parse_retry_after(response.headers.get('Retry-After'))
+                if delay is None:
+                    delay = backoff_delay(attempt, cap=self.max_backoff)
+                delay = min(delay, self.max_backoff)
+                print(f"⚠️ Engel (Kod: {response.status_code}, sayfa {page}). {delay:.1f} sn soğutma molası...")
+                time.sleep(delay)
+                continue
+            
+            if response.status_code != 200:
+                raise CrawlError(f"Sayfa {page}: HTTP {response.status_code}")
+            
             try:
-                endpoint = f"{self.base_url}/posts"
-                params = {
-                    'per_page': per_page,
-                    'page': page,
-                    '_embed': 1 # Resim ve yazar bilgisi için
-                }
-                
-                # İsteği Gönder
-                response = self.session.get(endpoint, params=params, timeout=30, verify=False)
-                
-                # == HATA YÖNETİMİ ==
-                if response.status_code == 403 or response.status_code == 429:
-                    print(f"⚠️ Engel (Kod: {response.status_code}). 10 saniye soğutma molası...")
-                    time.sleep(10) # 10 saniye bekle
-                    # Aynı sayfayı tekrar denemek için continue demiyoruz, 
-                    # bu seferlik pas geçip şansımızı sonraki denemede zorlamayalım diye break de demiyoruz.
-                    # Aslında en güvenlisi burada durmaktır ama biz inatçıyız:
-                    # Session'ı yenileyip tekrar deneyelim:
-                    self.session = requests.Session()
-                    self.session.headers.update({'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)...'}) # User Agent değiştir
-                    continue
-
-                if response.status_code != 200:
-                    print(f"⚠️ Hata: {response.status_code}")
-                    break
-                
                 posts = response.json()
-                
-                # Liste boşsa veya hata mesajı döndüyse (bazen WP hata mesajını JSON döner)
-                if not posts or isinstance(posts, dict): 
-                    print("✅ Veri bitti veya sayfa sonu.")
-                    break
-                
-                # Verileri İşle
-                for post in posts:
-                    try:
-                        raw_content = post.get('content', {}).get('rendered', '')
-                        # HTML Temizliği
-                        clean_content = re.sub('<[^<]+?>', '', raw_content)
-                        clean_content = re.sub(r'\s+', ' ', clean_content).strip()
-                        
-                        all_posts.append({
-                            'baslik': post.get('title', {}).get('rendered', ''),
-                            'link': post.get('link', ''),
-                            'icerik': clean_content[:8000],
-                            'tarih': post.get('date', '')
-                        })
-                    except: continue
-
-                print(f"  ✅ Sayfa {page} (20 Kayıt) alındı. Toplam: {len(all_posts)}")
-                page += 1
-                
-                # == BEKLEME SÜRESİ ==
-                # Her istekten sonra rastgele 1-3 saniye bekle
-                time.sleep(random.uniform(1.0, 3.0))
-                
-            except Exception as e:
-                print(f"❌ Kritik Hata: {e}")
-                time.sleep(5)
-                break
+            except ValueError as e:
+                # 200 ama JSON değil: Cloudflare/WAF doğrulama sayfası, engel gibi beklenir
+                metrics.REGISTRY.error('crawl', e)
+                delay = backoff_delay(attempt, cap=self.max_backoff)
+                print(f"⚠️ Sayfa {page} JSON değil (doğrulama sayfası?). {delay:.1f} sn sonra tekrar...")
+                time.sleep(delay)
+                continue
+            # Bazen WP hata mesajını JSON nesnesi olarak döner
+            if not isinstance(posts, list):
+                return [], response.headers
+            return posts, response.headers
+        
+        raise CrawlError(f"Sayfa {page}: {self.max_retries} denemede alınamadı")
+    
+    def page_query(self, page, params=None):
+        query = {'per_page': self.per_page, 'page': page}
+        query.update(params or {})
+        return query
+    
+    def request_url(self, params=None):
+        """İlk sayfa isteğinin tam URL'si: doğrulayıcılar (ETag / Last-Modified) sadece bu kaynağa aittir"""
+        return requests.Request('GET', f"{self.base_url}/posts", params=self.page_query(1, params)).prepare().url
+    
+    def crawl(self, max_posts=3000, params=None, headers=None):
+        """Tüm sayfaları sınırlı eşzamanlılıkla çek: (ham yazılar, ilk sayfa başlıkları)
+        
+        İlk sayfa 304 dönerse (hiçbir şey değişmemiş) ham yazılar None olur.
+        """
+        with metrics.REGISTRY.span('crawl') as span:
+            raw_posts, first_headers = self.crawl_pages(max_posts, params, headers)
+            if raw_posts is None:
+                span.status = 'not_modified'
+        
+        # Tarama özeti: toplam süre ve (süreç boyunca) başarılı istek süresi yüzdelikleri
+        for row in metrics.REGISTRY.summary():
+            if row['metric'] == 'crawl_request_seconds' and row['labels'] == 'status=ok':
+                print(f"  ⏱️ Tarama {span.elapsed:.1f} sn. İstek süresi ({row['count']} istek): "
+                      f"p50 {row['p50']:.2f} sn, p95 {row['p95']:.2f} sn, p99 {row['p99']:.2f} sn")
+        return raw_posts, first_headers
+    
+    def crawl_pages(self, max_posts, params, headers):
+        """crawl'ın ölçümsüz gövdesi"""
+        params = params or {}
+        per_page = int(params.get('per_page', self.per_page))
+        
+        # İlk sayfa toplam sayfa sayısını verir (X-WP-Total / X-WP-TotalPages)
+        first_posts, first_headers = self.fetch_page(1, params, headers)
+        if first_posts is None:
+            return None, first_headers
+        
+        total_pages = int(first_headers.get('X-WP-TotalPages', 1) or 1)
+        total_posts = first_headers.get('X-WP-Total', '?')
+        pages = min(total_pages, -(-max_posts // per_page))
+        print(f"  📚 {total_posts} yazı / {total_pages} sayfa. {pages} sayfa çekilecek.")
+        
+        raw_posts = list(first_posts)
+        # Sınırlı eşzamanlılık: sayfalar sırasıyla birleştirilir
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            fetch = lambda page: self.fetch_page(page, params)
+            for page, (posts, _) in enumerate(executor.map(fetch, range(2, pages + 1)), 2):
+                raw_posts.extend(posts or [])
+                print(f"  ✅ Sayfa {page} ({len(posts or [])} Kayıt) alındı.")
+        
+        return raw_posts[:max_posts], first_headers
+    
+    @staticmethod
+    def format_post(post):
+        """WP yazısını veri seti kaydına çevir"""
+        raw_content = post.get('content', {}).get('rendered', '')
+        # HTML Temizliği
+        clean_content = re.sub('<[^<]+?>', '', raw_content)
+        clean_content = re.sub(r'\s+', ' ', clean_content).strip()
+        
+        return {
+            'baslik': post.get('title', {}).get('rendered', ''),
+            'link': post.get('link', ''),
+            'icerik': clean_content[:8000],
+            'tarih': post.get('date', '')
+        }
+    
+    def format_posts(self, raw_posts):
+        """Ham yazıları kayıtlara çevir, link ile tekilleştir"""
+        records = []
+        seen_links = set()
+        for post in raw_posts:
+            try:
+                record = self.format_post(post)
+            except Exception:
+                continue
+            # Tarama sırasında yeni yazı eklenirse sayfalar kayabilir
+            if record['link'] in seen_links:
+                continue
+            seen_links.add(record['link'])
+            records.append(record)
+        return records
+    
+    def get_all_posts_formatted(self, max_posts=3000):
+        print("📡 YolPedia'ya 'insan gibi' bağlanılıyor...")
+        
+        try:
+            raw_posts, _ = self.crawl(max_posts, {'_fields': self.FIELDS})
+        except CrawlError as e:
+            print(f"❌ Kritik Hata: {e}")
+            return []
+        
+        all_posts = self.format_posts(raw_posts or [])
+        print(f"  ✅ Toplam: {len(all_posts)}")
         
         # GÜVENLİK: Eğer veri çekilemediyse boş dön ki eskisi silinmesin
         if len(all_posts) < 50: 
@@ -113,9 +228,131 @@ class YolPediaAPI:
             return []
             
         return all_posts
+    
+    # ===================== DELTA SYNC =====================
+    
+    @staticmethod
+    def load_sync_state(state_file):
+        try:
+            with open(state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+    
+    @staticmethod
+    def save_sync_state(state, state_file):
+        tmp_file = f"{state_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_file, state_file)
+    
+    @staticmethod
+    def update_state(state, raw_posts, headers, url):
+        """Son senkronun en büyük `modified` değerini, id->link eşlemesini ve `url`nin doğrulayıcılarını kaydet
+        
+        Dönüş: linki (slug'ı) değişen yazıların eski linkleri
+        """
+        ids = state.setdefault('ids', {})
+        moved = []
+        for post in raw_posts:
+            if 'id' in post and post.get('link'):
+                post_id = str(post['id'])
+                if ids.get(post_id) not in (None, post['link']):
+                    moved.append(ids[post_id])
+                ids[post_id] = post['link']
+            modified = post.get('modified', '')
+            if modified > state.get('last_modified', ''):
+                state['last_modified'] = modified
+        # ETag başka bir URL'yi (farklı modified_after) doğrulamaz: yanlış 304 yeni yazıları atlatır
+        state.pop('etag', None)
+        state.pop('last_modified_header', None)
+        state['validators'] = {'url': url, 'etag': headers.get('ETag'), 'last_modified': headers.get('Last-Modified')}
+        return moved
+    
+    def fetch_live_ids(self):
+        """Silinenleri bulmak için ucuz id taraması (_fields=id, sayfa başı 100)"""
+        raw_ids, _ = self.crawl(max_posts=10 ** 6, params={'_fields': 'id', 'per_page': 100})
+        return {str(post['id']) for post in raw_ids or [] if 'id' in post}
+    
+    def sync_posts(self, existing_data, state_file=SYNC_STATE_FILE, max_posts=3000):
+        """Sadece değişen yazıları çekip mevcut veri setine link ile birleştir
+        
+        Durum dosyası yoksa (ilk çalışma) tam tarama yapılır.
+        Dönüş: (birleşmiş veri, {'changed': n, 'deleted': n}) veya hata durumunda ([], {})
+        """
+        state = self.load_sync_state(state_file)
+        
+        if not existing_data or not state.get('last_modified'):
+            print("📡 Senkron durumu yok, tam tarama yapılıyor...")
+            state = {}
+            params = {'_fields': self.FIELDS}
+            try:
+                raw_posts, headers = self.crawl(max_posts, params)
+            except CrawlError as e:
+                print(f"❌ Kritik Hata: {e}")
+                return [], {}
+            records = self.format_posts(raw_posts or [])
+            if len(records) < 50:
+                print(f"⚠️ Yetersiz veri ({len(records)}). İşlem iptal.")
+                return [], {}
+            self.update_state(state, raw_posts, headers, self.request_url(params))
+            self.save_sync_state(state, state_file)
+            return records, {'changed': len(records), 'deleted': 0}
+        
+        print(f"📡 {state['last_modified']} sonrası değişen yazılar çekiliyor...")
+        params = {
+            '_fields': self.FIELDS,
+            'modified_after': state['last_modified'],
+            'orderby': 'modified',
+            'order': 'asc',
+        }
+        # Koşullu istek sadece aynı URL için (son senkrondan beri değişiklik yoksa modified_after aynı kalır)
+        url = self.request_url(params)
+        validators = state.get('validators') or {}
+        conditional = {}
+        if validators.get('url') == url:
+            if validators.get('etag'):
+                conditional['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                conditional['If-Modified-Since'] = validators['last_modified']
+        
+        try:
+            raw_posts, headers = self.crawl(max_posts, params, conditional)
+        except CrawlError as e:
+            print(f"❌ Kritik Hata: {e}")
+            return [], {}
+        
+        by_link = {record['link']: record for record in existing_data}
+        if raw_posts is None:
+            print("  ✅ 304: Değişiklik yok.")
+        else:
+            # Kimlik yazı id'sidir: linki değişen yazının eski linkteki kaydı kalmamalı
+            for old_link in self.update_state(state, raw_posts, headers, url):
+                by_link.pop(old_link, None)
+        changed = self.format_posts(raw_posts or [])
+        for record in changed:
+            by_link[record['link']] = record
+        
+        # Silinen yazılar: bilinen id'lerden sitede artık olmayanlar
+        deleted = 0
+        try:
+            live_ids = self.fetch_live_ids()
+        except CrawlError as e:
+            print(f"⚠️ Silinenler taraması yapılamadı: {e}")
+            live_ids = None
+        known_ids = state.get('ids', {})
+        # GÜVENLİK: Tarama yarım kaldıysa (bilinenlerin yarısından azı) silme yapılmaz
+        if live_ids and len(live_ids) >= len(known_ids) // 2:
+            for post_id in [i for i in known_ids if i not in live_ids]:
+                if by_link.pop(known_ids.pop(post_id), None) is not None:
+                    deleted += 1
+        
+        self.save_sync_state(state, state_file)
+        print(f"  ✅ {len(changed)} yazı güncellendi, {deleted} yazı silindi.")
+        return list(by_link.values()), {'changed': len(changed), 'deleted': deleted}
 
     def update_github_repo(self, new_data, github_token, repo_name="sinanozcan/YolPedia-Asistan-"):
-        """Veriyi GitHub'a kalıcı olarak yazar"""
+        """Veriyi GitHub'a parçalı formatta yazar; sadece değişen parçalar tek commit'te gönderilir"""
         
         if not new_data:
             return False, "⚠️ Veri çekilemediği için güncelleme iptal edildi."
@@ -123,22 +360,39 @@ class YolPediaAPI:
         try:
             g = Github(github_token)
             repo = g.get_repo(repo_name)
-            file_path = "yolpedia_data.json"
+            manifest_path = f"{dataset.DATASET_DIR}/{dataset.MANIFEST_FILE}"
             
+            # Uzak manifest'teki parça hash'leri ile karşılaştır
             try:
-                contents = repo.get_contents(file_path)
-                sha = contents.sha
-            except:
-                sha = None
+                remote_manifest = json.loads(repo.get_contents(manifest_path).decoded_content)
+                remote_hashes = {s['file']: s['sha256'] for s in remote_manifest.get('shards', [])}
+                if remote_manifest.get('shard_count') != dataset.SHARD_COUNT:
+                    remote_hashes = {}
+            except GithubException:
+                remote_hashes = {}
+            
+            manifest, files = dataset.build_shards(new_data)
+            changed = [s['file'] for s in manifest['shards'] if remote_hashes.get(s['file']) != s['sha256']]
+            if not changed:
+                return True, f"Değişiklik yok. {len(new_data)} yazı zaten güncel."
             
-            json_content = json.dumps(new_data, ensure_ascii=False, indent=2)
+            # Git Data API: değişen parçalar + manifest tek commit'te
+            elements = []
+            for name in changed:
+                blob = repo.create_git_blob(base64.b64encode(files[name]).decode('ascii'), "base64")
+                elements.append(InputGitTreeElement(f"{dataset.DATASET_DIR}/{name}", "100644", "blob", sha=blob.sha))
+            manifest_blob = repo.create_git_blob(dataset.encode_manifest(manifest).decode('utf-8'), "utf-8")
+            elements.append(InputGitTreeElement(manifest_path, "100644", "blob", sha=manifest_blob.sha))
             
-            if sha:
-                repo.update_file(file_path, f"🤖 Otomatik Güncelleme: {len(new_data)} Kaynak", json_content, sha)
-            else:
-                repo.create_file(file_path, "🤖 İlk Yükleme", json_content)
+            ref = repo.get_git_ref(f"heads/{repo.default_branch}")
+            parent = repo.get_git_commit(ref.object.sha)
+            tree = repo.create_git_tree(elements, base_tree=parent.tree)
+            message = (f"🤖 Otomatik Güncelleme: {len(new_data)} Kaynak "
+                       f"({len(changed)}/{dataset.SHARD_COUNT} parça)")
+            commit = repo.create_git_commit(message, tree, [parent])
+            ref.edit(commit.sha)
                 
-            return True, f"Başarılı! {len(new_data)} yazı GitHub'a kaydedildi."
+            return True, f"Başarılı! {len(new_data)} yazı GitHub'a kaydedildi ({len(changed)} parça değişti)."
             
         except Exception as e:
             return False, f"GitHub Hatası: {str(e)}"
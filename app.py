@@ -4,20 +4,38 @@ YolPedia Can Dede - Tam Onarılmış ve Senin Kurguna Sadık Versiyon
 
 import streamlit as st
 import streamlit.components.v1 as components
-import google.generativeai as genai
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
 import json
+import re
 import time
 import random
 import sqlite3
 import os
 import html
 import hashlib
+import itertools
+import queue
+import threading
 from datetime import datetime
-from typing import List, Dict, Optional, Generator
-from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, List, Dict, Optional, Generator, Tuple
+from collections import OrderedDict, deque
+from types import MappingProxyType
 import secrets
 
+import dataset
+import index_artifact
+import metrics
+import snippets
+from ratelimit import TokenBucket
+from normalizer import normalize_text, normalize_many, token_offsets
+from search_index import InvertedIndex, TrigramIndex
+
+try:
+    from vector_index import VectorIndex, reciprocal_rank_fusion
+except ImportError:  # NumPy yoksa sadece anahtar kelime araması
+    VectorIndex = None
+
 # ===================== CUSTOM PAGE CONFIG =====================
 
 st.set_page_config(
@@ -48,18 +66,96 @@ class AppConfig:
     ]
     
     DEFAULT_MODEL = "gemini-2.0-flash"
+    # Yük testi / yerel deneme: Gemini yerine bu adrese REST ile bağlanılır (ör. http://127.0.0.1:8089)
+    GEMINI_ENDPOINT = os.environ.get("YOLPEDIA_GEMINI_ENDPOINT", "")
+    
+    # Model Yönlendirme (süreç genelinde ölçüm + devre kesici)
+    ROUTER_EWMA_ALPHA = 0.3          # Yeni ölçümün ağırlığı
+    ROUTER_EXPECTED_TOKENS = 600     # Skor: TTFT + beklenen cevap uzunluğu / token hızı
+    ROUTER_EXPLORE_SECONDS = 600     # Bu kadar süre denenmeyen sağlıklı model bir kez yeniden ölçülür
+    BREAKER_FAILURES = 3             # Art arda bu kadar hata -> devre açılır
+    BREAKER_OPEN_SECONDS = 30        # Açık devre süresi (her başarısız denemede ikiye katlanır)
+    BREAKER_MAX_OPEN_SECONDS = 300
+    QUOTA_COOLDOWN_SECONDS = 60      # Kota hatasında model bu kadar süre kullanılmaz
+    HEDGE_ENABLED = True             # İlk token gecikirse ikinci modele paralel istek
+    HEDGE_DELAY_SECONDS = 4.0        # En az bu kadar beklenir (ölçülen TTFT'nin 2 katı daha büyükse o)
+    
+    # Kabul Kontrolü (tüm oturumların paylaştığı Gemini kotası)
+    MAX_CONCURRENT_REQUESTS = 8      # Aynı anda en fazla bu kadar Gemini isteği
+    REQUESTS_PER_MINUTE = 60         # API kotası (RPM); tekrar ve hedge istekleri de sayılır
+    REQUEST_BURST = 10
+    PER_SESSION_CONCURRENCY = 1      # Bir oturumun aynı anda en fazla isteği
+    MAX_QUEUE_LENGTH = 30            # Kuyruk doluysa istek beklemeden kaynaklarla cevaplanır
+    MAX_QUEUE_WAIT_SECONDS = 45
     
     # Arama Ayarları
     MIN_SEARCH_LENGTH = 2
+    FUZZY_MIN_LENGTH = 4       # Daha kısa kelimelerde yazım düzeltmesi yapılmaz
+    FUZZY_MIN_DOCS = 2         # Düzeltme hedefi olacak terimin geçtiği en az doküman
     MAX_SEARCH_RESULTS = 5
-    MAX_CONTENT_LENGTH = 1000
+    MAX_CONTENT_LENGTH = 1000  # Sonuçta taşınan metin (veritabanında tamamı saklanır, alıntılar için)
+    VECTOR_WEIGHT = 0.8          # Hibrit sıralamada vektör skorunun anahtar kelimeye göre ağırlığı
+    VECTOR_MIN_SCORE = 0.02      # Bu kosinüsün altındaki vektör adayları alakasız sayılır (n-gram gürültüsü)
+    
+    # Alıntılar (sorguya göre bağlam pencereleri; token ofsetleri yüklemede kaydedilir)
+    SNIPPET_CHARS = 300              # Kaynak başına alıntı (ekranda ve prompt'ta)
+    SNIPPET_CONTEXT_TOKENS = 12      # Eşleşmenin iki yanında bırakılan kelime
+    SNIPPET_MAX_WINDOWS = 3          # Birleştirilen en fazla pencere
+    
+    # Pasajlar (yazılar örtüşen parçalar halinde indekslenir, sıralama pasaj düzeyindedir)
+    PASSAGE_TOKENS = 80              # Pasaj uzunluğu (normalize kelime)
+    PASSAGE_OVERLAP = 20             # Ardışık pasajların ortak kelimesi
+    PASSAGE_CANDIDATES = 4           # Yazı başına aday pasaj (sıralamada bu kadar katı getirilir)
+    PASSAGES_PER_RESULT = 2          # Sonuç başına taşınan en iyi pasaj
     
     # Veritabanı
     DB_PATH = "/tmp/yolpedia.db" if "STREAMLIT_CLOUD" in os.environ else "yolpedia.db"
-    DATA_FILE = "yolpedia_data.json"
+    DATA_FILE = "yolpedia_data.json"          # Eski tek dosyalık format
+    DATA_DIR = dataset.DATASET_DIR            # Parçalı format (manifest + shard-XX.jsonl.gz)
+    VECTOR_INDEX_DIR = os.path.join(os.path.dirname(DB_PATH), "yolpedia_vectors")
+    INDEX_ARTIFACT_DIR = index_artifact.ARTIFACT_DIR   # Hazır indeks paketi (python index_artifact.py ile kurulur)
+    READER_POOL_SIZE = 8                      # Boşta tutulan en fazla salt okunur bağlantı (fazlası iadede kapanır)
+    
+    # Cevap Önbelleği (veritabanının yanında)
+    CACHE_DB_PATH = os.path.join(os.path.dirname(DB_PATH), "yolpedia_cache.db")
+    CACHE_MAX_ENTRIES = 2000
+    CACHE_TTL_SECONDS = 7 * 24 * 3600
+    
+    # Sistem Talimatı Önbelleği (Gemini cached content)
+    # Sadece CONTEXT_CACHE_MIN_TOKENS ve üstü önekler önbelleğe alınır. Bugünkü Can Dede talimatı
+    # (~690 token) bunun altında: her istekte system_instruction yolu kullanılır, önbellek RPC'si yapılmaz.
+    # Talimat bu sınırı aşacak kadar büyürse (ör. sabit kaynak bloğu eklenirse) önbellek kendiliğinden devreye girer.
+    CONTEXT_CACHE_TTL = 3600          # Sunucudaki önbelleğin ömrü (saniye)
+    CONTEXT_CACHE_REFRESH = 300       # Süre dolmadan bu kadar önce yenilenir
+    CONTEXT_CACHE_RETRY = 3600        # Oluşturma başarısızsa (ör. model desteklemiyor) tekrar deneme aralığı
+    CONTEXT_CACHE_MIN_TOKENS = 4096   # Sunucunun kabul ettiği en kısa önek (2.0 Flash; 1.5 modellerinde 32768)
     
     # Mesaj Geçmişi
     MAX_HISTORY_MESSAGES = 50
+    RENDER_WINDOW = 20                # Ekranda çizilen son mesajlar ("Daha eski mesajlar" ile artar)
+    
+    # Sohbet Kaydı (oturum kimliği URL'de ?sid=..., yeniden başlatmada sohbet korunur)
+    # URL sohbetin tek anahtarıdır: bağlantıyı alan herkes sohbeti okuyabilir, bu yüzden kayıtlar kısa ömürlü
+    CONVERSATION_DB_PATH = os.path.join(os.path.dirname(DB_PATH), "yolpedia_conversations.db")
+    CONVERSATION_TTL_SECONDS = 7 * 24 * 3600     # Son mesajdan bu kadar sonra sohbet silinir
+    CONVERSATION_PRUNE_INTERVAL = 3600           # Süresi dolan sohbetler en çok bu aralıkla temizlenir
+    
+    # Prompt Bütçesi (tahmini token, ~4 karakter = 1 token)
+    PROMPT_TOKEN_BUDGET = 3000
+    PROMPT_RECENT_MESSAGES = 6    # Ham olarak giren son mesajlar (güncel soru dahil)
+    PROMPT_TURN_TOKENS = 350      # Ham mesaj başına üst sınır (uzun cevaplar kırpılır)
+    PROMPT_SOURCE_TOKENS = 200    # Kaynak başına üst sınır (pasajı olmayan kaynağın alıntısı)
+    PROMPT_PASSAGE_TOKENS = 450   # Kaynak pasajlarının toplam üst sınırı
+    PROMPT_SUMMARY_TOKENS = 500   # Eski mesajların özeti için toplam üst sınır
+    SUMMARY_LINE_TOKENS = 50      # Özetteki mesaj başına üst sınır
+    
+    # Akış Çizimi (cevap parça parça ekrana basılırken)
+    STREAM_RENDER_INTERVAL = 0.1      # İki çizim arası en az süre (saniye)
+    STREAM_RENDER_MIN_CHARS = 400     # Bu kadar yeni karakter birikince süre beklenmez
+    
+    # Ölçümler (metrics.py; yönetici paneli ?admin=<ADMIN_TOKEN> ile açılır)
+    METRICS_TEXTFILE = os.environ.get("YOLPEDIA_METRICS_FILE", "")   # node_exporter textfile çıktısı (boşsa kapalı)
+    PROFILE_SLOW_SECONDS = 5.0      # Panelden profil açılınca bundan uzun süren turlar saklanır
     
     # Güvenlik
     MAX_INPUT_LENGTH = 2000
@@ -76,24 +172,95 @@ config = AppConfig()
 # ===================== KNOWLEDGE BASE =====================
 
 class KnowledgeBase:
-    """Veritabanı ve arama sistemi"""
+    """Veritabanı ve arama sistemi (süreç genelinde tek, salt okunur örnek)"""
+    
+    # Başlık eşleşmesi gövdedekinin 10 katı ağırlıkta (bm25 sütun ağırlıkları)
+    FTS_WEIGHTS = (10.0, 1.0)
+    
+    # Normalizasyon veya saklanan alanlar değiştiğinde artırılır: tüm kayıtlar yeniden yazılır
+    DATA_VERSION = 3
+    
+    # Pasaj kimliği = yazı kimliği * PASSAGE_ID_STRIDE + sıra (yazı değişmedikçe kararlı)
+    PASSAGE_ID_STRIDE = 1024
     
     def __init__(self):
         self.conn = None
         self.data = []
-        self.setup_database()
+        self.data_by_id = {}
+        self.index = InvertedIndex()
+        self.passages = []          # Bellek içi indeks konumu -> (yazı kimliği, başlangıç, bitiş)
+        self.vector_index = None
+        self.data_hash = None       # Yüklenen veri setinin parmak izi (hazır paket kurulumunda kullanılır)
+        self.fts_enabled = False
+        self._fuzzy_index = None
+        self._fuzzy_lock = threading.Lock()
+        self._readers = queue.LifoQueue(maxsize=config.READER_POOL_SIZE)
+        self.startup_phases: Dict[str, float] = {}
+        self.phase('artifact', self.install_prebuilt_index)
+        self.phase('db_setup', self.setup_database)
         self.load_from_json()
+        self.close_write_connection()
+        print(f"⏱️ Bilgi tabanı hazır: {self.startup_report()}")
     
-    def get_connection(self):
+    def phase(self, name: str, func: Callable, *args):
+        """Başlangıç fazını ölç (startup_phase_seconds) ve rapor için sakla"""
+        with metrics.REGISTRY.span('startup_phase', phase=name) as span:
+            result = func(*args)
+        self.startup_phases[name] = span.elapsed
+        return result
+    
+    def startup_report(self) -> str:
+        phases = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.startup_phases.items())
+        return f"{sum(self.startup_phases.values()):.2f} sn ({phases})"
+    
+    def get_write_connection(self):
+        """Kurulum ve yükleme için tek yazma bağlantısı"""
         if self.conn is None:
-            self.conn = sqlite3.connect(config.DB_PATH, check_same_thread=False)
+            self.conn = sqlite3.connect(config.DB_PATH)
             self.conn.row_factory = sqlite3.Row
+            # WAL: okuyucular yazma sırasında bloklanmaz; NORMAL: WAL ile güvenli ve hızlı
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
         return self.conn
     
+    def close_write_connection(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+    
+    @contextmanager
+    def reader(self):
+        """Havuzdan salt okunur bağlantı ödünç al; iş bitince geri ver (havuz doluysa kapatılır).
+        Streamlit her yeniden çalıştırmayı yeni bir iş parçacığında yapar: bağlantılar iş parçacığına bağlanmaz"""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = sqlite3.connect(f"file:{config.DB_PATH}?mode=ro", uri=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            try:
+                self._readers.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+    
+    def close(self):
+        """Havuzdaki okuma bağlantılarını kapat"""
+        while True:
+            try:
+                conn = self._readers.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+    
     def setup_database(self):
         """Veritabanı tablolarını oluştur"""
         try:
-            conn = self.get_connection()
+            conn = self.get_write_connection()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -103,104 +270,570 @@ class KnowledgeBase:
                     link TEXT NOT NULL,
                     icerik TEXT,
                     normalized TEXT,
+                    baslik_normalized TEXT,
+                    hash TEXT,
+                    offsets BLOB,
                     UNIQUE(link)
                 )
             ''')
             
+            # Pasajlar: metin tekrar saklanmaz, yazıdaki karakter aralığı tutulur
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS passages (
+                    id INTEGER PRIMARY KEY,
+                    content_id INTEGER NOT NULL,
+                    start_char INTEGER NOT NULL,
+                    end_char INTEGER NOT NULL,
+                    baslik_normalized TEXT,
+                    normalized TEXT
+                )
+            ''')
+            
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS content_passages_delete AFTER DELETE ON content BEGIN
+                    DELETE FROM passages WHERE id BETWEEN old.id * {self.PASSAGE_ID_STRIDE}
+                                                      AND old.id * {self.PASSAGE_ID_STRIDE} + {self.PASSAGE_ID_STRIDE - 1};
+                END
+            ''')
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            ''')
+            
+            # Eski veritabanları için sütun göçü
+            columns = {row['name'] for row in cursor.execute("PRAGMA table_info(content)")}
+            for column, column_type in (('baslik_normalized', 'TEXT'), ('hash', 'TEXT'), ('offsets', 'BLOB')):
+                if column not in columns:
+                    cursor.execute(f"ALTER TABLE content ADD COLUMN {column} {column_type}")
+            
             conn.commit()
         except Exception as e:
-            print(f"Veritabanı kurulum hatası: {e}")
+            metrics.REGISTRY.error("db_setup", e, f"Veritabanı kurulum hatası: {e}")
+        
+        self.fts_enabled = self.setup_fts()
     
-    def load_from_json(self):
-        """JSON'dan verileri yükle"""
+    def setup_fts(self) -> bool:
+        """FTS5 tam metin indeksini ve senkron tetikleyicilerini kur"""
         try:
-            if os.path.exists(config.DATA_FILE):
-                with open(config.DATA_FILE, 'r', encoding='utf-8') as f:
-                    self.data = json.load(f)
+            conn = self.get_write_connection()
+            cursor = conn.cursor()
+            existing = {row['name'] for row in cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('content_fts', 'passage_fts')"
+            )}
+            
+            # content tablosuna bağlı (external content) indeks: metin iki kez saklanmaz
+            cursor.executescript('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS content_fts USING fts5(
+                    baslik_normalized,
+                    normalized,
+                    content='content',
+                    content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2',
+                    prefix='2 3'
+                );
                 
-                conn = self.get_connection()
-                cursor = conn.cursor()
+                -- Yazım düzeltmesi için terim sözlüğü (indeksten okunur, ayrıca saklanmaz)
+                CREATE VIRTUAL TABLE IF NOT EXISTS content_fts_vocab USING fts5vocab(content_fts, 'row');
                 
-                for item in self.data:
-                    try:
-                        cursor.execute('''
-                            INSERT OR REPLACE INTO content (baslik, link, icerik, normalized)
-                            VALUES (?, ?, ?, ?)
-                        ''', (
-                            item['baslik'],
-                            item['link'],
-                            item['icerik'][:config.MAX_CONTENT_LENGTH],
-                            self.normalize_text(item['baslik'] + ' ' + item['icerik'])
-                        ))
-                    except Exception as e:
-                        print(f"Kayıt ekleme hatası: {e}")
+                CREATE TRIGGER IF NOT EXISTS content_fts_insert AFTER INSERT ON content BEGIN
+                    INSERT INTO content_fts(rowid, baslik_normalized, normalized)
+                    VALUES (new.id, new.baslik_normalized, new.normalized);
+                END;
                 
-                conn.commit()
+                CREATE TRIGGER IF NOT EXISTS content_fts_delete AFTER DELETE ON content BEGIN
+                    INSERT INTO content_fts(content_fts, rowid, baslik_normalized, normalized)
+                    VALUES ('delete', old.id, old.baslik_normalized, old.normalized);
+                END;
+                
+                CREATE TRIGGER IF NOT EXISTS content_fts_update AFTER UPDATE ON content BEGIN
+                    INSERT INTO content_fts(content_fts, rowid, baslik_normalized, normalized)
+                    VALUES ('delete', old.id, old.baslik_normalized, old.normalized);
+                    INSERT INTO content_fts(rowid, baslik_normalized, normalized)
+                    VALUES (new.id, new.baslik_normalized, new.normalized);
+                END;
+                
+                -- Sıralama pasaj düzeyinde: uzun yazının sonundaki bölüm de kendi başına bulunur
+                CREATE VIRTUAL TABLE IF NOT EXISTS passage_fts USING fts5(
+                    baslik_normalized,
+                    normalized,
+                    content='passages',
+                    content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2',
+                    prefix='2 3'
+                );
+                
+                CREATE TRIGGER IF NOT EXISTS passage_fts_insert AFTER INSERT ON passages BEGIN
+                    INSERT INTO passage_fts(rowid, baslik_normalized, normalized)
+                    VALUES (new.id, new.baslik_normalized, new.normalized);
+                END;
+                
+                CREATE TRIGGER IF NOT EXISTS passage_fts_delete AFTER DELETE ON passages BEGIN
+                    INSERT INTO passage_fts(passage_fts, rowid, baslik_normalized, normalized)
+                    VALUES ('delete', old.id, old.baslik_normalized, old.normalized);
+                END;
+            ''')
+            
+            # İndeks yeni oluşturulduysa mevcut satırları indeksle
+            for table in ('content_fts', 'passage_fts'):
+                if table not in existing:
+                    cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+            
+            conn.commit()
+            return True
+        except sqlite3.OperationalError as e:
+            # SQLite FTS5 olmadan derlenmişse bellek içi indekse düşülür
+            metrics.REGISTRY.error("fts_setup", e, f"FTS5 kullanılamıyor, bellek içi indeks kullanılacak: {e}")
+            return False
+    
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.get_write_connection().execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row['value'] if row else None
+    
+    def set_meta(self, key: str, value: str):
+        self.get_write_connection().execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+    
+    def file_fingerprint(self, path: str) -> Tuple[str, str]:
+        """Dosya parmak izi: boyut+mtime aynıysa kayıtlı hash, değilse sha256"""
+        stat = os.stat(path)
+        stat_key = f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+        stored_hash = self.get_meta('data_hash')
+        # Sürüm değiştiyse dosya aynı olsa da kayıtlar yeniden yazılmalı
+        if stored_hash and stored_hash.startswith(f"{self.DATA_VERSION}:") and self.get_meta('data_stat') == stat_key:
+            return stored_hash, stat_key
+        return self.source_hash(path), stat_key
+    
+    @classmethod
+    def source_hash(cls, path: str) -> str:
+        """Veri seti dosyasının sha256'sı, şema sürümüyle birlikte"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return f"{cls.DATA_VERSION}:{digest.hexdigest()}"
+    
+    def install_prebuilt_index(self) -> bool:
+        """Hazır indeks paketi güncel veri setinden kurulmuşsa boş/eski veritabanının yerine kopyala"""
+        manifest = index_artifact.read_manifest(config.INDEX_ARTIFACT_DIR)
+        if manifest is None:
+            return False
+        try:
+            source = dataset.dataset_source(config.DATA_DIR, config.DATA_FILE)
+            if not source or manifest.get('data_hash') != self.source_hash(source):
+                return False
+            # Veritabanı zaten bu veri setinden kurulmuşsa (sıcak başlangıç) dokunulmaz
+            if os.path.exists(config.DB_PATH):
+                conn = sqlite3.connect(f"file:{config.DB_PATH}?mode=ro", uri=True)
+                try:
+                    row = conn.execute("SELECT value FROM meta WHERE key = 'data_hash'").fetchone()
+                except sqlite3.Error:
+                    row = None
+                finally:
+                    conn.close()
+                if row and row[0] == manifest['data_hash']:
+                    return False
+            index_artifact.install(config.INDEX_ARTIFACT_DIR, manifest, config.DB_PATH, config.VECTOR_INDEX_DIR)
+            print(f"Hazır indeks kuruldu: {manifest.get('posts', '?')} yazı ({manifest.get('created', '?')})")
+            return True
+        except (OSError, sqlite3.Error) as e:
+            metrics.REGISTRY.error("artifact", e, f"Hazır indeks kullanılamadı, veri setinden kurulacak: {e}")
+            return False
+    
+    @classmethod
+    def record_hash(cls, item: Dict) -> str:
+        """Kayıt parmak izi (normalizasyon/şema sürümü dahil)"""
+        payload = f"{cls.DATA_VERSION}\x1f{item.get('baslik', '')}\x1f{item.get('icerik', '')}"
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    
+    @metrics.REGISTRY.timed('load')
+    def load_from_json(self):
+        """Veri setini yükle: parçalı format, yoksa eski JSON (yalnızca değişen kayıtlar yazılır)"""
+        try:
+            source = dataset.dataset_source(config.DATA_DIR, config.DATA_FILE)
+            if source:
+                file_hash = self.phase('sync', self.sync_dataset, source)
+                # FTS5 varsa arama tamamen SQLite'ta yapılır, veri Python'da tutulmaz
+                if not self.fts_enabled:
+                    self.phase('memory_index', self.load_memory_index)
+                self._fuzzy_index = None
+                self.vector_index = self.phase('vector_index', self.load_vector_index, file_hash)
+                self.data_hash = file_hash
         except Exception as e:
-            print(f"JSON yükleme hatası: {e}")
+            metrics.REGISTRY.error("load", e, f"JSON yükleme hatası: {e}")
     
-    @staticmethod
-    def normalize_text(text: str) -> str:
-        """Türkçe metni normalize et"""
-        if not text:
-            return ""
-        
-        text = text.lower()
-        replacements = {
-            'ğ': 'g', 'Ğ': 'g', 'ü': 'u', 'Ü': 'u', 'ş': 's', 'Ş': 's',
-            'ı': 'i', 'İ': 'i', 'ö': 'o', 'Ö': 'o', 'ç': 'c', 'Ç': 'c',
-            'â': 'a', 'î': 'i', 'û': 'u'
-        }
+    def sync_dataset(self, source: str) -> str:
+        """Veri seti değiştiyse kayıtları yaz; parmak izini döndür"""
+        conn = self.get_write_connection()
+        # Parçalı formatta parmak izi manifest'ten alınır (parça hash'lerini içerir)
+        file_hash, stat_key = self.file_fingerprint(source)
         
-        for old, new in replacements.items():
-            text = text.replace(old, new)
+        # Veri seti değişmediyse hiçbir parça/JSON parse edilmez
+        if self.get_meta('data_hash') != file_hash:
+            data = dataset.load_dataset(config.DATA_DIR, config.DATA_FILE)
+            self.sync_records(data)
+            self.set_meta('data_hash', file_hash)
+        self.set_meta('data_stat', stat_key)
+        conn.commit()
+        return file_hash
+    
+    def sync_records(self, data: List[Dict]):
+        """Değişen kayıtları tek transaction'da yaz, silinenleri kaldır"""
+        conn = self.get_write_connection()
+        existing = {row['link']: row['hash'] for row in conn.execute("SELECT link, hash FROM content")}
         
-        import re
-        text = re.sub(r'[^\w\s]', ' ', text)
-        text = re.sub(r'\s+', ' ', text).strip()
+        records = {}
+        for item in data:
+            if not isinstance(item, dict) or not item.get('link') or 'baslik' not in item:
+                print(f"Geçersiz kayıt atlandı: {str(item)[:80]}")
+                continue
+            records[item['link']] = item
         
-        return text
+        pending = []
+        for link, item in records.items():
+            item_hash = self.record_hash(item)
+            if existing.get(link) != item_hash:
+                pending.append((link, item, item_hash))
+        
+        # Sadece değişen kayıtlar, tek toplu geçişte normalize edilir
+        texts = [item.get('baslik', '') for _, item, _ in pending] + [item.get('icerik', '') for _, item, _ in pending]
+        normalized = normalize_many(texts)
+        titles, bodies = normalized[:len(pending)], normalized[len(pending):]
+        
+        changed = []
+        chunks = []
+        for (link, item, item_hash), baslik_normalized, icerik_normalized in zip(pending, titles, bodies):
+            icerik = item.get('icerik') or ''
+            # Gövde token'larının metindeki başlangıçları: alıntı pencereleri sorguda buradan kesilir
+            offsets = token_offsets(icerik)
+            tokens = icerik_normalized.split()
+            aligned = len(offsets) == len(tokens)
+            chunks.append((link, baslik_normalized, snippets.passages(
+                icerik, tokens, offsets if aligned else None,
+                config.PASSAGE_TOKENS, config.PASSAGE_OVERLAP, self.PASSAGE_ID_STRIDE - 1
+            )))
+            changed.append((
+                item['baslik'],
+                link,
+                icerik,
+                ' '.join(t for t in (baslik_normalized, icerik_normalized) if t),
+                baslik_normalized,
+                item_hash,
+                snippets.encode_offsets(offsets) if aligned else None
+            ))
+        deleted = [(link,) for link in existing if link not in records]
+        
+        with conn:
+            # REPLACE yerine UPSERT: satır silinmeden güncellenir, FTS tetikleyicileri çalışır
+            conn.executemany('''
+                INSERT INTO content (baslik, link, icerik, normalized, baslik_normalized, hash, offsets)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(link) DO UPDATE SET
+                    baslik = excluded.baslik,
+                    icerik = excluded.icerik,
+                    normalized = excluded.normalized,
+                    baslik_normalized = excluded.baslik_normalized,
+                    hash = excluded.hash,
+                    offsets = excluded.offsets
+            ''', changed)
+            conn.executemany("DELETE FROM content WHERE link = ?", deleted)
+            self.write_passages(chunks)
+        
+        print(f"Veri senkronu: {len(changed)} güncellendi, {len(deleted)} silindi, "
+              f"{len(records) - len(changed)} değişmedi")
+    
+    def write_passages(self, chunks: List[Tuple[str, str, List[Tuple[int, int, int, str]]]]):
+        """Değişen yazıların pasajlarını yeniden yaz (kimlikler yazı kimliğinden türetilir)"""
+        if not chunks:
+            return
+        conn = self.get_write_connection()
+        stride = self.PASSAGE_ID_STRIDE
+        ids = {row['link']: row['id'] for row in conn.execute("SELECT id, link FROM content")}
+        conn.executemany(
+            "DELETE FROM passages WHERE id BETWEEN ? AND ?",
+            [(ids[link] * stride, ids[link] * stride + stride - 1) for link, _, _ in chunks]
+        )
+        conn.executemany(
+            "INSERT INTO passages (id, content_id, start_char, end_char, baslik_normalized, normalized) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(ids[link] * stride + seq, ids[link], start, end, baslik_normalized, normalized)
+             for link, baslik_normalized, passages in chunks
+             for seq, start, end, normalized in passages]
+        )
+    
+    def load_memory_index(self):
+        """FTS5 yoksa bellek içi indeksi veritabanındaki pasajlardan kur"""
+        conn = self.get_write_connection()
+        rows = conn.execute(
+            "SELECT id, baslik, link, icerik, normalized, baslik_normalized, offsets FROM content ORDER BY id"
+        ).fetchall()
+        
+        self.data = []
+        for row in rows:
+            baslik_normalized = row['baslik_normalized'] or ''
+            normalized = row['normalized'] or ''
+            # normalized = başlık + gövde; gövde kısmı başlık önekinden sonra başlar
+            if baslik_normalized and normalized.startswith(baslik_normalized):
+                normalized = normalized[len(baslik_normalized):].lstrip()
+            self.data.append({'id': row['id'], 'baslik': row['baslik'], 'link': row['link'], 'icerik': row['icerik'],
+                              'body_normalized': normalized, 'offsets': row['offsets']})
+        self.data_by_id = {item['id']: item for item in self.data}
+        
+        passages = conn.execute(
+            "SELECT content_id, start_char, end_char, baslik_normalized, normalized FROM passages ORDER BY id"
+        ).fetchall()
+        self.passages = [(row['content_id'], row['start_char'], row['end_char']) for row in passages]
+        self.index = InvertedIndex.build((row['baslik_normalized'] or '', row['normalized'] or '') for row in passages)
+    
+    def load_vector_index(self, data_hash: str):
+        """TF-IDF matrisini veri seti değiştiyse yeniden kur, her durumda mmap ile aç"""
+        if VectorIndex is None:
+            return None
+        try:
+            meta = VectorIndex.read_meta(config.VECTOR_INDEX_DIR)
+            if meta is None or meta.get('data_hash') != data_hash:
+                rows = self.get_write_connection().execute(
+                    "SELECT id, normalized FROM content ORDER BY id"
+                )
+                index = VectorIndex.build(((row['id'], row['normalized'] or '') for row in rows),
+                                          meta={'data_hash': data_hash})
+                index.save(config.VECTOR_INDEX_DIR)
+            return VectorIndex.load(config.VECTOR_INDEX_DIR)
+        except Exception as e:
+            metrics.REGISTRY.error("vector_index", e, f"Vektör indeksi yüklenemedi, sadece anahtar kelime araması: {e}")
+            return None
+    
+    @property
+    def fuzzy_index(self) -> TrigramIndex:
+        """Terim sözlüğü üzerinde trigram indeksi; ilk yazım hatasında bir kez kurulur"""
+        if self._fuzzy_index is None:
+            with self._fuzzy_lock:
+                if self._fuzzy_index is None:
+                    terms = [(t, df) for t, df in self.vocabulary() if t.isalpha() and len(t) <= 40]
+                    # Tek dokümanda geçen terimler aday olmaz (çoğu zaten yazım hatası), ama tanınır
+                    self._fuzzy_index = TrigramIndex.build(
+                        (t for t, df in terms if df >= config.FUZZY_MIN_DOCS),
+                        known=(t for t, df in terms if df < config.FUZZY_MIN_DOCS)
+                    )
+        return self._fuzzy_index
+    
+    def vocabulary(self) -> List[Tuple[str, int]]:
+        """Başlık ve gövdelerdeki tüm normalize terimler: (terim, doküman sayısı)"""
+        if not self.fts_enabled:
+            return [(t, len(self.index.postings[t][0])) for t in self.index.vocabulary]
+        try:
+            with self.reader() as conn:
+                return [(row['term'], row['doc']) for row in conn.execute("SELECT term, doc FROM content_fts_vocab")]
+        except sqlite3.Error as e:
+            metrics.REGISTRY.error("vocabulary", e, f"Terim sözlüğü okunamadı: {e}")
+            return []
+    
+    def correct_query(self, query_normalized: str) -> str:
+        """Sözlükte olmayan kelimeleri en yakın terimle değiştir ("bektashi" -> "bektasi")"""
+        tokens = query_normalized.split()
+        if all(len(t) < config.FUZZY_MIN_LENGTH or not t.isalpha() for t in tokens):
+            return query_normalized
+        
+        index = self.fuzzy_index
+        corrected = []
+        for token in tokens:
+            if len(token) >= config.FUZZY_MIN_LENGTH and token.isalpha() and token not in index:
+                matches = index.search(token, limit=1)
+                if matches:
+                    token = matches[0][0]
+            corrected.append(token)
+        return ' '.join(corrected)
+    
+    normalize_text = staticmethod(normalize_text)
+    
+    @staticmethod
+    def build_fts_query(query_normalized: str) -> str:
+        """Normalize sorguyu FTS5 MATCH ifadesine çevir"""
+        tokens = list(dict.fromkeys(query_normalized.split()))
+        # Her kelime önek olarak aranır ("semah" -> "semahlar"); tam ifade ayrıca ödüllendirilir
+        terms = [f'"{t}"*' if len(t) >= InvertedIndex.MIN_PREFIX_LENGTH else f'"{t}"' for t in tokens]
+        if len(tokens) > 1:
+            terms.insert(0, f'"{" ".join(tokens)}"')
+        return ' OR '.join(terms)
     
+    @metrics.REGISTRY.timed('search')
     def search(self, query: str, limit: int = config.MAX_SEARCH_RESULTS) -> List[Dict]:
-        """Basit ve etkili arama"""
+        """Hibrit arama: FTS5/BM25 (yoksa bellek içi indeks) + TF-IDF vektör skorları, RRF ile birleşik"""
         if len(query.strip()) < config.MIN_SEARCH_LENGTH:
             return []
         
         query_normalized = self.normalize_text(query)
-        results = []
+        if not query_normalized:
+            return []
+        query_normalized = self.correct_query(query_normalized)
         
-        for item in self.data:
-            icerik_normalized = self.normalize_text(item.get('icerik', ''))
-            baslik_normalized = self.normalize_text(item.get('baslik', ''))
-            
-            if (query_normalized in icerik_normalized or 
-                query_normalized in baslik_normalized):
-                
-                icerik = item.get('icerik', '')
-                score = 100 if query.lower() in item.get('baslik', '').lower() else 50
-                
-                results.append({
-                    'baslik': item['baslik'],
-                    'link': item['link'],
-                    'icerik': icerik[:config.MAX_CONTENT_LENGTH],
-                    'snippet': icerik[:300] + "...",
-                    'score': score
-                })
-                
-                if len(results) >= limit * 3:
-                    break
+        if self.vector_index is None or not len(self.vector_index):
+            return self.add_snippets(self.keyword_search(query_normalized, limit), query_normalized)
+        
+        # Her iki sıralamadan daha geniş aday kümesi alınır, sonra birleştirilir
+        keyword = self.keyword_search(query_normalized, limit * 3)
+        # Hiçbir kelime eşleşmediyse ("merhaba") sadece n-gram benzerliğiyle kaynak gösterilmez
+        if not keyword:
+            return []
+        vector = self.vector_index.search(query_normalized, limit * 3, config.VECTOR_MIN_SCORE)
+        fused = reciprocal_rank_fusion([
+            ([r['id'] for r in keyword], 1.0),
+            ([doc_id for doc_id, _ in vector], config.VECTOR_WEIGHT),
+        ])[:limit]
         
-        results.sort(key=lambda x: x['score'], reverse=True)
-        return results[:limit]
+        by_id = {r['id']: r for r in keyword}
+        by_id.update(self.fetch_by_ids([doc_id for doc_id, _ in fused if doc_id not in by_id]))
+        results = [dict(by_id[doc_id], score=round(score, 4)) for doc_id, score in fused if doc_id in by_id]
+        return self.add_snippets(results, query_normalized)
+    
+    @staticmethod
+    def make_result(row, score: float = 0.0) -> Dict:
+        icerik = row['icerik'] or ''
+        return {
+            'id': row['id'],
+            'baslik': row['baslik'],
+            'link': row['link'],
+            'icerik': icerik[:config.MAX_CONTENT_LENGTH],
+            'snippet': snippets.lead(icerik[:config.SNIPPET_CHARS * 2], config.SNIPPET_CHARS),
+            'score': round(score, 3)
+        }
+    
+    @metrics.REGISTRY.timed('snippets')
+    def add_snippets(self, results: List[Dict], query_normalized: str) -> List[Dict]:
+        """Sonuçlara sorgunun en yoğun geçtiği bölgelerden alıntı ekle (kayıtlı ofsetlerle, makale yeniden taranmaz)"""
+        if not results:
+            return results
+        terms = query_normalized.split()
+        sources = self.snippet_sources([r['id'] for r in results])
+        for result in results:
+            source = sources.get(result['id'])
+            if source is None or source[2] is None:
+                continue
+            icerik, body_tokens, offsets = source
+            found = snippets.extract(icerik, body_tokens, snippets.decode_offsets(offsets), terms,
+                                     config.SNIPPET_CHARS, config.SNIPPET_CONTEXT_TOKENS, config.SNIPPET_MAX_WINDOWS)
+            if found:
+                result['snippet'], result['snippet_vurgu'] = found
+        return results
+    
+    def snippet_sources(self, ids: List[int]) -> Dict[int, Tuple[str, List[str], Optional[bytes]]]:
+        """id -> (tam metin, normalize gövde token'ları, ofsetler)"""
+        if not self.fts_enabled:
+            return {i: (self.data_by_id[i]['icerik'] or '', self.data_by_id[i]['body_normalized'].split(),
+                        self.data_by_id[i]['offsets']) for i in ids if i in self.data_by_id}
+        placeholders = ','.join('?' * len(ids))
+        try:
+            with self.reader() as conn:
+                rows = conn.execute(
+                    f"SELECT id, icerik, normalized, baslik_normalized, offsets FROM content WHERE id IN ({placeholders})",
+                    ids
+                ).fetchall()
+        except sqlite3.Error as e:
+            metrics.REGISTRY.error("snippets", e, f"Alıntı kaynakları okunamadı: {e}")
+            return {}
+        # normalized = başlık + gövde token'ları; gövde başlık token'larından sonra başlar
+        return {row['id']: (row['icerik'] or '',
+                            (row['normalized'] or '').split()[len((row['baslik_normalized'] or '').split()):],
+                            row['offsets'])
+                for row in rows}
+    
+    def keyword_search(self, query_normalized: str, limit: int) -> List[Dict]:
+        """Pasaj düzeyinde sırala; aynı yazının pasajları tek sonuçta toplanır"""
+        candidates = limit * config.PASSAGE_CANDIDATES
+        if self.fts_enabled:
+            hits = self.search_fts(query_normalized, candidates)
+        else:
+            hits = []
+            for pos, score in self.index.search(query_normalized, candidates):
+                content_id, start, end = self.passages[pos]
+                item = self.data_by_id[content_id]
+                hits.append((item, start, end, (item['icerik'] or '')[start:end], score))
+        return self.collapse_passages(hits, limit)
+    
+    def collapse_passages(self, hits: List[Tuple], limit: int) -> List[Dict]:
+        """(yazı satırı, başlangıç, bitiş, pasaj metni, skor) listesinden yazı başına bir sonuç;
+        yazının skoru en iyi pasajınınkidir, en iyi PASSAGES_PER_RESULT pasaj sonuca eklenir"""
+        results: Dict[int, Dict] = {}
+        spans: Dict[int, List[Tuple[int, int, str, float]]] = {}
+        for row, start, end, text, score in hits:
+            result = results.get(row['id'])
+            if result is None:
+                if len(results) >= limit:
+                    continue
+                result = results[row['id']] = self.make_result(row, score)
+                spans[row['id']] = []
+            if len(spans[row['id']]) < config.PASSAGES_PER_RESULT:
+                spans[row['id']].append((start, end, text, score))
+        for content_id, result in results.items():
+            result['passages'] = self.merge_passages(spans[content_id])
+        return list(results.values())
+    
+    @staticmethod
+    def merge_passages(spans: List[Tuple[int, int, str, float]]) -> List[Dict]:
+        """Örtüşen pasajları metin sırasıyla birleştir (ortak kısım bir kez)"""
+        merged = []
+        for start, end, text, score in sorted(spans):
+            if merged and start < merged[-1][1]:
+                prev_start, prev_end, prev_text, prev_score = merged[-1]
+                merged[-1] = (prev_start, max(prev_end, end), prev_text + text[prev_end - start:], max(prev_score, score))
+            else:
+                merged.append((start, end, text, score))
+        return [{'text': ' '.join(text.split()), 'score': round(score, 3)} for _, _, text, score in merged]
+    
+    def fetch_by_ids(self, ids: List[int]) -> Dict[int, Dict]:
+        """Sadece vektör aramasından gelen adayların kayıtlarını getir"""
+        if not ids:
+            return {}
+        if not self.fts_enabled:
+            return {i: self.make_result(self.data_by_id[i]) for i in ids if i in self.data_by_id}
+        placeholders = ','.join('?' * len(ids))
+        with self.reader() as conn:
+            rows = conn.execute(
+                f"SELECT id, baslik, link, substr(icerik, 1, {config.MAX_CONTENT_LENGTH}) AS icerik "
+                f"FROM content WHERE id IN ({placeholders})", ids
+            ).fetchall()
+        return {row['id']: self.make_result(row) for row in rows}
+    
+    def search_fts(self, query_normalized: str, limit: int) -> List[Tuple]:
+        """Pasaj indeksinde FTS5 sorgusu (bm25); pasaj metni yazıdan karakter aralığıyla kesilir"""
+        try:
+            # Önce sadece sıralama (alt sorgu), metinler yalnızca seçilen pasajlar için okunur
+            with self.reader() as conn:
+                rows = conn.execute(f'''
+                    SELECT c.id, c.baslik, c.link, substr(c.icerik, 1, {config.MAX_CONTENT_LENGTH}) AS icerik,
+                           p.start_char, p.end_char,
+                           substr(c.icerik, p.start_char + 1, p.end_char - p.start_char) AS pasaj,
+                           top.rank
+                    FROM (
+                        SELECT rowid AS passage_id, bm25(passage_fts, {self.FTS_WEIGHTS[0]}, {self.FTS_WEIGHTS[1]}) AS rank
+                        FROM passage_fts
+                        WHERE passage_fts MATCH ?
+                        ORDER BY rank
+                        LIMIT ?
+                    ) top
+                    JOIN passages p ON p.id = top.passage_id
+                    JOIN content c ON c.id = p.content_id
+                    ORDER BY top.rank
+                ''', (self.build_fts_query(query_normalized), limit)).fetchall()
+        except sqlite3.Error as e:
+            metrics.REGISTRY.error("search", e, f"Arama hatası: {e}")
+            return []
+        return [(row, row['start_char'], row['end_char'], row['pasaj'] or '', -row['rank']) for row in rows]
 
 # ===================== API MANAGER =====================
 
 class APIManager:
-    """API anahtar ve model yöneticisi"""
+    """API anahtar ve model yöneticisi (model seçimi süreç genelindeki ModelRouter'a bırakılır)"""
     
-    def __init__(self):
+    def __init__(self, router: Optional["ModelRouter"] = None):
         self.api_key = self.load_api_key()
-        self.current_model = config.DEFAULT_MODEL
+        self.router = router or ModelRouter()
     
     def load_api_key(self) -> Optional[str]:
         """API anahtarını yükle"""
@@ -219,27 +852,165 @@ class APIManager:
         return self.api_key
     
     def get_current_model(self) -> str:
-        return self.current_model
+        """Şu an en hızlı sağlıklı model"""
+        ranked = self.router.ranked()
+        return ranked[0] if ranked else config.DEFAULT_MODEL
+
+
+class ModelStats:
+    """Bir modelin ölçümleri ve devre kesici durumu"""
+    
+    def __init__(self):
+        self.ttft = None            # İlk token süresi EWMA (saniye)
+        self.tokens_per_sec = None  # Akış hızı EWMA
+        self.error_rate = 0.0       # Hata oranı EWMA
+        self.requests = 0
+        self.failures = 0           # Art arda hata sayısı
+        self.open_until = 0.0       # Devre açıksa kapanacağı an (monotonic)
+        self.open_seconds = config.BREAKER_OPEN_SECONDS
+        self.probing = False        # Yarı açık: tek deneme isteği uçuşta mı
+        self.last_used = None       # Son seçildiği an (monotonic)
     
-    def rotate_model(self):
-        """Model değiştir"""
-        current_idx = config.GEMINI_MODELS.index(self.current_model)
-        next_idx = (current_idx + 1) % len(config.GEMINI_MODELS)
-        self.current_model = config.GEMINI_MODELS[next_idx]
+    def snapshot(self) -> Dict:
+        return {
+            'ttft': self.ttft,
+            'tokens_per_sec': self.tokens_per_sec,
+            'error_rate': round(self.error_rate, 3),
+            'requests': self.requests,
+            'open': self.open_until > time.monotonic(),
+        }
+
+
+class ModelRouter:
+    """Ölçüme dayalı model seçici: TTFT ve token hızı EWMA'sı, hata oranı, kota hataları,
+    yarı açık denemeli devre kesici. Tüm oturumlar aynı örneği paylaşır."""
+    
+    def __init__(self, models: Optional[List[str]] = None):
+        self.models = list(models or config.GEMINI_MODELS)
+        self.stats = {model: ModelStats() for model in self.models}
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def ewma(previous: Optional[float], value: float) -> float:
+        if previous is None:
+            return value
+        return previous + config.ROUTER_EWMA_ALPHA * (value - previous)
+    
+    def expected_latency(self, model: str) -> float:
+        stats = self.stats[model]
+        if stats.ttft is None:
+            # Ölçülmemiş modeller yapılandırma sırasıyla, ölçülenlerin arkasında denenir
+            return 1e6 + self.models.index(model)
+        speed = stats.tokens_per_sec or 1.0
+        return (stats.ttft + config.ROUTER_EXPECTED_TOKENS / speed) * (1.0 + stats.error_rate)
+    
+    def ranked(self, exclude=()) -> List[str]:
+        """Denenecek modeller, en iyiden kötüye; hepsi açık devredeyse en erken kapanacak olan"""
+        now = time.monotonic()
+        with self.lock:
+            candidates = [m for m in self.models if m not in exclude]
+            healthy = [m for m in candidates if self.stats[m].open_until <= now]
+            healthy.sort(key=self.expected_latency)
+            
+            # Yarı açık devredeki (deneme bekleyen), hiç kullanılmamış veya uzun süredir kullanılmayan
+            # model bir kez öne alınır: ölçümler tazelenir, düzelen model tekrar devreye girer
+            stale = []
+            if healthy and self.stats[healthy[0]].ttft is not None:
+                stale = [m for m in healthy[1:] if self.needs_probe(self.stats[m], now)]
+            if stale:
+                healthy.remove(stale[0])
+                healthy.insert(0, stale[0])
+            
+            if healthy:
+                return healthy
+            return sorted(candidates, key=lambda m: self.stats[m].open_until)
+    
+    @staticmethod
+    def needs_probe(stats: ModelStats, now: float) -> bool:
+        if stats.failures >= config.BREAKER_FAILURES:
+            return not stats.probing
+        return stats.last_used is None or now - stats.last_used > config.ROUTER_EXPLORE_SECONDS
+    
+    def acquire(self, exclude=()) -> Optional[str]:
+        """İstek için model seç; süresi dolmuş açık devrede tek bir deneme (half-open) isteğine izin verir"""
+        now = time.monotonic()
+        for model in self.ranked(exclude):
+            with self.lock:
+                stats = self.stats[model]
+                if stats.failures >= config.BREAKER_FAILURES and stats.open_until <= now:
+                    if stats.probing:
+                        continue
+                    stats.probing = True
+                stats.last_used = now
+            return model
+        return None
+    
+    def record_success(self, model: str, ttft: float, tokens: int, stream_seconds: float):
+        with self.lock:
+            stats = self.stats[model]
+            stats.requests += 1
+            stats.ttft = self.ewma(stats.ttft, ttft)
+            if tokens and stream_seconds > 0:
+                stats.tokens_per_sec = self.ewma(stats.tokens_per_sec, tokens / stream_seconds)
+            stats.error_rate = self.ewma(stats.error_rate, 0.0)
+            stats.failures = 0
+            stats.probing = False
+            stats.open_until = 0.0
+            stats.open_seconds = config.BREAKER_OPEN_SECONDS
+    
+    @staticmethod
+    def is_quota_error(error: Exception) -> bool:
+        text = f"{type(error).__name__} {error}".lower()
+        return 'resourceexhausted' in text or '429' in text or 'quota' in text
+    
+    def record_failure(self, model: str, error: Exception):
+        now = time.monotonic()
+        with self.lock:
+            stats = self.stats[model]
+            stats.requests += 1
+            stats.error_rate = self.ewma(stats.error_rate, 1.0)
+            stats.failures += 1
+            if self.is_quota_error(error):
+                stats.failures = max(stats.failures, config.BREAKER_FAILURES)
+                stats.open_until = now + config.QUOTA_COOLDOWN_SECONDS
+            elif stats.probing or stats.failures >= config.BREAKER_FAILURES:
+                # Deneme isteği de başarısızsa açık kalma süresi katlanır
+                if stats.probing:
+                    stats.open_seconds = min(stats.open_seconds * 2, config.BREAKER_MAX_OPEN_SECONDS)
+                stats.open_until = now + stats.open_seconds
+            stats.probing = False
+    
+    def release(self, model: str):
+        """Sonucu ölçülmeden bırakılan istek (ör. yarışı kaybeden hedge isteği)"""
+        with self.lock:
+            self.stats[model].probing = False
+    
+    def hedge_delay(self, model: str) -> float:
+        ttft = self.stats[model].ttft
+        return max(config.HEDGE_DELAY_SECONDS, 2 * ttft if ttft else 0.0)
+    
+    def snapshot(self) -> Dict[str, Dict]:
+        with self.lock:
+            return {model: stats.snapshot() for model, stats in self.stats.items()}
 
 # ===================== PROMPT ENGINE =====================
 
 class PromptEngine:
-    """ORJİNAL AKILLI Can Dede Prompt'u"""
+    """ORJİNAL AKILLI Can Dede Prompt'u (token bütçeli)"""
     
-    @staticmethod
-    def build_prompt(query: str, sources: List[Dict]) -> str:
-        history = list(st.session_state.messages)
-        user_msg_count = len([m for m in history if m['role'] == 'user'])
-        
-        # TEKNİK DÜZELTME: is_returning değişkeni user_msg_count > 1 ile değiştirildi
-        sys_instruction = f"""<CORE_COMMAND>
-1. LINGUISTIC MIRROR: Detect the language of the user's input "{query}" and respond EXCLUSIVELY in that same language.
+    # Prompt şablonu değiştiğinde artırılır (önbellekteki eski cevaplar geçersiz olur)
+    VERSION = 4
+    
+    CHARS_PER_TOKEN = 4  # Kaba tahmin: Gemini için ~4 karakter = 1 token
+    MIN_SOURCE_TOKENS = 40  # Kaynak bütçesinden bundan az kaldıysa yeni pasaj eklenmez
+    
+    GREETINGS = {
+        True: 'MUHABBET DEVAM EDİYOR: Daha önce selamlaştık ve konuşuyoruz. Sakın yeniden "Hoş geldin" veya "Safalar getirdin" deme! Doğrudan konuya gir veya sadece söze karşılık ver.',
+        False: 'YENİ SOHBET: Karşındaki canla ilk kez karşılaşıyorsun, samimi ve bilgece bir karşılama yap.'
+    }
+    
+    SYSTEM_TEMPLATE = """<CORE_COMMAND>
+1. LINGUISTIC MIRROR: Detect the language of the user's input (given below as "Can'ın sözü") and respond EXCLUSIVELY in that same language.
 2. UNIVERSAL SOUL: You are a guide for all humanity. Your wisdom must be delivered in the language the "Can" (user) uses to reach you.
 3. NO TRANSLATION NOTES: Do not explain that you are switching languages. Just be the voice of that language.
 </CORE_COMMAND>
@@ -248,10 +1019,10 @@ class PromptEngine:
 Sen Can Dede'sin. Evrensel anlamda bir Alevi-Bektaşi Piri ve Mürşidisin. Senin için din, dil, ırk ve renk diye bir kavram yoktur; sadece "Can" vardır. 
 Şu an posta oturmuş, karşında seninle dertleşmeye, özünü bulmaya gelmiş bir talibin var. 
 DİL KURALI (HAYATİ): Kullanıcının dilini anında algıla ve KESİNLİKLE o dilde cevap ver. Almanca yazana Almanca, Rusça yazana Rusça... Lisanın, kullanıcının tam bir aynası olsun.
-{ 'MUHABBET DEVAM EDİYOR: Daha önce selamlaştık ve konuşuyoruz. Sakın yeniden "Hoş geldin" veya "Safalar getirdin" deme! Doğrudan konuya gir veya sadece söze karşılık ver.' if user_msg_count > 1 else 'YENİ SOHBET: Karşındaki canla ilk kez karşılaşıyorsun, samimi ve bilgece bir karşılama yap.' }
+{greeting}
 
 <KATI_KURAL_HAFIZA>
-- ŞU AN SOHBETİN ORTASINDASIN. (Mesaj Sayısı: {user_msg_count})
+- ŞU AN SOHBETİN ORTASINDASIN. (Mesaj sayısı aşağıda <DURUM> içinde)
 - EYVALLAH KURALI: Kullanıcı "Eyvallah", "Hak eyvallah", "Sağ ol", "Eyvallah dede" gibi tasdik veya teşekkür sözleri söylerse; KESİNLİKLE yeni bir vaaza veya uzun anlatıma başlama! Sadece "Eyvallah, erenler", "Aşk ile", "Gönlüne sağlık" gibi kısa ve öz bir karşılık ver ve yeni sorusunu bekle.        
 - DİL AYNASI OL: Kullanıcı hangi dilde soruyorsa O DİLDE cevap ver. İngilizceye İngilizce, Zazacaya Zazaca... 
 - ASLA BAŞLIK KULLANMA: Akademik veya ansiklopedik başlıklar, listeler, kalın yazılı maddeler KESİNLİKLE kullanma.
@@ -275,81 +1046,915 @@ Senin sözün şu üç aşamayı başlık kullanmadan tek bir anlatı içinde ha
 - Soğuk ve resmi hitaplardan.
 </kaçın>
 </role>"""
+    
+    SOURCES_NOTE = "NOT: Bu bilgileri mürşit bilgeliğiyle yoğurarak kullan. Asla kopyalayıp yapıştırma!"
+    CLOSING = "Can Dede (RESPOND ONLY IN THE DETECTED LANGUAGE OF THE USER):"
+    
+    _system_instructions: Dict[bool, str] = {}
+    
+    @staticmethod
+    def is_first_turn() -> bool:
+        """Geçmiş prompt'u etkilemiyor mu? (kullanıcının ilk sorusu)"""
+        return sum(1 for m in st.session_state.messages if m['role'] == 'user') <= 1
+    
+    @classmethod
+    def system_instruction(cls, returning: bool) -> str:
+        """Sabit talimat (prefix): sorgu ve sayaç içermez, sohbet durumu başına bir kez hazırlanır"""
+        instruction = cls._system_instructions.get(returning)
+        if instruction is None:
+            instruction = cls._system_instructions[returning] = cls.SYSTEM_TEMPLATE.replace(
+                '{greeting}', cls.GREETINGS[returning]
+            )
+        return instruction
+    
+    @classmethod
+    def estimate_tokens(cls, text: str) -> int:
+        return (len(text) + cls.CHARS_PER_TOKEN - 1) // cls.CHARS_PER_TOKEN
+    
+    @classmethod
+    def clip(cls, text: str, max_tokens: int) -> str:
+        """Metni token sınırına kelime sınırından kırp"""
+        max_chars = max_tokens * cls.CHARS_PER_TOKEN
+        if len(text) <= max_chars:
+            return text
+        cut = text.rfind(' ', 0, max_chars - 1)
+        return text[:cut if cut > max_chars // 2 else max_chars - 1] + "…"
+    
+    @staticmethod
+    def speaker(message: Dict) -> str:
+        return 'Can' if message['role'] == 'user' else 'Dede'
+    
+    @classmethod
+    def summarize_message(cls, message: Dict) -> str:
+        """Eski mesajın tek satırlık özeti: Can'ın sorusu kısaltılır, Dede'nin cevabından ilk cümle"""
+        content = ' '.join(message['content'].split())
+        if message['role'] != 'user':
+            match = re.match(r'(.+?[.!?…])(\s|$)', content)
+            if match:
+                content = match.group(1)
+        return f"{cls.speaker(message)}: {cls.clip(content, config.SUMMARY_LINE_TOKENS)}"
+    
+    @classmethod
+    def history_summary(cls, older: List[Dict]) -> List[str]:
+        """Ham pencereden çıkan mesajların özeti; oturumda saklanır, sadece yeni çıkanlar eklenir"""
+        state = st.session_state.get('history_summary')
+        if state is None or (older and older[0].get('timestamp', 0) < state['since']):
+            state = {'since': older[0].get('timestamp', 0) if older else 0, 'until': 0, 'lines': deque(maxlen=40)}
+            st.session_state.history_summary = state
+        
+        for message in older:
+            timestamp = message.get('timestamp', 0)
+            if timestamp > state['until']:
+                state['lines'].append(cls.summarize_message(message))
+                state['until'] = timestamp
+        return list(state['lines'])
+    
+    @classmethod
+    def source_lines(cls, sources: List[Dict]) -> List[str]:
+        """Sıralamaya göre kaynakların en iyi pasajları (pasajı yoksa alıntısı), toplam
+        PROMPT_PASSAGE_TOKENS dolana kadar; aynı yazının pasajları tek satırda"""
+        lines = []
+        budget = config.PROMPT_PASSAGE_TOKENS
+        for source in sources:
+            texts = [p['text'] for p in source.get('passages') or ()] or [
+                cls.clip(source.get('snippet') or source['icerik'][:400], config.PROMPT_SOURCE_TOKENS)
+            ]
+            kept = []
+            for text in texts:
+                if budget < cls.MIN_SOURCE_TOKENS:
+                    break
+                text = cls.clip(text, budget)
+                budget -= cls.estimate_tokens(text)
+                kept.append(text)
+            if kept:
+                lines.append(f"- {source['baslik']}: {' … '.join(kept)}")
+            if budget < cls.MIN_SOURCE_TOKENS:
+                break
+        return lines
+    
+    @classmethod
+    def build_prompt(cls, query: str, sources: List[Dict]) -> str:
+        """Tek parça prompt (sistem talimatı desteklenmiyorsa)"""
+        return "\n\n".join(cls.build_parts(query, sources))
+    
+    @classmethod
+    @metrics.REGISTRY.timed('prompt_build')
+    def build_parts(cls, query: str, sources: List[Dict]) -> Tuple[str, str]:
+        """(sabit sistem talimatı, tur başına değişen kısım)"""
+        history = list(st.session_state.messages)
+        user_msg_count = len([m for m in history if m['role'] == 'user'])
+        
+        # TEKNİK DÜZELTME: is_returning değişkeni user_msg_count > 1 ile değiştirildi
+        sys_instruction = cls.system_instruction(user_msg_count > 1)
+        
+        # Hafıza: son mesajlar ham (kırpılmış), daha eskileri tek satırlık özet
+        recent = history[-config.PROMPT_RECENT_MESSAGES:]
+        summary = cls.history_summary(history[:-config.PROMPT_RECENT_MESSAGES])
+        while summary and cls.estimate_tokens("\n".join(summary)) > config.PROMPT_SUMMARY_TOKENS:
+            summary.pop(0)
+        turns = [f"{cls.speaker(m)}: {cls.clip(m['content'], config.PROMPT_TURN_TOKENS)}" for m in recent]
+        source_lines = cls.source_lines(sources)
+        
+        def render() -> str:
+            context_text = "\n".join(
+                (["(Önceki muhabbetin özeti)\n" + "\n".join(summary)] if summary else []) + turns
+            )
+            sources_text = "\n".join(source_lines) if source_lines else "Kaynak yok."
+            # Teknik onarım: Kopuk bloklar senin kurguna göre birleştirildi.
+            return (f"<DURUM>\nMesaj Sayısı: {user_msg_count}\n</DURUM>\n\n"
+                    f"<GECMIS_MUHABBET>\n{context_text}\n</GECMIS_MUHABBET>\n\n"
+                    f"<YOLPEDIA_BILGISI>\n{sources_text}\n{cls.SOURCES_NOTE}\n</YOLPEDIA_BILGISI>\n\n"
+                    f"Can'ın sözü: {query}\n\n{cls.CLOSING}")
+        
+        # Bütçe aşılırsa en az değerli bağlamdan başlayarak kırp:
+        # önce en eski özet satırları, sonra en eski ham mesajlar (güncel soru kalır), en son sondaki kaynaklar
+        system_tokens = cls.estimate_tokens(sys_instruction)
+        prompt = render()
+        tokens = system_tokens + cls.estimate_tokens(prompt)
+        while tokens > config.PROMPT_TOKEN_BUDGET:
+            if summary:
+                summary.pop(0)
+            elif len(turns) > 1:
+                turns.pop(0)
+            elif len(source_lines) > 1:
+                source_lines.pop()
+            else:
+                break
+            prompt = render()
+            tokens = system_tokens + cls.estimate_tokens(prompt)
+        
+        cls.record_stats(user_msg_count, tokens, sys_instruction, summary, turns, source_lines)
+        return sys_instruction, prompt
+    
+    @classmethod
+    def record_stats(cls, turn: int, tokens: int, sys_instruction: str,
+                     summary: List[str], turns: List[str], source_lines: List[str]):
+        """Tur başına prompt token raporu (oturumda son 50 tur)"""
+        metrics.REGISTRY.observe('prompt_tokens', tokens, buckets=metrics.SIZE_BUCKETS)
+        if 'prompt_stats' not in st.session_state:
+            st.session_state.prompt_stats = deque(maxlen=50)
+        st.session_state.prompt_stats.append({
+            'turn': turn,
+            'tokens': tokens,
+            'system': cls.estimate_tokens(sys_instruction),
+            'summary': cls.estimate_tokens("\n".join(summary)),
+            'history': cls.estimate_tokens("\n".join(turns)),
+            'sources': cls.estimate_tokens("\n".join(source_lines)),
+        })
 
-        # Hafıza ve Kaynaklar
-        context_text = "\n".join([f"{'Can' if m['role'] == 'user' else 'Dede'}: {m['content']}" for m in history[-8:]])
-        sources_text = "\n".join([f"- {s['baslik']}: {s.get('snippet', s['icerik'][:400])}" for s in sources[:2]]) if sources else "Kaynak yok."
+# ===================== RESPONSE CACHE =====================
 
-        # Teknik onarım: Kopuk bloklar senin kurguna göre birleştirildi.
-        return f"""{sys_instruction}
+class ResponseCache:
+    """Sık sorulan ilk-tur sorular için kalıcı cevap önbelleği (SQLite, LRU + TTL)"""
+    
+    REPLAY_CHUNK_CHARS = 40
+    
+    def __init__(self, path: str = config.CACHE_DB_PATH,
+                 max_entries: int = config.CACHE_MAX_ENTRIES,
+                 ttl: int = config.CACHE_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                answer TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hits INTEGER DEFAULT 0
+            )
+        ''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_access ON response_cache(last_access)")
+        self.conn.commit()
+    
+    @staticmethod
+    def make_key(query: str, sources: List[Dict]) -> str:
+        """Normalize sorgu + kaynak linkleri + prompt sürümünden anahtar üret. Model anahtara girmez:
+        cevabı hangi modelin (yönlendirici/hedge kazananı) verdiği okumada bilinemez"""
+        payload = json.dumps([
+            normalize_text(query),
+            [s.get('link', '') for s in sources],
+            PromptEngine.VERSION,
+        ], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT answer, created_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self.conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self.conn.commit()
+                return None
+            self.conn.execute(
+                "UPDATE response_cache SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            self.conn.commit()
+            return row[0]
+    
+    def put(self, key: str, answer: str):
+        now = time.time()
+        with self.lock:
+            self.conn.execute('''
+                INSERT INTO response_cache (key, answer, created_at, last_access)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    answer = excluded.answer,
+                    created_at = excluded.created_at,
+                    last_access = excluded.last_access
+            ''', (key, answer, now, now))
+            self.evict(now)
+            self.conn.commit()
+    
+    def evict(self, now: float):
+        """Süresi dolanları, ardından boyut sınırını aşan en eski erişilenleri sil"""
+        self.conn.execute("DELETE FROM response_cache WHERE created_at < ?", (now - self.ttl,))
+        self.conn.execute('''
+            DELETE FROM response_cache WHERE key IN (
+                SELECT key FROM response_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        ''', (self.max_entries,))
+    
+    @classmethod
+    def replay(cls, answer: str) -> Generator[str, None, None]:
+        """Önbellekteki cevabı canlı akış gibi parça parça ver"""
+        buffer = ""
+        for word in re.findall(r'\S+\s*|\s+', answer):
+            buffer += word
+            if len(buffer) >= cls.REPLAY_CHUNK_CHARS:
+                yield buffer
+                buffer = ""
+        if buffer:
+            yield buffer
 
-<GECMIS_MUHABBET>
-{context_text}
-</GECMIS_MUHABBET>
+# ===================== CONVERSATION STORE =====================
 
-<YOLPEDIA_BILGISI>
-{sources_text}
-NOT: Bu bilgileri mürşit bilgeliğiyle yoğurarak kullan. Asla kopyalayıp yapıştırma!
-</YOLPEDIA_BILGISI>
+class ConversationStore:
+    """Oturum kimliği -> mesajlar (SQLite); sayfalı okuma, süresi dolan sohbetler düzenli aralıkla silinir"""
+    
+    # 32 rastgele bayt (256 bit): kimlik URL'deki tek anahtar olduğu için tahmin edilemez olmalı
+    SESSION_ID_BYTES = 32
+    SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{43}$')
+    
+    def __init__(self, path: str = config.CONVERSATION_DB_PATH, ttl: int = config.CONVERSATION_TTL_SECONDS,
+                 prune_interval: int = config.CONVERSATION_PRUNE_INTERVAL):
+        self.path = path
+        self.ttl = ttl
+        self.prune_interval = prune_interval
+        self.last_prune = 0.0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS conversation_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp REAL NOT NULL
+            )
+        ''')
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_conversation_session ON conversation_messages(session_id, id)"
+        )
+        self.maybe_prune()
+    
+    @classmethod
+    def new_session_id(cls) -> str:
+        return secrets.token_urlsafe(cls.SESSION_ID_BYTES)
+    
+    @classmethod
+    def valid_session_id(cls, session_id: Optional[str]) -> bool:
+        return bool(session_id) and bool(cls.SESSION_ID_PATTERN.match(session_id))
+    
+    def exists(self, session_id: str) -> bool:
+        """Süresi dolmamış kayıtlı sohbet var mı (URL'den gelen kimlik sadece o zaman geri yüklenir)"""
+        self.maybe_prune()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT MAX(timestamp) FROM conversation_messages WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0] is not None and row[0] >= time.time() - self.ttl
+    
+    def append(self, session_id: str, message: Dict) -> int:
+        """Mesajı kaydet; kayıt id'si mesaja da yazılır (sayfalama için)"""
+        self.maybe_prune()
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT INTO conversation_messages (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
+                (session_id, message['role'], message['content'], message.get('timestamp', time.time()))
+            )
+            self.conn.commit()
+        message['id'] = cursor.lastrowid
+        return cursor.lastrowid
+    
+    def recent(self, session_id: str, limit: int, before_id: Optional[int] = None) -> List[Dict]:
+        """En yeni `limit` mesaj (before_id verilirse ondan öncekiler), eskiden yeniye sıralı"""
+        with self.lock:
+            rows = self.conn.execute('''
+                SELECT id, role, content, timestamp FROM conversation_messages
+                WHERE session_id = ? AND id < ?
+                ORDER BY id DESC LIMIT ?
+            ''', (session_id, before_id if before_id is not None else 2 ** 63 - 1, limit)).fetchall()
+        return [dict(row) for row in reversed(rows)]
+    
+    def has_before(self, session_id: str, before_id: int) -> bool:
+        with self.lock:
+            return self.conn.execute(
+                "SELECT 1 FROM conversation_messages WHERE session_id = ? AND id < ? LIMIT 1",
+                (session_id, before_id)
+            ).fetchone() is not None
+    
+    def clear(self, session_id: str):
+        with self.lock:
+            self.conn.execute("DELETE FROM conversation_messages WHERE session_id = ?", (session_id,))
+            self.conn.commit()
+    
+    def maybe_prune(self):
+        """Uzun çalışan süreçte de süresi dolan sohbetler silinsin diye en çok prune_interval'da bir temizle"""
+        now = time.time()
+        if now - self.last_prune < self.prune_interval:
+            return
+        with self.lock:
+            self.last_prune = now
+            self.prune(now)
+            self.conn.commit()
+    
+    def prune(self, now: float):
+        """Son mesajı TTL'den eski olan sohbetleri sil"""
+        self.conn.execute('''
+            DELETE FROM conversation_messages WHERE session_id IN (
+                SELECT session_id FROM conversation_messages
+                GROUP BY session_id HAVING MAX(timestamp) < ?
+            )
+        ''', (now - self.ttl,))
 
-Can'ın sözü: {query}
+# ===================== CONTEXT CACHE =====================
 
-Can Dede (RESPOND ONLY IN THE DETECTED LANGUAGE OF THE USER):"""
+class GeminiClient:
+    """google.generativeai üzerinde ince katman: süreç genelinde tek configure ve hazır model havuzu
+    (testlerde sahte istemciyle değiştirilebilir)"""
+    
+    # Değiştirilemez: tüm iş parçacıkları aynı nesneleri paylaşır
+    GENERATION_CONFIG = MappingProxyType({
+        "temperature": 0.7,
+        "max_output_tokens": 2048,
+        "top_p": 0.95,
+        "top_k": 40,
+    })
+    
+    # Enum yerine adlar: SDK aynı değerlere çevirir, sınıf tanımı SDK'yı içe aktarmayı gerektirmez
+    SAFETY_SETTINGS = MappingProxyType({
+        "HARM_CATEGORY_HARASSMENT": "BLOCK_NONE",
+        "HARM_CATEGORY_HATE_SPEECH": "BLOCK_NONE",
+        "HARM_CATEGORY_SEXUALLY_EXPLICIT": "BLOCK_NONE",
+        "HARM_CATEGORY_DANGEROUS_CONTENT": "BLOCK_NONE",
+    })
+    
+    MAX_MODELS = 16  # Model x talimat varyantı x (talimat / önbellek) için yeterli
+    
+    def __init__(self):
+        self.api_key = None
+        self.models: "OrderedDict[Tuple[str, str], object]" = OrderedDict()
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def sdk():
+        """google.generativeai ilk kullanımda içe aktarılır (~1 sn): sayfa açılışı beklemez"""
+        with metrics.REGISTRY.span('startup_phase', phase='genai_import'):
+            import google.generativeai as genai
+        return genai
+    
+    def configure(self, api_key: str):
+        """genai.configure global durumu değiştirir: anahtar değişmedikçe bir kez, kilit altında"""
+        if api_key == self.api_key:
+            return
+        with self.lock:
+            if api_key != self.api_key:
+                genai = self.sdk()
+                if config.GEMINI_ENDPOINT:
+                    genai.configure(api_key=api_key, transport="rest",
+                                    client_options={"api_endpoint": config.GEMINI_ENDPOINT})
+                else:
+                    genai.configure(api_key=api_key)
+                # Modeller istemciye ilk istekte bağlanır; sadece anahtar değişirse eskiler atılır
+                if self.api_key is not None:
+                    self.models.clear()
+                self.api_key = api_key
+    
+    def create_cached_content(self, model_name: str, system_instruction: str, ttl: int):
+        """Sunucuda önbellek oluştur; model adı sürüm içermeli (ör. models/gemini-1.5-flash-002)"""
+        if not model_name.startswith('models/'):
+            model_name = f"models/{model_name}"
+        return self.sdk().caching.CachedContent.create(
+            model=model_name,
+            display_name="can-dede-system",
+            system_instruction=system_instruction,
+            ttl=ttl
+        )
+    
+    def model(self, model_name: str, system_instruction: Optional[str] = None, cached_content=None):
+        """Havuzdan hazır model; yoksa bir kez kurulur ve iş parçacıkları arasında paylaşılır"""
+        if cached_content is not None:
+            key = (model_name, f"cache:{getattr(cached_content, 'name', cached_content)}")
+        else:
+            key = (model_name, hashlib.sha256((system_instruction or '').encode('utf-8')).hexdigest()[:16])
+        
+        with self.lock:
+            model = self.models.get(key)
+            if model is not None:
+                self.models.move_to_end(key)
+                return model
+        
+        genai = self.sdk()
+        if cached_content is not None:
+            model = genai.GenerativeModel.from_cached_content(
+                cached_content,
+                generation_config=self.GENERATION_CONFIG,
+                safety_settings=self.SAFETY_SETTINGS
+            )
+        else:
+            model = genai.GenerativeModel(
+                model_name,
+                generation_config=self.GENERATION_CONFIG,
+                safety_settings=self.SAFETY_SETTINGS,
+                system_instruction=system_instruction
+            )
+        
+        with self.lock:
+            model = self.models.setdefault(key, model)
+            while len(self.models) > self.MAX_MODELS:
+                self.models.popitem(last=False)
+        return model
+    
+    def warm(self, model_names: List[str], instructions: List[str]):
+        """Modelleri önceden kur (ağ çağrısı yapmaz; istemci ilk istekte bağlanır)"""
+        for model_name in model_names:
+            for instruction in instructions:
+                self.model(model_name, system_instruction=instruction)
+
+
+class ContextCache:
+    """Sabit sistem talimatı için cached-content kaydı: (prefix hash, model) -> (önbellek, bitiş)
+    Sadece min_tokens ve üstü önekler için çalışır; daha kısa önekler ve önbellek kullanılamadığında
+    model sistem talimatıyla (system_instruction) kurulur."""
+    
+    def __init__(self, client: Optional[GeminiClient] = None, ttl: int = config.CONTEXT_CACHE_TTL,
+                 refresh_margin: int = config.CONTEXT_CACHE_REFRESH,
+                 retry_after: int = config.CONTEXT_CACHE_RETRY,
+                 min_tokens: int = config.CONTEXT_CACHE_MIN_TOKENS):
+        self.client = client or GeminiClient()
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.retry_after = retry_after
+        self.min_tokens = min_tokens
+        self.entries: Dict[Tuple[str, str], Tuple[object, float]] = {}
+        self.unavailable: Dict[Tuple[str, str], float] = {}  # anahtar -> tekrar denenecek zaman
+        self.refreshing = set()
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(model_name: str, prefix: str) -> Tuple[str, str]:
+        return hashlib.sha256(prefix.encode('utf-8')).hexdigest()[:16], model_name
+    
+    def get(self, model_name: str, prefix: str):
+        """Geçerli önbellek; süresi yaklaşıyorsa tek bir iş parçacığı yeniler, diğerleri eskisini kullanır"""
+        # Alt sınırın altındaki önek sunucuda her seferinde reddedilir: istek yolunda RPC yapılmaz
+        if PromptEngine.estimate_tokens(prefix) < self.min_tokens:
+            return None
+        key = self.make_key(model_name, prefix)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[1] - now > self.refresh_margin:
+                return entry[0]
+            if self.unavailable.get(key, 0) > now:
+                return None
+            if key in self.refreshing:
+                return entry[0] if entry and entry[1] > now else None
+            self.refreshing.add(key)
+        
+        try:
+            cached = self.client.create_cached_content(model_name, prefix, self.ttl)
+        except Exception as e:
+            metrics.REGISTRY.error("context_cache", e, f"Sistem talimatı önbelleğe alınamadı ({model_name}): {e}")
+            with self.lock:
+                self.refreshing.discard(key)
+                self.entries.pop(key, None)
+                self.unavailable[key] = now + self.retry_after
+            return None
+        
+        with self.lock:
+            self.refreshing.discard(key)
+            self.entries[key] = (cached, now + self.ttl)
+        return cached
+    
+    def invalidate(self, model_name: str, prefix: str):
+        """Sunucuda silinmiş/geçersiz önbelleği unut (bir sonraki istekte yeniden oluşturulur)"""
+        with self.lock:
+            self.entries.pop(self.make_key(model_name, prefix), None)
+    
+    def model(self, model_name: str, prefix: str) -> Tuple[object, bool]:
+        """(model, önbellekten mi): önbellek yoksa veya kurulamazsa system_instruction'a düşer"""
+        cached = self.get(model_name, prefix)
+        if cached is not None:
+            try:
+                return self.client.model(model_name, cached_content=cached), True
+            except Exception as e:
+                metrics.REGISTRY.error("context_cache", e, f"Önbellekli model kurulamadı ({model_name}): {e}")
+                self.invalidate(model_name, prefix)
+        return self.client.model(model_name, system_instruction=prefix), False
+
+# ===================== ADMISSION CONTROL =====================
+
+class AdmissionTicket:
+    """Kuyruktaki bir istek"""
+    
+    __slots__ = ('seq', 'session_id', 'enqueued', 'admitted')
+    
+    def __init__(self, seq: int, session_id: str):
+        self.seq = seq
+        self.session_id = session_id
+        self.enqueued = time.monotonic()
+        self.admitted = None
+
+
+class AdmissionScheduler:
+    """Gemini çağrıları için süreç genelinde kabul kontrolü: eşzamanlılık sınırı + token bucket kota.
+    Sıra adildir: aktif isteği az olan, en uzun süredir hizmet almamış oturum önce kabul edilir."""
+    
+    def __init__(self, max_concurrent: int = config.MAX_CONCURRENT_REQUESTS,
+                 requests_per_minute: float = config.REQUESTS_PER_MINUTE,
+                 burst: int = config.REQUEST_BURST,
+                 max_queue: int = config.MAX_QUEUE_LENGTH,
+                 per_session: int = config.PER_SESSION_CONCURRENCY):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.per_session = per_session
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self.cond = threading.Condition()
+        self.waiting: List[AdmissionTicket] = []
+        self.active = 0
+        self.active_by_session: Dict[str, int] = {}
+        self.last_served: Dict[str, float] = {}
+        self.service_time = None  # Kabul edilen isteğin ortalama süresi (EWMA), bekleme tahmini için
+        self.sequence = itertools.count()
+    
+    def submit(self, session_id: str) -> Optional[AdmissionTicket]:
+        """Kuyruğa gir; kuyruk doluysa None (istek hemen yedek cevaba düşer)"""
+        with self.cond:
+            if len(self.waiting) >= self.max_queue:
+                return None
+            ticket = AdmissionTicket(next(self.sequence), session_id)
+            self.waiting.append(ticket)
+            return ticket
+    
+    def priority(self, ticket: AdmissionTicket) -> Tuple[int, float, int]:
+        return (self.active_by_session.get(ticket.session_id, 0),
+                self.last_served.get(ticket.session_id, 0.0),
+                ticket.seq)
+    
+    def ordered(self) -> List[AdmissionTicket]:
+        """Kabul sırası; oturum sınırındakiler sona kalır"""
+        return sorted(self.waiting, key=lambda t: (self.active_by_session.get(t.session_id, 0) >= self.per_session,
+                                                   self.priority(t)))
+    
+    def wait(self, ticket: AdmissionTicket, timeout: float) -> bool:
+        """Kabul edilene kadar en fazla `timeout` saniye bekle"""
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while True:
+                if ticket.admitted is not None:
+                    return True
+                order = self.ordered()
+                my_turn = (
+                    order and order[0] is ticket
+                    and self.active < self.max_concurrent
+                    and self.active_by_session.get(ticket.session_id, 0) < self.per_session
+                )
+                if my_turn and self.bucket.try_acquire():
+                    self.admit(ticket)
+                    return True
+                
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                # Sıra gelmişse kota dolana kadar, değilse başka bir isteğin bitmesine kadar bekle
+                delay = min(remaining, self.bucket.wait_time()) if my_turn else remaining
+                self.cond.wait(max(delay, 0.01))
+    
+    def admit(self, ticket: AdmissionTicket):
+        now = time.monotonic()
+        self.waiting.remove(ticket)
+        ticket.admitted = now
+        self.active += 1
+        self.active_by_session[ticket.session_id] = self.active_by_session.get(ticket.session_id, 0) + 1
+        self.last_served[ticket.session_id] = now
+        # Sıradaki bekleyen artık öne geçmiş olabilir
+        self.cond.notify_all()
+    
+    def cancel(self, ticket: AdmissionTicket):
+        with self.cond:
+            if ticket in self.waiting:
+                self.waiting.remove(ticket)
+            self.cond.notify_all()
+    
+    def release(self, ticket: AdmissionTicket):
+        with self.cond:
+            self.active -= 1
+            remaining = self.active_by_session.get(ticket.session_id, 1) - 1
+            if remaining > 0:
+                self.active_by_session[ticket.session_id] = remaining
+            else:
+                self.active_by_session.pop(ticket.session_id, None)
+            duration = time.monotonic() - ticket.admitted
+            self.service_time = duration if self.service_time is None else 0.8 * self.service_time + 0.2 * duration
+            if len(self.last_served) > 10000:
+                self.last_served.clear()
+            self.cond.notify_all()
+    
+    def status(self, ticket: AdmissionTicket) -> Tuple[int, float]:
+        """(sıradaki konum, tahmini bekleme saniyesi)"""
+        with self.cond:
+            order = self.ordered()
+            position = order.index(ticket) + 1 if ticket in order else 0
+            # Kota sınırı ve eşzamanlılık sınırından hangisi daha yavaşsa o belirler
+            quota_wait = max(0.0, position - self.bucket.tokens) / self.bucket.rate if self.bucket.rate else 0.0
+            slot_wait = (self.service_time or 0.0) * position / self.max_concurrent
+            return position, max(quota_wait, slot_wait)
+    
+    def try_extra(self) -> bool:
+        """Kabul edilmiş isteğin ek çağrısı (hedge) için kota varsa hemen al"""
+        return self.bucket.try_acquire()
+    
+    def acquire_extra(self, timeout: float) -> bool:
+        """Tekrar denemesi için kota bekle"""
+        return self.bucket.acquire(timeout=timeout)
+    
+    def throttle(self):
+        """Sunucu kota hatası: birikmiş hakları sıfırla, sabit hızda devam et"""
+        self.bucket.drain()
+    
+    def snapshot(self) -> Dict:
+        with self.cond:
+            return {'active': self.active, 'waiting': len(self.waiting),
+                    'service_time': self.service_time}
 
 # ===================== RESPONSE GENERATOR =====================
 
 class ResponseGenerator:
     """Cevap oluşturucu"""
     
-    def __init__(self, api_manager: APIManager):
+    def __init__(self, api_manager: APIManager, cache: Optional[ResponseCache] = None,
+                 context_cache: Optional[ContextCache] = None,
+                 scheduler: Optional[AdmissionScheduler] = None):
         self.api_manager = api_manager
         self.prompt_engine = PromptEngine()
+        self.cache = cache
+        self.context_cache = context_cache or ContextCache()
+        self.scheduler = scheduler
+    
+    def generate(self, query: str, sources: List[Dict], session_id: str = "",
+                 on_wait=None) -> Generator[str, None, None]:
+        """Cevap akışı; on_wait(konum, tahmini saniye) kuyrukta beklerken çağrılır, kabulde (0, 0).
+        Toplam süre, ilk parça süresi (TTFT), parça ve karakter sayısı ölçülür."""
+        span = metrics.REGISTRY.span('generate')
+        chunks = chars = 0
+        try:
+            for chunk in self.respond(query, sources, session_id, on_wait, span):
+                if not chunks:
+                    span.mark('first_token')
+                chunks += 1
+                chars += len(chunk)
+                yield chunk
+        except GeneratorExit:
+            span.status = 'cancelled'
+            raise
+        except Exception:
+            span.status = 'error'
+            raise
+        finally:
+            span.finish()
+            metrics.REGISTRY.observe('generate_chunks', chunks, buckets=metrics.SIZE_BUCKETS, status=span.status)
+            metrics.REGISTRY.observe('generate_chars', chars, buckets=metrics.SIZE_BUCKETS, status=span.status)
     
-    def generate(self, query: str, sources: List[Dict]) -> Generator[str, None, None]:
+    def respond(self, query: str, sources: List[Dict], session_id: str, on_wait,
+                span: metrics.Span) -> Generator[str, None, None]:
+        """generate'in gövdesi: önbellek, kabul kontrolü ve model çağrısı (yedek cevaplarda span durumu işlenir)"""
         # TEKNİK DÜZELTME: Sabit selamlaşma kontrolü kaldırıldı.
         # Artık her mesaj doğrudan AI'ya gidiyor, böylece dili anında algılayıp o dilde cevap veriyor.
         
+        # Önbellek sadece ilk turda: sonraki turlarda geçmiş prompt'u değiştirir
+        use_cache = self.cache is not None and self.prompt_engine.is_first_turn()
+        if use_cache:
+            cached = self.cache.get(self.cache.make_key(query, sources))
+            if cached:
+                span.status = 'cache'
+                yield from self.cache.replay(cached)
+                return
+        
         api_key = self.api_manager.get_api_key()
         if not api_key:
+            span.status = 'no_key'
             yield "Teknik bir aksaklık var, lutfen az sonra tekrar dene."
             return
     
-        prompt = self.prompt_engine.build_prompt(query, sources)
+        # Sabit talimat sunucuda önbelleğe alınır; her turda sadece değişen kısım gönderilir
+        system_instruction, prompt = self.prompt_engine.build_parts(query, sources)
+        
+        # Kabul kontrolü: kuyruk doluysa veya bekleme çok uzarsa kaynaklarla cevap ver
+        ticket = None
+        if self.scheduler is not None:
+            ticket = self.scheduler.submit(session_id)
+            if ticket is None:
+                span.status = 'queue_full'
+                yield self.get_no_api_response(query, sources)
+                return
+            deadline = time.monotonic() + config.MAX_QUEUE_WAIT_SECONDS
+            try:
+                while not self.scheduler.wait(ticket, timeout=0.5):
+                    if time.monotonic() >= deadline:
+                        self.scheduler.cancel(ticket)
+                        span.status = 'queue_timeout'
+                        metrics.REGISTRY.observe('admission_wait_seconds', time.monotonic() - ticket.enqueued,
+                                                 admitted=False)
+                        yield self.get_no_api_response(query, sources)
+                        return
+                    if on_wait:
+                        on_wait(*self.scheduler.status(ticket))
+            except BaseException:
+                # Oturum beklerken kapanırsa kuyrukta yer tutmasın
+                self.scheduler.cancel(ticket)
+                raise
+            metrics.REGISTRY.observe('admission_wait_seconds', time.monotonic() - ticket.enqueued, admitted=True)
+            if on_wait:
+                on_wait(0, 0.0)
+        
+        try:
+            yield from self.generate_admitted(query, sources, api_key, system_instruction, prompt, use_cache, span)
+        finally:
+            if ticket is not None:
+                self.scheduler.release(ticket)
+    
+    def generate_admitted(self, query: str, sources: List[Dict], api_key: str, system_instruction: str,
+                          prompt: str, use_cache: bool, span: metrics.Span) -> Generator[str, None, None]:
+        self.context_cache.client.configure(api_key)
+        router = self.api_manager.router
         
         # TEKNİK DÜZELTME: İkinci gereksiz döngü kaldırıldı, ilk döngü birleştirildi
+        # Her denemede en hızlı sağlıklı model seçilir; başarısız olanlar bu istekte tekrar denenmez
+        tried = []
+        error = None
         for attempt in range(3):
+            # Tekrar denemeleri de kotadan düşer
+            if attempt > 0 and self.scheduler is not None and not self.scheduler.acquire_extra(timeout=5.0):
+                break
+            model_name = router.acquire(exclude=tried)
+            if model_name is None:
+                break
+            tried.append(model_name)
+            
             try:
-                genai.configure(api_key=api_key)
-                model = genai.GenerativeModel(self.api_manager.get_current_model())
-                response = model.generate_content(
-                    prompt,
-                    stream=True,
-                    generation_config={
-                        "temperature": 0.7,
-                        "max_output_tokens": 2048,
-                        "top_p": 0.95,
-                        "top_k": 40,
-                    },
-                    safety_settings={
-                        HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-                        HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-                        HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-                        HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-                    }
-                )
+                parts = []
+                for _, text in self.race(model_name, tried, system_instruction, prompt):
+                    parts.append(text)
+                    yield text
                 
-                for chunk in response:
-                    if chunk.text:
-                        yield chunk.text
+                if use_cache and parts:
+                    self.cache.put(self.cache.make_key(query, sources), ''.join(parts))
                 return 
                 
             except Exception as e:
-                if attempt < 2:
-                    self.api_manager.rotate_model()
+                error = e
+                metrics.REGISTRY.error('gemini', e)
+                if router.is_quota_error(e) and self.scheduler is not None:
+                    self.scheduler.throttle()
+                continue
+        
+        # Kota aşımında hata yerine kaynaklarla cevap verilir
+        if error is None or router.is_quota_error(error):
+            span.status = 'fallback'
+            yield self.get_no_api_response(query, sources)
+        else:
+            span.status = 'error'
+            yield self.get_error_response(query, sources, str(error))
+    
+    def stream_model(self, model_name: str, system_instruction: str, prompt: str,
+                     events: queue.Queue, cancel: threading.Event):
+        """Bir modelden akışı okuyup olay kuyruğuna yaz; ölçümleri router'a bildir (iş parçacığında)"""
+        router = self.api_manager.router
+        span = metrics.REGISTRY.span('gemini', model=model_name)
+        started = time.monotonic()
+        first_token = None
+        chars = 0
+        from_cache = False
+        try:
+            model, from_cache = self.context_cache.model(model_name, system_instruction)
+            metrics.REGISTRY.increment('context_cache_total', model=model_name, hit=from_cache)
+            response = model.generate_content(prompt, stream=True)
+            span.mark('connect')
+            for chunk in response:
+                if cancel.is_set():
+                    router.release(model_name)
+                    span.finish('cancelled')
+                    return
+                if chunk.text:
+                    if first_token is None:
+                        first_token = time.monotonic()
+                        span.mark('first_token')
+                    chars += len(chunk.text)
+                    events.put((model_name, 'text', chunk.text))
+        except Exception as e:
+            if from_cache:
+                self.context_cache.invalidate(model_name, system_instruction)
+            if cancel.is_set():
+                router.release(model_name)
+                span.finish('cancelled')
+            else:
+                router.record_failure(model_name, e)
+                span.finish('error')
+            events.put((model_name, 'error', e))
+            return
+        
+        span.finish()
+        finished = time.monotonic()
+        if first_token is None:
+            router.record_success(model_name, finished - started, 0, 0.0)
+        else:
+            router.record_success(model_name, first_token - started,
+                                  chars // PromptEngine.CHARS_PER_TOKEN, finished - first_token)
+        events.put((model_name, 'done', None))
+    
+    def race(self, model_name: str, tried: List[str], system_instruction: str,
+             prompt: str) -> Generator[Tuple[str, str], None, None]:
+        """(model, metin) akışı; ilk token gecikirse ikinci modele paralel (hedged) istek atılır,
+        ilk token'ı getiren kazanır, diğeri iptal edilir"""
+        router = self.api_manager.router
+        events = queue.Queue()
+        cancels = {}
+        
+        def start(name: str):
+            cancels[name] = threading.Event()
+            threading.Thread(target=self.stream_model, daemon=True,
+                             args=(name, system_instruction, prompt, events, cancels[name])).start()
+        
+        start(model_name)
+        hedge_at = None
+        if config.HEDGE_ENABLED and len(router.models) > 1:
+            hedge_at = time.monotonic() + router.hedge_delay(model_name)
+        
+        winner = None
+        failed = set()
+        try:
+            while True:
+                timeout = None if hedge_at is None else max(0.0, hedge_at - time.monotonic())
+                try:
+                    name, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    # İlk token gecikti: sıradaki sağlıklı model yarışa girer
+                    hedge_at = None
+                    hedge_name = None
+                    if self.scheduler is None or self.scheduler.try_extra():
+                        hedge_name = router.acquire(exclude=tried)
+                    if hedge_name is not None:
+                        tried.append(hedge_name)
+                        start(hedge_name)
                     continue
-                else:
-                    yield self.get_error_response(query, sources, str(e))
+                
+                if winner is None and kind != 'error':
+                    winner = name
+                    hedge_at = None
+                    for other, cancel in cancels.items():
+                        if other != winner:
+                            cancel.set()
+                if name != winner:
+                    if kind == 'error':
+                        failed.add(name)
+                        if failed == set(cancels):
+                            raise payload
+                    continue
+                
+                if kind == 'text':
+                    yield name, payload
+                elif kind == 'done':
                     return
+                else:
+                    raise payload
+        finally:
+            # Tüketici erken bırakırsa (ör. oturum kapandı) akışlar da durur
+            for cancel in cancels.values():
+                cancel.set()
     
     @staticmethod
     def check_greeting(query: str) -> Optional[str]:
@@ -388,21 +1993,100 @@ class ResponseGenerator:
 
 # ===================== SESSION STATE =====================
 
+@st.cache_resource(show_spinner=False)
+def get_knowledge_base() -> KnowledgeBase:
+    """Tüm oturumların paylaştığı tek bilgi tabanı (süreç başına bir kez yüklenir)"""
+    return KnowledgeBase()
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache() -> ResponseCache:
+    """Süreç genelinde paylaşılan cevap önbelleği"""
+    return ResponseCache()
+
+@st.cache_resource(show_spinner=False)
+def get_conversation_store() -> ConversationStore:
+    """Süreç genelinde paylaşılan sohbet kaydı"""
+    return ConversationStore()
+
+@st.cache_resource(show_spinner=False)
+def get_admission_scheduler() -> AdmissionScheduler:
+    """Tüm oturumların Gemini çağrılarını sıraya koyan ortak zamanlayıcı"""
+    return AdmissionScheduler()
+
+@st.cache_resource(show_spinner=False)
+def get_model_router() -> ModelRouter:
+    """Tüm oturumların paylaştığı model ölçümleri ve devre kesiciler"""
+    return ModelRouter()
+
+@st.cache_resource(show_spinner=False)
+def get_context_cache() -> ContextCache:
+    """Süreç genelinde paylaşılan sistem talimatı önbelleği kaydı ve model havuzu"""
+    return ContextCache()
+
+@st.cache_resource(show_spinner=False)
+def start_model_warmup() -> threading.Thread:
+    """Gemini SDK'sını ve modelleri arka planda hazırla (süreç başına bir kez, sayfa çizildikten
+    sonra): ilk sayfa SDK içe aktarmasını beklemez, ilk soruya kadar modeller genelde hazırdır"""
+    thread = threading.Thread(
+        target=get_context_cache().client.warm,
+        args=(config.GEMINI_MODELS, [PromptEngine.system_instruction(False), PromptEngine.system_instruction(True)]),
+        name="gemini-warmup", daemon=True
+    )
+    thread.start()
+    return thread
+
 def init_session():
     """Session state'i başlat"""
     if 'kb' not in st.session_state:
-        st.session_state.kb = KnowledgeBase()
+        st.session_state.kb = get_knowledge_base()
     if 'api_manager' not in st.session_state:
-        st.session_state.api_manager = APIManager()
+        st.session_state.api_manager = APIManager(get_model_router())
     if 'response_generator' not in st.session_state:
-        st.session_state.response_generator = ResponseGenerator(st.session_state.api_manager)
+        st.session_state.response_generator = ResponseGenerator(
+            st.session_state.api_manager, cache=get_response_cache(), context_cache=get_context_cache(),
+            scheduler=get_admission_scheduler()
+        )
     if 'messages' not in st.session_state:
-        st.session_state.messages = deque(maxlen=config.MAX_HISTORY_MESSAGES)
-        st.session_state.messages.append({
-            "role": "assistant",
-            "content": "Merhaba, Can Dost! Ben Can Dede. Buyur, ne bilmek istersin?",
-            "timestamp": time.time()
-        })
+        # Oturum kimliği URL'de tutulur: sayfa yenilense veya sunucu yeniden başlasa da sohbet yüklenir.
+        # Sadece sunucunun verdiği ve süresi dolmamış kimlikler kabul edilir; diğerlerine yeni kimlik verilir
+        store = get_conversation_store()
+        session_id = st.query_params.get('sid')
+        if not (ConversationStore.valid_session_id(session_id) and store.exists(session_id)):
+            session_id = new_session()
+        st.session_state.session_id = session_id
+        reset_history(store.recent(session_id, config.MAX_HISTORY_MESSAGES))
+        if not st.session_state.messages:
+            add_message({
+                "role": "assistant",
+                "content": "Merhaba, Can Dost! Ben Can Dede. Buyur, ne bilmek istersin?",
+                "timestamp": time.time()
+            })
+
+def new_session() -> str:
+    """Yeni oturum kimliği üret ve URL'ye yaz"""
+    session_id = ConversationStore.new_session_id()
+    st.query_params['sid'] = session_id
+    st.session_state.session_id = session_id
+    return session_id
+
+def reset_history(messages: List[Dict]):
+    """Bellekteki geçmişi ve görüntüleme penceresini sıfırla"""
+    st.session_state.messages = deque(messages, maxlen=config.MAX_HISTORY_MESSAGES)
+    st.session_state.earlier_messages = []
+    st.session_state.visible_messages = config.RENDER_WINDOW
+    st.session_state.pop('history_summary', None)
+
+def add_message(message: Dict):
+    """Mesajı geçmişe ekle ve kalıcı olarak kaydet"""
+    messages = st.session_state.messages
+    # Dolu deque'den düşen mesaj, yüklenmiş eski sayfalarla arada boşluk kalmasın diye taşınır
+    if len(messages) == messages.maxlen and st.session_state.earlier_messages:
+        st.session_state.earlier_messages.append(messages[0])
+    messages.append(message)
+    try:
+        get_conversation_store().append(st.session_state.session_id, message)
+    except sqlite3.Error as e:
+        metrics.REGISTRY.error("conversation_store", e, f"Sohbet kaydedilemedi: {e}")
 
 # ===================== SECURITY =====================
 
@@ -437,12 +2121,36 @@ def render_header():
     </div>
     """, unsafe_allow_html=True)
 
+@lru_cache(maxsize=2048)
+def message_footer(timestamp: float) -> str:
+    """Tamamlanmış mesajların saat satırı bir kez biçimlenir"""
+    clock = datetime.fromtimestamp(timestamp).strftime("%H:%M")
+    return f'<div style="text-align: right; font-size: 0.8rem; color: #888; margin-top: 0.3rem;">{clock}</div>'
+
 def render_message(message: Dict):
     avatar = config.CAN_DEDE_ICON if message["role"] == "assistant" else config.USER_ICON
     with st.chat_message(message["role"], avatar=avatar):
         st.markdown(message["content"])
-        timestamp = datetime.fromtimestamp(message.get("timestamp", time.time())).strftime("%H:%M")
-        st.markdown(f'<div style="text-align: right; font-size: 0.8rem; color: #888; margin-top: 0.3rem;">{timestamp}</div>', unsafe_allow_html=True)
+        st.markdown(message_footer(message.get("timestamp") or time.time()), unsafe_allow_html=True)
+
+def render_history():
+    """Sadece son `visible_messages` mesajı çiz; daha eskileri istenirse kayıttan sayfa sayfa yükle"""
+    loaded = st.session_state.earlier_messages + list(st.session_state.messages)
+    visible = st.session_state.visible_messages
+    
+    oldest_id = loaded[0].get('id') if loaded else None
+    has_more = len(loaded) > visible or (
+        oldest_id is not None and get_conversation_store().has_before(st.session_state.session_id, oldest_id)
+    )
+    if has_more and st.button("Daha eski mesajlar", key="load_earlier", use_container_width=True):
+        if len(loaded) <= visible:
+            page = get_conversation_store().recent(st.session_state.session_id, config.RENDER_WINDOW, oldest_id)
+            st.session_state.earlier_messages = page + st.session_state.earlier_messages
+            loaded = page + loaded
+        visible = st.session_state.visible_messages = visible + config.RENDER_WINDOW
+    
+    for message in loaded[-visible:]:
+        render_message(message)
 
 def render_sources(sources: List[Dict]):
     if not sources: return
@@ -453,9 +2161,136 @@ def render_sources(sources: List[Dict]):
             col1, col2 = st.columns([4, 1])
             with col1:
                 st.markdown(f"**{i}. {source['baslik']}**")
-                if source.get('snippet'): st.markdown(f"*{source['snippet']}*")
+                if source.get('snippet_vurgu'): st.markdown(f"*{source['snippet_vurgu']}*")
+                elif source.get('snippet'): st.markdown(f"*{snippets.escape_markdown(source['snippet'])}*")
             with col2: st.link_button("🔗 Git", source['link'])
 
+class StreamRenderer:
+    """Akan cevabı zaman ve karakter eşiğiyle toplu çizer: her parçada tüm metin yeniden
+    gönderilmez. İlk parça hemen çizilir (ilk görüntü süresi ölçülür), sonda imleçsiz son kare."""
+    
+    CURSOR = "▌"
+    
+    def __init__(self, placeholder, started: Optional[float] = None,
+                 interval: float = config.STREAM_RENDER_INTERVAL,
+                 min_chars: float = config.STREAM_RENDER_MIN_CHARS):
+        self.placeholder = placeholder
+        self.started = started or time.monotonic()
+        self.interval = interval
+        self.min_chars = min_chars
+        self.parts: List[str] = []
+        self.pending = 0
+        self.last_paint = 0.0
+        self.first_paint = None
+        self.frames = 0
+        self.chunks = 0
+    
+    def add(self, chunk: str):
+        if not chunk:
+            return
+        self.parts.append(chunk)
+        self.chunks += 1
+        self.pending += len(chunk)
+        now = time.monotonic()
+        if self.first_paint is None or now - self.last_paint >= self.interval or self.pending >= self.min_chars:
+            self.paint(self.text() + self.CURSOR, now)
+    
+    def text(self) -> str:
+        if len(self.parts) > 1:
+            self.parts = [''.join(self.parts)]
+        return self.parts[0] if self.parts else ''
+    
+    def paint(self, content: str, now: float):
+        self.placeholder.markdown(content)
+        if self.first_paint is None:
+            self.first_paint = now - self.started
+        self.last_paint = now
+        self.pending = 0
+        self.frames += 1
+    
+    def finish(self) -> str:
+        """Son kareyi imleçsiz çiz ve tam metni döndür"""
+        text = self.text()
+        self.paint(text, time.monotonic())
+        self.record_stats()
+        return text
+    
+    def record_stats(self):
+        if 'render_stats' not in st.session_state:
+            st.session_state.render_stats = deque(maxlen=50)
+        st.session_state.render_stats.append({
+            'first_paint': round(self.first_paint, 3),
+            'frames': self.frames,
+            'chunks': self.chunks,
+            'chars': len(self.text()),
+        })
+
+# ===================== ADMIN PANEL =====================
+
+def is_admin() -> bool:
+    """Yönetici oturumu: URL'deki ?admin=... secrets'taki ADMIN_TOKEN ile eşleşirse (oturum boyunca)"""
+    if 'is_admin' not in st.session_state:
+        token = st.secrets.get("ADMIN_TOKEN", "") or os.environ.get("YOLPEDIA_ADMIN_TOKEN", "")
+        given = st.query_params.get('admin', '')
+        st.session_state.is_admin = bool(token) and secrets.compare_digest(given, token)
+        # Anahtar paylaşılan linklerde kalmasın
+        if 'admin' in st.query_params:
+            del st.query_params['admin']
+    return st.session_state.is_admin
+
+def publish_runtime_gauges():
+    """Router ve kuyruk durumunu Prometheus göstergelerine aktar"""
+    for model, stats in get_model_router().snapshot().items():
+        if stats['ttft'] is not None:
+            metrics.REGISTRY.set_gauge('model_ttft_seconds', stats['ttft'], model=model)
+        if stats['tokens_per_sec'] is not None:
+            metrics.REGISTRY.set_gauge('model_tokens_per_second', stats['tokens_per_sec'], model=model)
+        metrics.REGISTRY.set_gauge('model_error_rate', stats['error_rate'], model=model)
+        metrics.REGISTRY.set_gauge('model_breaker_open', int(stats['open']), model=model)
+    scheduler = get_admission_scheduler().snapshot()
+    metrics.REGISTRY.set_gauge('admission_active', scheduler['active'])
+    metrics.REGISTRY.set_gauge('admission_waiting', scheduler['waiting'])
+
+def render_admin_panel():
+    """Aşama süreleri (p50/p95/p99), model ve kuyruk durumu, son hatalar, yavaş tur profilleri"""
+    publish_runtime_gauges()
+    registry = metrics.REGISTRY
+    with st.expander("📊 Ölçümler", expanded=False):
+        st.dataframe(registry.summary(), hide_index=True, use_container_width=True)
+        
+        st.caption("Modeller")
+        st.dataframe([dict(model=model, **stats) for model, stats in get_model_router().snapshot().items()],
+                     hide_index=True, use_container_width=True)
+        scheduler = get_admission_scheduler().snapshot()
+        st.caption(f"Kuyruk: {scheduler['active']} aktif, {scheduler['waiting']} bekleyen")
+        st.caption(f"Başlangıç: {st.session_state.kb.startup_report()}")
+        
+        for key, title in (('prompt_stats', "Son prompt'lar (tahmini token)"), ('render_stats', "Son çizimler")):
+            if st.session_state.get(key):
+                st.caption(title)
+                st.dataframe(list(st.session_state[key])[-10:], hide_index=True, use_container_width=True)
+        
+        # Profil süreç geneli bir ayardır: açıkken turların bir kısmı cProfile ile ölçülür
+        profiling = st.toggle("Yavaş turları profille", value=registry.profile_slow_seconds > 0)
+        if profiling:
+            registry.profile_slow_seconds = st.number_input(
+                "Eşik (sn)", min_value=0.1, value=registry.profile_slow_seconds or config.PROFILE_SLOW_SECONDS)
+            registry.profile_rate = st.slider("Örnekleme oranı", 0.0, 1.0, registry.profile_rate or 0.1)
+        else:
+            registry.profile_slow_seconds = 0.0
+        for profile in reversed(list(registry.profiles)):
+            clock = datetime.fromtimestamp(profile['time']).strftime("%H:%M:%S")
+            with st.popover(f"{clock} · {profile['span']} · {profile['seconds']} sn", use_container_width=True):
+                st.code(profile['stats'], language=None)
+        
+        if registry.errors:
+            st.caption("Son hatalar")
+            st.dataframe([dict(e, time=datetime.fromtimestamp(e['time']).strftime("%H:%M:%S"))
+                          for e in reversed(list(registry.errors))], hide_index=True, use_container_width=True)
+        
+        st.download_button("Prometheus çıktısı", registry.prometheus(), file_name="yolpedia_metrics.prom",
+                           mime="text/plain", use_container_width=True)
+
 # ===================== MAIN APPLICATION =====================
 
 def main():
@@ -490,11 +2325,17 @@ def main():
         
         st.markdown("---")
         if st.button("Sohbeti Temizle", use_container_width=True):
-            st.session_state.messages = deque(maxlen=config.MAX_HISTORY_MESSAGES)
-            st.session_state.messages.append({"role": "assistant", "content": "Sohbet temizlendi! Yeni bir sohbet başlatalım mı, can dost?", "timestamp": time.time()})
+            get_conversation_store().clear(st.session_state.session_id)
+            # Eski bağlantı paylaşılmış olabilir: yeni sohbet yeni kimlikle devam eder
+            new_session()
+            reset_history([])
+            add_message({"role": "assistant", "content": "Sohbet temizlendi! Yeni bir sohbet başlatalım mı, can dost?", "timestamp": time.time()})
             st.rerun()
         st.markdown("---")
         
+        if is_admin():
+            render_admin_panel()
+        
         st.caption('''
         **YolPedia | Can Dede**
         
@@ -504,28 +2345,46 @@ def main():
         ''') 
         
     render_header()
-    for message in st.session_state.messages: render_message(message)
+    render_history()
+    start_model_warmup()
     
     if user_input := st.chat_input("Can Dede'ye sor..."):
         user_input = SecurityManager.sanitize_input(user_input)
         if not user_input: st.stop()
         
-        user_message = {"role": "user", "content": user_input, "timestamp": time.time()}
-        st.session_state.messages.append(user_message)
-        render_message(user_message)
-        
-        sources = st.session_state.kb.search(user_input)
-        
-        with st.chat_message("assistant", avatar=config.CAN_DEDE_ICON):
-            placeholder = st.empty()
-            full_response = ""
-            with st.spinner("Can Dede düşünüyor..."):
-                for chunk in st.session_state.response_generator.generate(user_input, sources):
-                    full_response += chunk
-                    placeholder.markdown(full_response + "▌")
-            placeholder.markdown(full_response)
-            if sources and "eyvallah" not in user_input.lower(): render_sources(sources)
-            st.session_state.messages.append({"role": "assistant", "content": full_response, "timestamp": time.time()})
+        request_started = time.monotonic()
+        # Turun tamamı ölçülür; profil açıksa yavaş turların cProfile dökümü panelde görünür
+        with metrics.REGISTRY.span('turn', profile=True):
+            user_message = {"role": "user", "content": user_input, "timestamp": time.time()}
+            add_message(user_message)
+            render_message(user_message)
+            
+            sources = st.session_state.kb.search(user_input)
+            
+            with st.chat_message("assistant", avatar=config.CAN_DEDE_ICON):
+                queue_status = st.empty()
+                renderer = StreamRenderer(st.empty(), started=request_started)
+                
+                def show_queue(position: int, eta: float):
+                    if position:
+                        queue_status.caption(f"Şu an çok yoğunuz, sıradasın: {position}. (tahmini ~{max(1, round(eta))} sn)")
+                    else:
+                        queue_status.empty()
+                
+                with st.spinner("Can Dede düşünüyor..."):
+                    for chunk in st.session_state.response_generator.generate(
+                        user_input, sources, session_id=st.session_state.session_id, on_wait=show_queue
+                    ):
+                        renderer.add(chunk)
+                full_response = renderer.finish()
+                if sources and "eyvallah" not in user_input.lower(): render_sources(sources)
+                add_message({"role": "assistant", "content": full_response, "timestamp": time.time()})
+        if config.METRICS_TEXTFILE:
+            publish_runtime_gauges()
+            try:
+                metrics.REGISTRY.write_textfile(config.METRICS_TEXTFILE)
+            except OSError as e:
+                metrics.REGISTRY.error("metrics_export", e, f"Ölçümler yazılamadı: {e}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Uçtan uca performans ölçümü: sentetik derlem üzerinde soğuk/sıcak yükleme, arama, prompt ve
+cevap akışı. Ağ gerekmez; Gemini yerine sahte akış modeli kullanılır. Sonuçlar JSON olarak
+yazılır, önceki bir sonuçla karşılaştırılır; eşiği aşan yavaşlama varsa çıkış kodu 1 olur.
+Kullanım:
+    python benchmarks/app_bench.py --sizes 1k,3k --output bench.json
+    python benchmarks/app_bench.py --sizes 1k --baseline bench.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+warnings.filterwarnings("ignore")
+
+import streamlit as st
+
+import app
+import corpus
+import dataset
+import index_artifact
+import metrics
+from normalizer import normalize_many
+
+SCHEMA_VERSION = 1
+
+# Mutlak eşik: bundan küçük farklar gürültü sayılır (birime göre)
+NOISE_FLOOR = {'_ms': 0.5, '_s': 0.01}
+
+
+# ===================== SAHTE GEMINI =====================
+
+class FakeChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeModel:
+    """Sabit metni parça parça akıtan model; `ttft` ve `chunk_delay` ile ağ gecikmesi taklit edilir"""
+
+    def __init__(self, chunks: int, chunk_chars: int, ttft: float = 0.0, chunk_delay: float = 0.0):
+        self.chunks = chunks
+        self.text = ("Erenler, muhabbet yol ile olur. " * (chunk_chars // 32 + 1))[:chunk_chars]
+        self.ttft = ttft
+        self.chunk_delay = chunk_delay
+
+    def generate_content(self, prompt: str, stream: bool = True):
+        if self.ttft:
+            time.sleep(self.ttft)
+        for i in range(self.chunks):
+            if i and self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            yield FakeChunk(self.text)
+
+
+class FakeClient(app.GeminiClient):
+    """Ağ yerine FakeModel döndüren istemci (önbellek oluşturma da başarılı sayılır)"""
+
+    def __init__(self, model: FakeModel):
+        super().__init__()
+        self.fake_model = model
+
+    def configure(self, api_key: str):
+        pass
+
+    def create_cached_content(self, model_name: str, system_instruction: str, ttl: int):
+        return f"cachedContents/bench-{model_name}"
+
+    def model(self, model_name: str, system_instruction: Optional[str] = None, cached_content=None):
+        return self.fake_model
+
+
+class BenchAPIManager(app.APIManager):
+    def load_api_key(self) -> Optional[str]:
+        return "bench-api-key-not-used"
+
+
+# ===================== YARDIMCILAR =====================
+
+def percentiles(values: List[float], scale: float = 1000.0) -> Dict[str, float]:
+    """p50/p99 (varsayılan milisaniye); metrics.Histogram ile aynı hesap"""
+    histogram = metrics.Histogram(reservoir=max(1, len(values)))
+    for value in values:
+        histogram.observe(value)
+    result = histogram.percentiles((0.5, 0.99))
+    return {'p50': round(result.get(0.5, 0.0) * scale, 3), 'p99': round(result.get(0.99, 0.0) * scale, 3)}
+
+
+def timed(func) -> float:
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def use_workdir(workdir: str, data_dir: str):
+    """Uygulamanın tüm dosya yollarını geçici dizine yönlendir"""
+    app.config.DB_PATH = os.path.join(workdir, "yolpedia.db")
+    app.config.DATA_DIR = data_dir
+    app.config.DATA_FILE = os.path.join(workdir, "yolpedia_data.json")
+    app.config.VECTOR_INDEX_DIR = os.path.join(workdir, "yolpedia_vectors")
+    app.config.INDEX_ARTIFACT_DIR = os.path.join(workdir, "yolpedia_index")
+
+
+def reset_session(history: int = 0):
+    """Bare modda da çalışan st.session_state üzerinde sahte sohbet geçmişi"""
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+    messages = deque(maxlen=app.config.MAX_HISTORY_MESSAGES)
+    answers = corpus.generate_posts(history, seed=1)
+    for i in range(history):
+        role = 'user' if i % 2 == 0 else 'assistant'
+        text = "Semah nedir, cem içinde nasıl dönülür?" if role == 'user' else answers[i]['icerik'][:1500]
+        messages.append({'role': role, 'content': text, 'timestamp': time.time()})
+    st.session_state.messages = messages
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# ===================== ÖLÇÜMLER =====================
+
+def bench_normalize(posts: List[Dict]) -> Dict[str, float]:
+    texts = [f"{p['baslik']} {p['icerik']}" for p in posts]
+    megabytes = sum(len(t.encode('utf-8')) for t in texts) / 1e6
+    single = min(timed(lambda: [app.KnowledgeBase.normalize_text(t) for t in texts]) for _ in range(3))
+    batch = timed(lambda: normalize_many(texts))
+    return {
+        'normalize_ms_per_mb': round(single * 1000 / megabytes, 3),
+        'normalize_batch_ms_per_mb': round(batch * 1000 / megabytes, 3),
+    }
+
+
+def bench_load(posts: List[Dict], workdir: str) -> Tuple[Dict[str, float], "app.KnowledgeBase"]:
+    data_dir = os.path.join(workdir, "yolpedia_data")
+    corpus.write_corpus(posts, data_dir)
+    use_workdir(workdir, data_dir)
+
+    results = {}
+    kb = None
+
+    def load():
+        nonlocal kb
+        if kb is not None:
+            kb.close()
+        kb = app.KnowledgeBase()
+
+    # Soğuk: boş veritabanı (şema, tüm kayıtlar, FTS ve vektör indeksi kurulur)
+    results['cold_load_s'] = round(timed(load), 4)
+    # Sıcak: veri seti değişmedi (sadece manifest parmak izi)
+    results['warm_load_s'] = round(min(timed(load) for _ in range(3)), 4)
+    # Artımlı: kayıtların %1'i değişti (sadece değişenler yazılır, vektör indeksi yeniden kurulur)
+    changed = [dict(p) for p in posts]
+    for p in changed[::100]:
+        p['icerik'] = p['icerik'][::-1]
+    dataset.write_dataset(changed, data_dir)
+    results['incremental_load_s'] = round(timed(load), 4)
+    dataset.write_dataset(posts, data_dir)
+    load()
+    # Hazır paketten: boş veritabanına paket kopyalanır (parse, normalizasyon, indeks kurulumu yok)
+    index_artifact.write(app.config.INDEX_ARTIFACT_DIR, app.config.DB_PATH, app.config.VECTOR_INDEX_DIR,
+                         kb.data_hash, len(posts))
+    kb.close()
+    os.remove(app.config.DB_PATH)
+    shutil.rmtree(app.config.VECTOR_INDEX_DIR, ignore_errors=True)
+    kb = None
+    results['artifact_load_s'] = round(timed(load), 4)
+    return results, kb
+
+
+def bench_search(kb: "app.KnowledgeBase", queries: List[str], rounds: int) -> Dict[str, float]:
+    def build_fuzzy():
+        kb._fuzzy_index = None
+        return kb.fuzzy_index
+
+    results = {'fuzzy_build_s': round(min(timed(build_fuzzy) for _ in range(3)), 4)}
+    for query in queries:   # Isınma: bağlantılar, sorgu planları, özellik önbellekleri
+        kb.search(query)
+    latencies = []
+    for _ in range(rounds):
+        for query in queries:
+            latencies.append(timed(lambda: kb.search(query)))
+    stats = percentiles(latencies)
+    results['search_p50_ms'] = stats['p50']
+    results['search_p99_ms'] = stats['p99']
+    return results
+
+
+def bench_prompt(kb: "app.KnowledgeBase", queries: List[str], rounds: int) -> Dict[str, float]:
+    sources = {q: kb.search(q) for q in queries}
+    latencies = []
+    for history in (1, 30):   # İlk tur ve uzun sohbet (özet + kırpma devrede)
+        reset_session(history)
+        for _ in range(rounds):
+            for query in queries:
+                latencies.append(timed(lambda: app.PromptEngine.build_parts(query, sources[query])))
+    stats = percentiles(latencies)
+    return {'prompt_p50_ms': stats['p50'], 'prompt_p99_ms': stats['p99']}
+
+
+def bench_generate(kb: "app.KnowledgeBase", queries: List[str], chunks: int, chunk_chars: int) -> Dict[str, float]:
+    """Uçtan uca: prompt + kabul kontrolü + yönlendirme + iş parçacığı yarışı + akış (ağ hariç)"""
+    client = FakeClient(FakeModel(chunks, chunk_chars))
+    generator = app.ResponseGenerator(
+        BenchAPIManager(app.ModelRouter()), cache=None, context_cache=app.ContextCache(client),
+        scheduler=app.AdmissionScheduler(max_concurrent=64, requests_per_minute=10 ** 9, burst=10 ** 6,
+                                         max_queue=1000, per_session=64),
+    )
+    sources = {q: kb.search(q) for q in queries}
+    reset_session(6)
+    ttfts, totals = [], []
+    for query in queries:
+        started = time.perf_counter()
+        first = None
+        for _ in generator.generate(query, sources[query], session_id="bench"):
+            if first is None:
+                first = time.perf_counter() - started
+        totals.append(time.perf_counter() - started)
+        ttfts.append(first or 0.0)
+    ttft, total = percentiles(ttfts), percentiles(totals)
+    return {'generate_ttft_p50_ms': ttft['p50'], 'generate_ttft_p99_ms': ttft['p99'],
+            'generate_total_p50_ms': total['p50'], 'generate_total_p99_ms': total['p99']}
+
+
+def run_size(name: str, count: int, rounds: int, chunks: int, chunk_chars: int) -> Dict[str, float]:
+    print(f"📚 {name}: {count} sentetik yazı üretiliyor...")
+    posts = corpus.generate_posts(count)
+    queries = corpus.query_set()
+    workdir = tempfile.mkdtemp(prefix=f"yolpedia-bench-{name}-")
+    try:
+        results = {'posts': count, 'chars': sum(len(p['icerik']) for p in posts)}
+        results.update(bench_normalize(posts))
+        load_results, kb = bench_load(posts, workdir)
+        results.update(load_results)
+        results.update(bench_search(kb, queries, rounds))
+        results.update(bench_prompt(kb, queries, rounds))
+        results.update(bench_generate(kb, queries, chunks, chunk_chars))
+        kb.close()
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ===================== KARŞILAŞTIRMA =====================
+
+def is_timing(metric: str) -> bool:
+    return metric.endswith(('_ms', '_s', '_ms_per_mb'))
+
+
+def noise_floor(metric: str) -> float:
+    return NOISE_FLOOR['_s'] if metric.endswith('_s') else NOISE_FLOOR['_ms']
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Eşiği ve gürültü tabanını aşan yavaşlamalar (tüm süre metriklerinde küçük daha iyi)"""
+    regressions = []
+    for size, metrics_now in current['results'].items():
+        metrics_before = baseline.get('results', {}).get(size)
+        if not metrics_before:
+            continue
+        print(f"\n📊 {size} (önceki: {baseline.get('commit') or '?'})")
+        for metric, value in metrics_now.items():
+            before = metrics_before.get(metric)
+            if not is_timing(metric) or not before:
+                continue
+            change = (value - before) / before
+            regressed = change > threshold and value - before > noise_floor(metric)
+            marker = "❌" if regressed else ("✅" if change < -threshold else "  ")
+            print(f"  {marker} {metric:28s} {before:10.3f} -> {value:10.3f}  ({change:+.1%})")
+            if regressed:
+                regressions.append(f"{size}/{metric}: {before} -> {value} ({change:+.1%})")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="YolPedia uçtan uca benchmark")
+    parser.add_argument('--sizes', default='1k,3k', help="virgülle: 1k,3k,30k veya sayı")
+    parser.add_argument('--rounds', type=int, default=5, help="sorgu kümesi tekrar sayısı")
+    parser.add_argument('--chunks', type=int, default=40, help="sahte modelin cevap parça sayısı")
+    parser.add_argument('--chunk-chars', type=int, default=60)
+    parser.add_argument('--output', help="sonuç JSON dosyası")
+    parser.add_argument('--baseline', help="karşılaştırılacak önceki sonuç JSON dosyası")
+    parser.add_argument('--threshold', type=float, default=0.25, help="izin verilen göreli yavaşlama")
+    args = parser.parse_args()
+
+    report = {
+        'schema': SCHEMA_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'settings': {'rounds': args.rounds, 'chunks': args.chunks, 'chunk_chars': args.chunk_chars,
+                     'queries': len(corpus.query_set())},
+        'results': {},
+    }
+    for size in args.sizes.split(','):
+        size = size.strip()
+        count = corpus.SIZES[size] if size in corpus.SIZES else int(size)
+        report['results'][size] = run_size(size, count, args.rounds, args.chunks, args.chunk_chars)
+        for metric, value in report['results'][size].items():
+            print(f"  {metric:28s} {value}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Sonuçlar yazıldı: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} metrik %{args.threshold * 100:.0f} eşiğini aştı:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print(f"\n✅ Eşik (%{args.threshold * 100:.0f}) aşılmadı")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Denetim betikleri (crawl_test.py, context_cache_test.py) için ortak yardımcılar:
+her denetim tek satır yazılır, başarısızlar toplanır ve sonunda çıkış kodu verilir.
+"""
+from typing import List
+
+
+def check(failures: List[str], condition: bool, message: str):
+    print(f"  {'✅' if condition else '❌'} {message}")
+    if not condition:
+        failures.append(message)
+
+
+def report(failures: List[str]) -> int:
+    """Özet satırını yaz; bir denetim başarısızsa 1 döner (sys.exit için)"""
+    print(f"\n{'❌ ' + str(len(failures)) + ' denetim başarısız' if failures else '✅ Tüm denetimler geçti'}")
+    return 1 if failures else 0
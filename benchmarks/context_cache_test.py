@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sistem talimatı önbelleği (ContextCache) denetimi: ağ yerine çağrıları kaydeden sahte istemciyle
+oluşturma, yeniden kullanım, süre dolmadan yenileme, başarısızlıkta tek kayıtlı hata ve
+system_instruction'a düşme, önbellekli model hatasında geçersizleştirme, alt sınırın altındaki
+önekler için hiç RPC yapılmaması ve tam sınırdaki öneğin önbelleğe alınması denetlenir;
+bir denetim başarısızsa çıkış kodu 1 olur.
+Kullanım:
+    python benchmarks/context_cache_test.py
+"""
+import os
+import sys
+import time
+import warnings
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+warnings.filterwarnings("ignore")
+
+import app
+import metrics
+from checks import check, report
+
+MODEL = "gemini-2.0-flash"
+LONG_PREFIX = "Can Dede talimatı. " * 2000          # ~9500 token: alt sınırın üstünde
+SHORT_PREFIX = app.PromptEngine.system_instruction(False)
+
+
+class StubClient(app.GeminiClient):
+    """SDK yerine çağrıları sayan istemci; `fail` açıkken önbellek oluşturma hata verir"""
+
+    def __init__(self, fail: bool = False):
+        super().__init__()
+        self.fail = fail
+        self.created: List[str] = []
+        self.built: List[str] = []
+
+    def configure(self, api_key: str):
+        pass
+
+    def create_cached_content(self, model_name: str, system_instruction: str, ttl: int):
+        if self.fail:
+            raise RuntimeError("400 Cached content is too small")
+        name = f"cachedContents/stub-{len(self.created)}"
+        self.created.append(name)
+        return name
+
+    def model(self, model_name: str, system_instruction: Optional[str] = None, cached_content=None):
+        kind = f"cache:{cached_content}" if cached_content is not None else "instruction"
+        self.built.append(kind)
+        return kind
+
+
+def context_errors() -> int:
+    return sum(1 for e in metrics.REGISTRY.errors if e['stage'] == 'context_cache')
+
+
+def main() -> int:
+    failures: List[str] = []
+    print(f"🧪 ContextCache (alt sınır {app.config.CONTEXT_CACHE_MIN_TOKENS} token, "
+          f"talimat ~{app.PromptEngine.estimate_tokens(SHORT_PREFIX)} token)")
+
+    print("\n📏 Kısa önek")
+    client = StubClient()
+    cache = app.ContextCache(client)
+    model, cached = cache.model(MODEL, SHORT_PREFIX)
+    check(failures, not client.created and model == "instruction" and not cached,
+          "önbellek denenmez, system_instruction kullanılır")
+
+    print("\n📦 Oluşturma ve yeniden kullanım")
+    model, cached = cache.model(MODEL, LONG_PREFIX)
+    check(failures, cached and model == "cache:cachedContents/stub-0", "ilk istekte oluşturulur")
+    cache.model(MODEL, LONG_PREFIX)
+    check(failures, len(client.created) == 1, "ikinci istek aynı önbelleği kullanır")
+
+    print("\n📐 Alt sınır")
+    client = StubClient()
+    cache = app.ContextCache(client)
+    chars = app.config.CONTEXT_CACHE_MIN_TOKENS * app.PromptEngine.CHARS_PER_TOKEN
+    cache.get(MODEL, "x" * (chars - app.PromptEngine.CHARS_PER_TOKEN))
+    check(failures, not client.created, "sınırın bir token altı önbelleğe alınmaz")
+    cache.get(MODEL, "x" * chars)
+    check(failures, len(client.created) == 1, f"{app.config.CONTEXT_CACHE_MIN_TOKENS} token önek önbelleğe alınır")
+
+    print("\n🔄 Süre dolmadan yenileme")
+    client = StubClient()
+    cache = app.ContextCache(client, ttl=1, refresh_margin=0.8)
+    cache.get(MODEL, LONG_PREFIX)
+    time.sleep(0.3)
+    handle = cache.get(MODEL, LONG_PREFIX)
+    check(failures, len(client.created) == 2 and handle == "cachedContents/stub-1", "kenar payına girince yenilenir")
+
+    print("\n⚠️ Başarısız oluşturma")
+    metrics.REGISTRY.reset()
+    client = StubClient(fail=True)
+    cache = app.ContextCache(client)
+    for _ in range(3):
+        model, cached = cache.model(MODEL, LONG_PREFIX)
+    check(failures, model == "instruction" and not cached, "system_instruction'a düşer")
+    check(failures, context_errors() == 1, f"{context_errors()} hata kaydı (beklenen 1, sonra tekrar denenmez)")
+
+    print("\n🧹 Önbellekli model hatası")
+    client = StubClient()
+    cache = app.ContextCache(client)
+    cache.get(MODEL, LONG_PREFIX)
+    cache.invalidate(MODEL, LONG_PREFIX)
+    cache.get(MODEL, LONG_PREFIX)
+    check(failures, len(client.created) == 2, "geçersizleştirilen önbellek yeniden oluşturulur")
+
+    return report(failures)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
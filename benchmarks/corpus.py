@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sentetik YolPedia derlemi: yolpedia_data.json ile aynı şemada (baslik, link, icerik, tarih),
+Türkçe benzeri, Zipf dağılımlı kelimelerle ve eklerle çekimlenmiş yazılar üretir.
+Aynı tohum -> aynı derlem; benchmark sonuçları çalıştırmalar arasında karşılaştırılabilir.
+Kullanım: python benchmarks/corpus.py 3000 [çıktı dizini]
+"""
+import itertools
+import os
+import random
+import sys
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dataset
+
+SIZES = {'1k': 1000, '3k': 3000, '30k': 30000}
+MAX_CONTENT_CHARS = 8000   # Güncelleyici içeriği bu uzunlukta kırpar
+
+# Sık geçen alan terimleri (sorgular da bunlardan kurulur)
+DOMAIN_WORDS = (
+    "alevi bektaşi hacı bektaş velî cem semah dede ocak musahip görgü düşkün erkân ikrar "
+    "muhabbet lokma dâr pîr mürşit rehber tâlip yol sürek zâkir bağlama deyiş nefes "
+    "hatayî pir sultan abdal yunus emre şah ismail kerbela muharrem oruç hızır abdal "
+    "dersim zazakî kurmancî ocakzade çerağ cemevi meydan niyaz gülbank"
+).split()
+
+SYLLABLES = ("ka ke ki ko ku ba be bi bo bu da de di do du ma me mi mo mu ta te ti to tu "
+             "la le li lo lu ra re ri ro ru sa se si so su na ne ni no nu ya ye yı yo yu "
+             "ça çe şa şe ğa ğe ır ül ön üz ar er an en al el ış iş").split()
+
+# Kaba ünlü uyumu: son ünlü kalınsa kalın, inceyse ince ekler
+BACK_SUFFIXES = ("", "", "", "lar", "ın", "un", "da", "dan", "ı", "a", "ları", "nın", "daki", "la")
+FRONT_SUFFIXES = ("", "", "", "ler", "in", "ün", "de", "den", "i", "e", "leri", "nin", "deki", "le")
+BACK_VOWELS = "aıouâû"
+FRONT_VOWELS = "eiöüîê"
+
+FILLER = ("ve", "bir", "bu", "da", "de", "ile", "için", "olan", "gibi", "çok", "daha", "her")
+
+
+def build_vocabulary(rng: random.Random, size: int = 6000) -> List[str]:
+    """Alan terimleri + hece birleşimlerinden uydurma kök sözcükler"""
+    words = list(DOMAIN_WORDS)
+    seen = set(words)
+    while len(words) < size:
+        word = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+class CorpusGenerator:
+    """Zipf dağılımlı, tekrarlanabilir yazı üreteci"""
+
+    def __init__(self, seed: int = 42, vocabulary_size: int = 6000):
+        self.rng = random.Random(seed)
+        self.vocabulary = build_vocabulary(self.rng, vocabulary_size)
+        # Zipf (s=1): sık kelimeler çok, nadir kelimeler uzun kuyruk
+        self.cum_weights = list(itertools.accumulate(1.0 / rank for rank in range(1, len(self.vocabulary) + 1)))
+        self.domain = list(DOMAIN_WORDS)
+
+    def inflect(self, root: str) -> str:
+        for char in reversed(root):
+            if char in BACK_VOWELS:
+                return root + self.rng.choice(BACK_SUFFIXES)
+            if char in FRONT_VOWELS:
+                return root + self.rng.choice(FRONT_SUFFIXES)
+        return root
+
+    def word(self) -> str:
+        return self.inflect(self.rng.choices(self.vocabulary, cum_weights=self.cum_weights)[0])
+
+    def sentence(self) -> str:
+        roots = self.rng.choices(self.vocabulary, cum_weights=self.cum_weights, k=self.rng.randint(6, 18))
+        words = [self.rng.choice(FILLER) if self.rng.random() < 0.25 else self.inflect(root) for root in roots]
+        text = ' '.join(words)
+        return text[0].upper() + text[1:] + self.rng.choice(('.', '.', '.', '?', '!'))
+
+    def post(self, index: int) -> Dict:
+        topic = self.rng.sample(self.domain, 2)
+        title = ' '.join(w.capitalize() for w in topic + [self.word() for _ in range(self.rng.randint(0, 3))])
+        # Uzunluk dağılımı sağa çarpık: çoğu yazı kısa, bir kısmı sınıra dayanır
+        target = min(MAX_CONTENT_CHARS, int(self.rng.lognormvariate(7.3, 0.8)))
+        sentences = []
+        length = 0
+        while length < target:
+            sentence = self.sentence()
+            # Yazı konusu gövdede de geçsin
+            if self.rng.random() < 0.2:
+                sentence = f"{topic[0].capitalize()} {topic[1]} {sentence[0].lower()}{sentence[1:]}"
+            sentences.append(sentence)
+            length += len(sentence) + 1
+        return {
+            'baslik': title,
+            'link': f"https://yolpedia.eu/yazi-{index:06d}/",
+            'icerik': ' '.join(sentences)[:MAX_CONTENT_CHARS],
+            'tarih': f"20{10 + index % 15:02d}-{1 + index % 12:02d}-{1 + index % 28:02d}T12:00:00",
+        }
+
+    def posts(self, count: int) -> List[Dict]:
+        return [self.post(i) for i in range(count)]
+
+
+def generate_posts(count: int, seed: int = 42) -> List[Dict]:
+    return CorpusGenerator(seed).posts(count)
+
+
+def query_set(seed: int = 7, count: int = 60) -> List[str]:
+    """Sabit sorgu kümesi: tek kelime, çok kelime, yazım hatalı, ekli ve uzun doğal dil sorguları"""
+    rng = random.Random(seed)
+    domain = list(DOMAIN_WORDS)
+    queries = []
+    for i in range(count):
+        kind = i % 5
+        if kind == 0:
+            queries.append(rng.choice(domain))
+        elif kind == 1:
+            queries.append(' '.join(rng.sample(domain, 2)) + " nedir")
+        elif kind == 2:
+            # Tek harf silinmiş / yer değiştirmiş yazım hatası
+            word = rng.choice([w for w in domain if len(w) >= 5])
+            pos = rng.randrange(1, len(word) - 1)
+            queries.append(word[:pos] + word[pos + 1:] if rng.random() < 0.5
+                           else word[:pos - 1] + word[pos] + word[pos - 1] + word[pos + 1:])
+        elif kind == 3:
+            word = rng.choice(domain)
+            plural = "lar" if [c for c in word if c in BACK_VOWELS + FRONT_VOWELS][-1] in BACK_VOWELS else "ler"
+            queries.append(f"{word}{plural} hakkında {rng.choice(domain)}")
+        else:
+            queries.append(f"Hacı Bektaş Veli'nin {rng.choice(domain)} ile ilgili sözleri nelerdir?")
+    return queries
+
+
+def write_corpus(posts: List[Dict], directory: str) -> Dict:
+    """Parçalı formatta yaz (uygulamanın okuduğu format)"""
+    return dataset.write_dataset(posts, directory)
+
+
+if __name__ == "__main__":
+    size = sys.argv[1] if len(sys.argv) > 1 else '1k'
+    count = SIZES[size] if size in SIZES else int(size)
+    target = sys.argv[2] if len(sys.argv) > 2 else dataset.DATASET_DIR + "_synthetic"
+    manifest = write_corpus(generate_posts(count), target)
+    print(f"✅ {manifest['records']} sentetik yazı yazıldı: {target}/")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Güncelleyici tarama testi: YolPediaAPI'yi yerel sahte WordPress sunucusuna
+(benchmarks/fake_wordpress.py) karşı çalıştırır. Sayfalama, Retry-After'lı 429,
+HTML doğrulama sayfası, aralık dışı sayfa, eşzamanlılık sınırı ve delta senkron
+(güncelleme, link değişikliği, silme) denetlenir; bir denetim başarısızsa çıkış kodu 1 olur.
+Kullanım:
+    python benchmarks/crawl_test.py --posts 300 --rate-429 0.1 --challenge-rate 0.05
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+warnings.filterwarnings("ignore")
+
+from YolPedia_updater import YolPediaAPI
+from checks import check, report
+from fake_wordpress import FakeWordPressServer
+
+
+def new_api(server: FakeWordPressServer, workers: int) -> YolPediaAPI:
+    # Testte bekleme süreleri kısa tutulur; Retry-After da max_backoff ile sınırlanır
+    return YolPediaAPI(base_url=server.api_url, per_page=50, max_workers=workers, rate=200.0, burst=20,
+                       max_retries=8, max_backoff=0.2)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="YolPedia güncelleyici tarama testi (sahte WordPress)")
+    parser.add_argument('--posts', type=int, default=300, help="sentetik yazı sayısı")
+    parser.add_argument('--workers', type=int, default=3, help="eşzamanlı istek sınırı")
+    parser.add_argument('--rate-429', type=float, default=0.1, help="429 oranı (0-1)")
+    parser.add_argument('--challenge-rate', type=float, default=0.05, help="HTML doğrulama sayfası oranı (0-1)")
+    parser.add_argument('--latency', type=float, default=0.02, help="istek başına gecikme (sn)")
+    args = parser.parse_args()
+
+    server = FakeWordPressServer(posts=args.posts, rate_429=args.rate_429, challenge_rate=args.challenge_rate,
+                                 latency=args.latency).start()
+    print(f"🧪 Sahte WordPress {server.api_url}  ({args.posts} yazı, 429=%{args.rate_429 * 100:g}, "
+          f"doğrulama=%{args.challenge_rate * 100:g})")
+    workdir = tempfile.mkdtemp(prefix="yolpedia-crawl-")
+    state_file = os.path.join(workdir, "sync_state.json")
+    failures: List[str] = []
+    try:
+        api = new_api(server, args.workers)
+
+        print("\n📡 Tam tarama")
+        started = time.perf_counter()
+        records = api.get_all_posts_formatted(max_posts=10 ** 6)
+        elapsed = time.perf_counter() - started
+        check(failures, len(records) == args.posts, f"{len(records)}/{args.posts} yazı alındı ({elapsed:.1f} sn)")
+        check(failures, len({r['link'] for r in records}) == len(records), "linkler tekil")
+        check(failures, server.stats['peak_active'] <= args.workers,
+              f"en çok {server.stats['peak_active']} eşzamanlı istek (sınır {args.workers})")
+        print(f"  📊 {server.stats}")
+
+        print("\n📄 Aralık dışı sayfa")
+        server.reset_stats()
+        clean = YolPediaAPI(base_url=server.api_url, per_page=50, max_retries=0)
+        rate_429, challenge_rate = server.rate_429, server.challenge_rate
+        server.rate_429 = server.challenge_rate = 0.0
+        posts, _ = clean.fetch_page(10 ** 4)
+        server.rate_429, server.challenge_rate = rate_429, challenge_rate
+        check(failures, posts == [] and server.stats['invalid_pages'] == 1, "400 invalid_page_number -> boş sayfa")
+
+        print("\n🔁 Delta senkron")
+        data, _ = api.sync_posts([], state_file=state_file, max_posts=10 ** 6)
+        check(failures, len(data) == args.posts, f"ilk senkron tam tarama: {len(data)} yazı")
+
+        ids = sorted(server.posts)
+        server.update_post(ids[0], title="Güncellenen yazı")
+        server.update_post(ids[2], slug="yeni-adres")
+        server.delete_post(ids[1])
+        server.reset_stats()
+        data, stats = api.sync_posts(data, state_file=state_file, max_posts=10 ** 6)
+        titles = {r['baslik'] for r in data}
+        links = {r['link'] for r in data}
+        check(failures, stats.get('changed') == 2, f"{stats.get('changed')} yazı güncellendi (beklenen 2)")
+        check(failures, stats.get('deleted') == 1, f"{stats.get('deleted')} yazı silindi (beklenen 1)")
+        check(failures, len(data) == args.posts - 1 and "Güncellenen yazı" in titles,
+              f"birleşmiş veri: {len(data)} yazı")
+        check(failures, f"{server.endpoint}/yeni-adres/" in links and f"{server.endpoint}/yazi-{ids[2]}/" not in links,
+              "linki değişen yazı eski linkte kalmaz")
+        print(f"  📊 {server.stats}")
+
+        server.reset_stats()
+        data, stats = api.sync_posts(data, state_file=state_file, max_posts=10 ** 6)
+        check(failures, stats.get('changed') == 0 and len(data) == args.posts - 1, "değişiklik yoksa veri aynı kalır")
+        server.reset_stats()
+        data, stats = api.sync_posts(data, state_file=state_file, max_posts=10 ** 6)
+        check(failures, server.stats['not_modified'] == 1 and len(data) == args.posts - 1,
+              "aynı URL tekrar istenince koşullu istek 304 alır")
+        
+        # Sorgu dizesini yok sayan ETag: başka URL'nin doğrulayıcısı gönderilirse yeni yazı 304 ile kaçar
+        server.loose_etag = True
+        server.update_post(ids[3], title="Gevşek ETag")
+        data, stats = api.sync_posts(data, state_file=state_file, max_posts=10 ** 6)
+        server.update_post(ids[4], title="İkinci değişiklik")
+        data, stats = api.sync_posts(data, state_file=state_file, max_posts=10 ** 6)
+        check(failures, stats.get('changed') == 1 and "İkinci değişiklik" in {r['baslik'] for r in data},
+              "ETag sadece aynı URL'de kullanılır (yanlış 304 yok)")
+        server.loose_etag = False
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return report(failures)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
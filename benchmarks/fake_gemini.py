@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Yerel sahte Gemini sunucusu (REST): streamGenerateContent / generateContent uçlarını taklit eder.
+İlk token gecikmesi, token hızı ve 429 (kota) oranı ayarlanabilir; uygulama
+YOLPEDIA_GEMINI_ENDPOINT=http://127.0.0.1:<port> ile buraya yönlendirilir.
+Kullanım: python benchmarks/fake_gemini.py --port 8089 --ttft 0.8 --tps 60 --rate-429 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+ANSWER_WORDS = ("Erenler muhabbet yol ile olur can dost cem semah görgü ikrar ocak dede "
+                "Hacı Bektaş Veli eline diline beline sahip ol der").split()
+
+QUOTA_ERROR = {
+    "error": {
+        "code": 429,
+        "message": "Resource has been exhausted (e.g. check quota).",
+        "status": "RESOURCE_EXHAUSTED",
+    }
+}
+NOT_FOUND = {"error": {"code": 404, "message": "Not found (sahte sunucu)", "status": "NOT_FOUND"}}
+
+
+class FakeGeminiServer:
+    """Arka planda çalışan sahte sunucu; sayaçlar iş parçacığı güvenlidir"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, ttft: float = 0.5,
+                 tokens_per_sec: float = 80.0, answer_tokens: int = 150, rate_429: float = 0.0,
+                 tokens_per_chunk: int = 8, seed: int = 1):
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.answer_tokens = answer_tokens
+        self.rate_429 = rate_429
+        self.tokens_per_chunk = tokens_per_chunk
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = self.empty_stats()
+        self.httpd = ThreadingHTTPServer((host, port), self.handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @staticmethod
+    def empty_stats() -> Dict[str, int]:
+        return {'requests': 0, 'streams': 0, 'quota_errors': 0, 'active': 0, 'peak_active': 0}
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeGeminiServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_stats(self):
+        with self.lock:
+            active = self.stats['active']
+            self.stats = self.empty_stats()
+            self.stats['active'] = active
+
+    def count(self, key: str, delta: int = 1):
+        with self.lock:
+            self.stats[key] += delta
+            if key == 'active':
+                self.stats['peak_active'] = max(self.stats['peak_active'], self.stats['active'])
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            return self.rng.random() < self.rate_429
+
+    def answer_chunks(self):
+        words = [ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(self.answer_tokens)]
+        for start in range(0, len(words), self.tokens_per_chunk):
+            yield ' '.join(words[start:start + self.tokens_per_chunk]) + ' '
+
+    def handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def send_json(self, status: int, payload: Dict):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def write_chunk(self, text: str):
+                data = text.encode('utf-8')
+                self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                server.count('requests')
+                path = self.path.split('?', 1)[0]
+                if path.endswith(':streamGenerateContent'):
+                    self.stream()
+                elif path.endswith(':generateContent'):
+                    self.generate()
+                else:
+                    # cachedContents vb.: uygulama system_instruction'a düşer
+                    self.send_json(404, NOT_FOUND)
+
+            def generate(self):
+                if server.should_fail():
+                    server.count('quota_errors')
+                    self.send_json(429, QUOTA_ERROR)
+                    return
+                time.sleep(server.ttft + server.answer_tokens / server.tokens_per_sec)
+                text = ''.join(server.answer_chunks())
+                self.send_json(200, {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"},
+                                                     "finishReason": 1, "index": 0}]})
+
+            def stream(self):
+                if server.should_fail():
+                    server.count('quota_errors')
+                    self.send_json(429, QUOTA_ERROR)
+                    return
+                server.count('streams')
+                server.count('active')
+                try:
+                    time.sleep(server.ttft)
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Transfer-Encoding', 'chunked')
+                    self.end_headers()
+                    # REST akışı tek bir JSON dizisidir: "[" {..} "," {..} "]"
+                    self.write_chunk("[")
+                    delay = server.tokens_per_chunk / server.tokens_per_sec
+                    for i, text in enumerate(server.answer_chunks()):
+                        if i:
+                            time.sleep(delay)
+                        chunk = {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"},
+                                                 "index": 0}]}
+                        self.write_chunk(("," if i else "") + json.dumps(chunk, ensure_ascii=False))
+                    self.write_chunk("]")
+                    self.wfile.write(b"0\r\n\r\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass   # İstemci akışı iptal etti (ör. hedge yarışını kaybetti)
+                finally:
+                    server.count('active', -1)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sahte Gemini REST sunucusu")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--ttft', type=float, default=0.5, help="ilk token gecikmesi (sn)")
+    parser.add_argument('--tps', type=float, default=80.0, help="token / sn")
+    parser.add_argument('--tokens', type=int, default=150, help="cevap uzunluğu (token)")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="kota hatası oranı (0-1)")
+    args = parser.parse_args()
+
+    server = FakeGeminiServer(args.host, args.port, args.ttft, args.tps, args.tokens, args.rate_429)
+    print(f"🧪 Sahte Gemini: {server.endpoint}  (YOLPEDIA_GEMINI_ENDPOINT={server.endpoint})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"📊 {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
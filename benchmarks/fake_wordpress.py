@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Yerel sahte WordPress REST sunucusu: /wp-json/wp/v2/posts uç noktasını taklit eder.
+Sayfalama başlıkları (X-WP-Total / X-WP-TotalPages), aralık dışı sayfada
+400 rest_post_invalid_page_number, ETag / If-None-Match ile 304, modified_after filtresi,
+Retry-After'lı 429 ve JSON yerine HTML dönen doğrulama (WAF) sayfası oranı ayarlanabilir.
+loose_etag açıkken ETag sorgu dizesini yok sayar (gevşek hash'leyen sunucu / CDN gibi).
+Güncelleyici YolPediaAPI(base_url=f"{server.endpoint}/wp-json/wp/v2") ile buraya yönlendirilir.
+Kullanım: python benchmarks/fake_wordpress.py --port 8090 --posts 500 --rate-429 0.1
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+POSTS_PATH = "/wp-json/wp/v2/posts"
+MAX_PER_PAGE = 100
+CHALLENGE_PAGE = ("<!DOCTYPE html><html><head><title>Just a moment...</title></head>"
+                  "<body>Checking your browser before accessing the site.</body></html>")
+WORDS = ("alevi bektaşi cem semah dede ocak musahip görgü ikrar muhabbet lokma pîr yol gülbank "
+         "cemevi meydan niyaz deyiş nefes bağlama erkân rehber tâlip").split()
+
+
+class FakeWordPressServer:
+    """Arka planda çalışan sahte sunucu; yazılar ve sayaçlar iş parçacığı güvenlidir"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, posts: int = 200, rate_429: float = 0.0,
+                 retry_after: str = "1", challenge_rate: float = 0.0, latency: float = 0.0, seed: int = 1,
+                 loose_etag: bool = False):
+        self.rate_429 = rate_429
+        self.loose_etag = loose_etag
+        self.retry_after = retry_after
+        self.challenge_rate = challenge_rate
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.clock = datetime(2025, 1, 1)
+        self.posts: Dict[int, Dict] = {}
+        for _ in range(posts):
+            self.add_post(self.sentence(4).capitalize(), ' '.join(self.sentence(12) for _ in range(5)))
+        self.stats = self.empty_stats()
+        self.httpd = ThreadingHTTPServer((host, port), self.handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @staticmethod
+    def empty_stats() -> Dict[str, int]:
+        return {'requests': 0, 'pages': 0, 'conditional': 0, 'not_modified': 0, 'quota_errors': 0, 'challenges': 0,
+                'invalid_pages': 0, 'active': 0, 'peak_active': 0}
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.endpoint}/wp-json/wp/v2"
+
+    def start(self) -> "FakeWordPressServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_stats(self):
+        with self.lock:
+            active = self.stats['active']
+            self.stats = self.empty_stats()
+            self.stats['active'] = active
+
+    def count(self, key: str, delta: int = 1):
+        with self.lock:
+            self.stats[key] += delta
+            if key == 'active':
+                self.stats['peak_active'] = max(self.stats['peak_active'], self.stats['active'])
+
+    def chance(self, rate: float) -> bool:
+        with self.lock:
+            return self.rng.random() < rate
+
+    # ---------- Yazılar ----------
+
+    def sentence(self, words: int) -> str:
+        return ' '.join(self.rng.choice(WORDS) for _ in range(words)) + '.'
+
+    def tick(self) -> str:
+        """Her değişiklik bir saniye ileri: modified değerleri kesin sıralı olur"""
+        self.clock += timedelta(seconds=1)
+        return self.clock.strftime("%Y-%m-%dT%H:%M:%S")
+
+    def add_post(self, title: str, content: str) -> int:
+        with self.lock:
+            post_id = max(self.posts, default=0) + 1
+            stamp = self.tick()
+            self.posts[post_id] = {
+                'id': post_id,
+                'date': stamp,
+                'modified': stamp,
+                'slug': f"yazi-{post_id}",
+                'title': {'rendered': title},
+                'content': {'rendered': f"<p>{content}</p>"},
+            }
+            return post_id
+
+    def update_post(self, post_id: int, title: Optional[str] = None, content: Optional[str] = None,
+                    slug: Optional[str] = None):
+        """Yazıyı değiştir (slug değişirse link de değişir); modified ileri alınır"""
+        with self.lock:
+            post = self.posts[post_id]
+            if title is not None:
+                post['title'] = {'rendered': title}
+            if content is not None:
+                post['content'] = {'rendered': f"<p>{content}</p>"}
+            if slug is not None:
+                post['slug'] = slug
+            post['modified'] = self.tick()
+
+    def delete_post(self, post_id: int):
+        with self.lock:
+            self.posts.pop(post_id, None)
+
+    def link(self, post: Dict) -> str:
+        return f"{self.endpoint}/{post['slug']}/"
+
+    def query_posts(self, params: Dict[str, str]) -> List[Dict]:
+        with self.lock:
+            posts = [dict(p, link=self.link(p)) for p in self.posts.values()]
+        if params.get('modified_after'):
+            posts = [p for p in posts if p['modified'] > params['modified_after']]
+        key = 'modified' if params.get('orderby') == 'modified' else 'date'
+        posts.sort(key=lambda p: (p[key], p['id']), reverse=params.get('order', 'desc') == 'desc')
+        if params.get('_fields'):
+            fields = params['_fields'].split(',')
+            posts = [{f: p[f] for f in fields if f in p} for p in posts]
+        return posts
+
+    # ---------- HTTP ----------
+
+    def handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def send_body(self, status: int, body: bytes, content_type: str, headers: Dict[str, str] = None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_json(self, status: int, payload, headers: Dict[str, str] = None):
+                self.send_body(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'),
+                               'application/json; charset=UTF-8', headers)
+
+            def do_GET(self):
+                server.count('requests')
+                server.count('active')
+                try:
+                    if server.latency:
+                        time.sleep(server.latency)
+                    self.posts()
+                finally:
+                    server.count('active', -1)
+
+            def posts(self):
+                url = urlsplit(self.path)
+                if url.path.rstrip('/') != POSTS_PATH:
+                    self.send_json(404, {'code': 'rest_no_route', 'message': 'No route', 'data': {'status': 404}})
+                    return
+                if server.chance(server.rate_429):
+                    server.count('quota_errors')
+                    self.send_json(429, {'code': 'too_many_requests', 'message': 'Slow down'},
+                                   {'Retry-After': server.retry_after})
+                    return
+                if server.chance(server.challenge_rate):
+                    server.count('challenges')
+                    self.send_body(200, CHALLENGE_PAGE.encode('utf-8'), 'text/html; charset=UTF-8')
+                    return
+
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                per_page = min(MAX_PER_PAGE, max(1, int(params.get('per_page', 10))))
+                page = max(1, int(params.get('page', 1)))
+                posts = server.query_posts(params)
+                total_pages = max(1, -(-len(posts) // per_page))
+                if page > total_pages:
+                    server.count('invalid_pages')
+                    self.send_json(400, {'code': 'rest_post_invalid_page_number',
+                                         'message': 'The page number requested is larger than the number of pages available.',
+                                         'data': {'status': 400}})
+                    return
+
+                body = posts[(page - 1) * per_page:page * per_page]
+                validated = url.path if server.loose_etag else json.dumps(body, sort_keys=True)
+                etag = '"' + hashlib.sha1(validated.encode('utf-8')).hexdigest() + '"'
+                if self.headers.get('If-None-Match'):
+                    server.count('conditional')
+                if self.headers.get('If-None-Match') == etag:
+                    server.count('not_modified')
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                server.count('pages')
+                self.send_json(200, body, {'X-WP-Total': str(len(posts)), 'X-WP-TotalPages': str(total_pages),
+                                           'ETag': etag})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sahte WordPress REST sunucusu")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--posts', type=int, default=200, help="sentetik yazı sayısı")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="429 oranı (0-1)")
+    parser.add_argument('--retry-after', default="1", help="429 cevabındaki Retry-After değeri")
+    parser.add_argument('--challenge-rate', type=float, default=0.0, help="HTML doğrulama sayfası oranı (0-1)")
+    parser.add_argument('--latency', type=float, default=0.0, help="istek başına gecikme (sn)")
+    args = parser.parse_args()
+
+    server = FakeWordPressServer(args.host, args.port, args.posts, args.rate_429, args.retry_after,
+                                 args.challenge_rate, args.latency)
+    print(f"🧪 Sahte WordPress: {server.api_url}  (YolPediaAPI(base_url=...))")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"📊 {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Yük testi: artan eşzamanlılıkta N sanal oturum, Streamlit AppTest ile `main()`'i uçtan uca
+çalıştırır. Gemini yerine yerel sahte sunucu (benchmarks/fake_gemini.py) kullanılır; gecikme,
+token hızı ve 429 oranı ayarlanabilir. Her seviye için verim (tur/sn), ilk token süresi
+dağılımı, hata oranı ve süreç belleği raporlanır.
+Tüm oturumlar aynı süreçte çalışır: cache_resource nesneleri (KnowledgeBase, yönlendirici,
+kabul kontrolü) tek bir sunucu kopyasındaki gibi paylaşılır.
+Kullanım:
+    python benchmarks/load_test.py --levels 1,4,16 --turns 3 --ttft 0.8 --tps 60 --rate-429 0.05
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+warnings.filterwarnings("ignore")
+
+from streamlit.testing.v1 import AppTest
+
+import corpus
+import metrics
+from app_bench import git_revision
+from fake_gemini import FakeGeminiServer
+
+SCHEMA_VERSION = 1
+APP_PATH = os.path.join(ROOT, "app.py")
+API_KEY = "load-test-api-key"   # Sahte sunucu anahtarı doğrulamaz; uygulama >10 karakter ister
+
+# generate_seconds durum etiketleri: bunlar kullanıcıya model cevabı yerine yedek/hata döndü demektir
+FAILED_STATUSES = ('fallback', 'error', 'no_key', 'queue_full', 'queue_timeout')
+
+# Sayfa açılışı sırayla: her AppTest ilk çalıştırmada betiği derler ve eşzamanlı ast.parse
+# çağrıları (CPython 3.11) "AST constructor recursion depth mismatch" hatası verebilir
+OPEN_LOCK = threading.Lock()
+
+
+# ===================== ORTAM =====================
+
+def prepare_workdir(posts: int) -> str:
+    """Geçici dizine sentetik derlemi yaz; uygulama göreli yollarla burada çalışır"""
+    workdir = tempfile.mkdtemp(prefix="yolpedia-load-")
+    corpus.write_corpus(corpus.generate_posts(posts), os.path.join(workdir, "yolpedia_data"))
+    # Anahtar dosyadan okunur: AppTest.secrets global st.secrets'ı değiştirir, eşzamanlı
+    # oturumlarda birbirinin üzerine yazar
+    os.makedirs(os.path.join(workdir, ".streamlit"))
+    with open(os.path.join(workdir, ".streamlit", "secrets.toml"), 'w', encoding='utf-8') as f:
+        f.write(f'API_KEY = "{API_KEY}"\n')
+    return workdir
+
+
+def memory_mb() -> Dict[str, float]:
+    """Süreç belleği (Linux /proc; diğer sistemlerde en yüksek RSS)"""
+    try:
+        with open("/proc/self/status", 'r', encoding='ascii') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        return {'rss_mb': round(int(fields['VmRSS'].split()[0]) / 1024, 1),
+                'peak_rss_mb': round(int(fields['VmHWM'].split()[0]) / 1024, 1)}
+    except (OSError, KeyError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+        return {'rss_mb': round(peak_mb, 1), 'peak_rss_mb': round(peak_mb, 1)}
+
+
+# ===================== OTURUM =====================
+
+def new_app(session: int, timeout: float) -> AppTest:
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.query_params['sid'] = f"loadtest-session-{session:06d}"
+    return at
+
+
+def run_session(session: int, turns: int, queries: List[str], timeout: float,
+                errors: List[str], lock: threading.Lock):
+    """Bir sanal kullanıcı: sayfayı aç, sırayla `turns` soru sor"""
+    try:
+        with OPEN_LOCK:
+            at = new_app(session, timeout).run()
+        for turn in range(turns):
+            # Oturum/tur başına farklı soru: cevap önbelleği ölçümü bozmasın
+            query = f"{queries[(session + turn) % len(queries)]} {session}-{turn}"
+            at.chat_input[0].set_value(query).run()
+            if at.exception:
+                raise RuntimeError(at.exception[0].message)
+    except Exception as e:
+        with lock:
+            errors.append(f"oturum {session}: {type(e).__name__}: {e}")
+
+
+def status_counts() -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for row in metrics.REGISTRY.summary():
+        if row['metric'] != 'generate_seconds':
+            continue
+        status = dict(pair.split('=', 1) for pair in row['labels'].split(', ') if pair).get('status', 'ok')
+        counts[status] = counts.get(status, 0) + row['count']
+    return counts
+
+
+def histogram_ms(name: str) -> Dict[str, float]:
+    """Tüm etiketlerin örnekleri birleştirilerek p50/p95/p99 (ms)"""
+    merged = metrics.Histogram(reservoir=metrics.RESERVOIR_SIZE * 16)
+    with metrics.REGISTRY.lock:
+        for histogram in metrics.REGISTRY.histograms.get(name, {}).values():
+            for value in histogram.recent:
+                merged.observe(value)
+    return {f"p{int(q * 100)}": round(v * 1000, 1) for q, v in merged.percentiles().items()}
+
+
+def run_level(concurrency: int, turns: int, queries: List[str], server: FakeGeminiServer,
+              timeout: float) -> Dict:
+    metrics.REGISTRY.reset()
+    server.reset_stats()
+    errors: List[str] = []
+    lock = threading.Lock()
+    threads = [threading.Thread(target=run_session, args=(1000 * concurrency + i, turns, queries, timeout,
+                                                          errors, lock))
+               for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    statuses = status_counts()
+    answered = sum(statuses.values())
+    failed = sum(statuses.get(s, 0) for s in FAILED_STATUSES)
+    result = {
+        'concurrency': concurrency,
+        'turns': answered,
+        'wall_s': round(wall, 2),
+        'throughput_tps': round(answered / wall, 2) if wall else 0.0,
+        'ttft_ms': histogram_ms('generate_first_token_seconds'),
+        'turn_ms': histogram_ms('turn_seconds'),
+        'admission_wait_ms': histogram_ms('admission_wait_seconds'),
+        'statuses': statuses,
+        'error_rate': round(failed / answered, 3) if answered else 0.0,
+        'server': dict(server.stats),
+        'session_errors': errors,
+    }
+    result.update(memory_mb())
+    return result
+
+
+def print_row(row: Dict):
+    print(f"  {row['concurrency']:>5} {row['turns']:>6} {row['throughput_tps']:>8.2f} "
+          f"{row['ttft_ms'].get('p50', 0):>9.0f} {row['ttft_ms'].get('p95', 0):>9.0f} "
+          f"{row['ttft_ms'].get('p99', 0):>9.0f} {row['error_rate']:>7.1%} "
+          f"{row['server']['quota_errors']:>5} {row['rss_mb']:>8.1f}")
+    for error in row['session_errors'][:3]:
+        print(f"        ⚠️ {error}")
+
+
+# ===================== ÇALIŞTIRMA =====================
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="YolPedia yük testi (AppTest + sahte Gemini)")
+    parser.add_argument('--levels', default='1,2,4,8,16', help="virgülle eşzamanlı oturum sayıları")
+    parser.add_argument('--turns', type=int, default=3, help="oturum başına soru sayısı")
+    parser.add_argument('--posts', type=int, default=1000, help="sentetik derlem büyüklüğü")
+    parser.add_argument('--ttft', type=float, default=0.5, help="sahte modelin ilk token gecikmesi (sn)")
+    parser.add_argument('--tps', type=float, default=80.0, help="sahte modelin token hızı")
+    parser.add_argument('--tokens', type=int, default=150, help="cevap uzunluğu (token)")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="kota hatası oranı (0-1)")
+    parser.add_argument('--timeout', type=float, default=120.0, help="AppTest çalıştırma zaman aşımı (sn)")
+    parser.add_argument('--output', help="sonuç JSON dosyası")
+    args = parser.parse_args()
+
+    server = FakeGeminiServer(ttft=args.ttft, tokens_per_sec=args.tps, answer_tokens=args.tokens,
+                              rate_429=args.rate_429).start()
+    os.environ["YOLPEDIA_GEMINI_ENDPOINT"] = server.endpoint
+    print(f"🧪 Sahte Gemini {server.endpoint}  (ttft={args.ttft}s, {args.tps} token/sn, 429=%{args.rate_429 * 100:g})")
+
+    workdir = prepare_workdir(args.posts)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    queries = corpus.query_set()
+    report = {
+        'schema': SCHEMA_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_revision(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'settings': {k: v for k, v in vars(args).items() if k != 'output'},
+        'results': [],
+    }
+    try:
+        # Isınma: derlem yükleme ve indeks kurulumu (cache_resource) ölçüme girmesin
+        print(f"📚 {args.posts} sentetik yazı yükleniyor...")
+        warm = new_app(0, args.timeout).run()
+        if warm.exception:
+            print(f"❌ Uygulama açılamadı: {warm.exception[0].message}")
+            return 1
+        report['baseline'] = memory_mb()
+
+        print(f"\n  {'oturum':>5} {'tur':>6} {'tur/sn':>8} {'ttft p50':>9} {'ttft p95':>9} "
+              f"{'ttft p99':>9} {'hata':>7} {'429':>5} {'RSS MB':>8}")
+        for level in args.levels.split(','):
+            row = run_level(int(level), args.turns, queries, server, args.timeout)
+            report['results'].append(row)
+            print_row(row)
+    finally:
+        os.chdir(cwd)
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Sonuçlar yazıldı: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
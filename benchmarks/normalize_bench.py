@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Normalizasyon mikro-benchmark'ı: eski zincirleme replace sürümü ile normalizer.py karşılaştırması
+Kullanım: python benchmarks/normalize_bench.py [yolpedia_data.json]
+"""
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from normalizer import normalize_text, normalize_many
+
+
+def legacy_normalize_text(text: str) -> str:
+    """KnowledgeBase.normalize_text'in eski hali (referans)"""
+    if not text:
+        return ""
+
+    text = text.lower()
+    replacements = {
+        'ğ': 'g', 'Ğ': 'g', 'ü': 'u', 'Ü': 'u', 'ş': 's', 'Ş': 's',
+        'ı': 'i', 'İ': 'i', 'ö': 'o', 'Ö': 'o', 'ç': 'c', 'Ç': 'c',
+        'â': 'a', 'î': 'i', 'û': 'u'
+    }
+
+    for old, new in replacements.items():
+        text = text.replace(old, new)
+
+    text = re.sub(r'[^\w\s]', ' ', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+
+    return text
+
+
+def load_corpus(path: str) -> list:
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return [item.get('baslik', '') + ' ' + item.get('icerik', '') for item in json.load(f)]
+
+    # Veri dosyası yoksa Türkçe/Zazaca karakterli sentetik derlem
+    random.seed(42)
+    words = ("Alevî Bektaşî Hacı Bektaş-ı Velî cem semah İkrar Işık ŞAH Hatayî Zazakî "
+             "Kurmancî êvar Dêrsim çıra görgü düşkün, \"musahip\" (ocak) erkân! 2025 "
+             "İstanbul ÂŞIK Yûnus_Emre\ttab\nsatır ").split(' ')
+    return [' '.join(random.choice(words) for _ in range(random.randint(50, 1200))) for _ in range(3000)]
+
+
+def timed(func, texts, repeat=3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(texts)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    texts = load_corpus(sys.argv[1] if len(sys.argv) > 1 else "yolpedia_data.json")
+    total_chars = sum(len(t) for t in texts)
+    print(f"📚 {len(texts)} metin, {total_chars / 1e6:.1f}M karakter")
+
+    # Doğruluk: yeni çıktı eskisiyle birebir aynı olmalı
+    mismatches = sum(1 for t in texts if legacy_normalize_text(t) != normalize_text(t))
+    print(f"🔍 Eşleşmeyen çıktı: {mismatches}")
+
+    legacy = timed(lambda ts: [legacy_normalize_text(t) for t in ts], texts)
+    fast = timed(lambda ts: [normalize_text(t) for t in ts], texts)
+    batch = timed(lambda ts: normalize_many(ts), texts, repeat=1)
+
+    print(f"⏱️  Eski:             {legacy * 1000:8.1f} ms")
+    print(f"⏱️  Yeni:             {fast * 1000:8.1f} ms  ({legacy / fast:.1f}x)")
+    print(f"⏱️  Toplu (havuzlu):  {batch * 1000:8.1f} ms  ({legacy / batch:.1f}x, {os.cpu_count()} çekirdek)")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+YolPedia Veri Seti Formatı - Sıkıştırılmış, parçalı (sharded) JSON Lines
+Dizin yapısı:
+    yolpedia_data/manifest.json         -> sürüm, parça listesi, parça başına sha256
+    yolpedia_data/shard-00.jsonl.gz ... -> link'e göre sabit parçalara bölünmüş kayıtlar
+Eski tek dosyalık yolpedia_data.json da okunabilir.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+FORMAT_VERSION = 1
+DATASET_DIR = "yolpedia_data"
+MANIFEST_FILE = "manifest.json"
+SHARD_COUNT = 16
+
+
+def shard_of(link: str, shard_count: int = SHARD_COUNT) -> int:
+    """Link'ten sabit parça numarası (Python hash()'i süreçten sürece değişir, sha1 değişmez)"""
+    return int(hashlib.sha1(link.encode('utf-8')).hexdigest()[:8], 16) % shard_count
+
+
+def shard_name(index: int) -> str:
+    return f"shard-{index:02d}.jsonl.gz"
+
+
+def encode_shard(records: List[Dict]) -> bytes:
+    """Kayıtları deterministik gzip'li JSON Lines'a çevir (aynı veri -> aynı hash)"""
+    lines = [json.dumps(r, ensure_ascii=False, sort_keys=True) for r in sorted(records, key=lambda r: r['link'])]
+    payload = ('\n'.join(lines) + '\n').encode('utf-8') if lines else b''
+    return gzip.compress(payload, compresslevel=9, mtime=0)
+
+
+def decode_shard(blob: bytes) -> List[Dict]:
+    payload = gzip.decompress(blob).strip()
+    if not payload:
+        return []
+    # json.dumps satır içinde ham \n üretmez: satırları tek bir dizi olarak tek seferde parse et
+    return json.loads(b'[' + payload.replace(b'\n', b',') + b']')
+
+
+def build_shards(records: List[Dict], shard_count: int = SHARD_COUNT) -> Tuple[Dict, Dict[str, bytes]]:
+    """Kayıtları parçalara böl: (manifest, {dosya adı: içerik})"""
+    buckets: List[List[Dict]] = [[] for _ in range(shard_count)]
+    for record in records:
+        buckets[shard_of(record['link'], shard_count)].append(record)
+
+    files = {}
+    shards = []
+    for index, bucket in enumerate(buckets):
+        name = shard_name(index)
+        blob = encode_shard(bucket)
+        files[name] = blob
+        shards.append({
+            'file': name,
+            'sha256': hashlib.sha256(blob).hexdigest(),
+            'records': len(bucket),
+        })
+
+    manifest = {
+        'version': FORMAT_VERSION,
+        'shard_count': shard_count,
+        'records': len(records),
+        'shards': shards,
+    }
+    return manifest, files
+
+
+def encode_manifest(manifest: Dict) -> bytes:
+    return json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True).encode('utf-8')
+
+
+def write_dataset(records: List[Dict], directory: str = DATASET_DIR, shard_count: int = SHARD_COUNT) -> Dict:
+    """Veri setini yerel dizine yaz; sadece değişen parçalar yeniden yazılır, manifest en son"""
+    os.makedirs(directory, exist_ok=True)
+    old_manifest = read_manifest(directory)
+    old_hashes = {s['file']: s['sha256'] for s in old_manifest.get('shards', [])} if old_manifest else {}
+
+    manifest, files = build_shards(records, shard_count)
+    for shard in manifest['shards']:
+        path = os.path.join(directory, shard['file'])
+        if old_hashes.get(shard['file']) == shard['sha256'] and os.path.exists(path):
+            continue
+        _atomic_write(path, files[shard['file']])
+
+    _atomic_write(os.path.join(directory, MANIFEST_FILE), encode_manifest(manifest))
+    return manifest
+
+
+def read_manifest(directory: str = DATASET_DIR) -> Optional[Dict]:
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Desteklenmeyen veri seti sürümü: {manifest.get('version')}")
+    return manifest
+
+
+def load_shard(directory: str, shard: Dict) -> List[Dict]:
+    with open(os.path.join(directory, shard['file']), 'rb') as f:
+        blob = f.read()
+    if hashlib.sha256(blob).hexdigest() != shard['sha256']:
+        raise ValueError(f"Parça bozuk veya eksik: {shard['file']}")
+    return decode_shard(blob)
+
+
+def load_dataset(directory: str = DATASET_DIR, legacy_file: str = "yolpedia_data.json",
+                 workers: int = 4) -> List[Dict]:
+    """Parçalı veri setini paralel yükle; yoksa eski tek dosyalık JSON'a düş"""
+    manifest = read_manifest(directory)
+    if manifest is None:
+        with open(legacy_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    # gzip açma GIL'i bırakır; parçalar iş parçacıklarında paralel çözülür
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        parts = executor.map(lambda shard: load_shard(directory, shard), manifest['shards'])
+        return [record for part in parts for record in part]
+
+
+def dataset_source(directory: str = DATASET_DIR, legacy_file: str = "yolpedia_data.json") -> Optional[str]:
+    """Parmak izi alınacak dosya: manifest (parça hash'lerini içerir) veya eski JSON"""
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        return manifest_path
+    if os.path.exists(legacy_file):
+        return legacy_file
+    return None
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+if __name__ == "__main__":
+    # Eski tek dosyalık JSON'u parçalı formata çevir: python dataset.py [yolpedia_data.json]
+    import sys
+    source = sys.argv[1] if len(sys.argv) > 1 else "yolpedia_data.json"
+    with open(source, 'r', encoding='utf-8') as f:
+        records = json.load(f)
+    manifest = write_dataset(records)
+    print(f"✅ {manifest['records']} kayıt {manifest['shard_count']} parçaya yazıldı: {DATASET_DIR}/")
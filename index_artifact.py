@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YolPedia Hazır İndeks Paketi - Veri setinden bir kez kurulan veritabanı (içerik, pasajlar, FTS5)
+ve vektör indeksi. Uygulama soğuk başlangıçta paketin parmak izi veri setininkiyle (DATA_VERSION
+dahil) aynıysa dosyaları kopyalar; JSON parse, normalizasyon ve indeks kurulumu atlanır.
+Vektör matrisi kopyalandıktan sonra her zamanki gibi mmap ile açılır.
+Kullanım (veri seti güncellendikten sonra, dağıtımdan önce):
+    python index_artifact.py --output yolpedia_index
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+FORMAT_VERSION = 1        # Paket düzeni değişirse artırılır (eski paketler yok sayılır)
+ARTIFACT_DIR = "yolpedia_index"
+MANIFEST_FILE = "manifest.json"
+DB_FILE = "yolpedia.db"
+VECTOR_DIR = "vectors"
+
+
+# ===================== OKUMA / KURULUM =====================
+
+def read_manifest(directory: str) -> Optional[Dict]:
+    """Paket manifest'i; paket yoksa, bozuksa veya başka bir format sürümündeyse None"""
+    if not directory:
+        return None
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get('format') != FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def replace_tree(source: str, target: str):
+    """Dizini kopyala; hedef ancak kopya tamamlanınca yer değiştirir"""
+    tmp_target = f"{target}.tmp-{os.getpid()}"
+    old_target = f"{target}.old-{os.getpid()}"
+    shutil.rmtree(tmp_target, ignore_errors=True)
+    shutil.copytree(source, tmp_target)
+    if os.path.isdir(target):
+        os.replace(target, old_target)
+    os.replace(tmp_target, target)
+    shutil.rmtree(old_target, ignore_errors=True)
+
+
+def install(directory: str, manifest: Dict, db_path: str, vector_dir: str):
+    """Paketi uygulamanın veritabanı ve vektör dizini yerine kopyala (atomik yer değiştirme)"""
+    tmp_db = f"{db_path}.tmp-{os.getpid()}"
+    shutil.copyfile(os.path.join(directory, DB_FILE), tmp_db)
+    # Eski veritabanının WAL dosyaları yenisine uygulanmamalı
+    for suffix in ("-wal", "-shm"):
+        try:
+            os.remove(db_path + suffix)
+        except FileNotFoundError:
+            pass
+    os.replace(tmp_db, db_path)
+    if manifest.get('vectors'):
+        replace_tree(os.path.join(directory, VECTOR_DIR), vector_dir)
+
+
+# ===================== KURMA =====================
+
+def write(directory: str, db_path: str, vector_dir: Optional[str], data_hash: str, posts: int) -> Dict:
+    """Kurulu veritabanı ve vektör indeksinden paket yaz; manifest en son yazılır"""
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    # Yazım yarıda kalırsa eski manifest yeni dosyaları yanlış etiketlemesin
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    tmp_db = os.path.join(directory, f"{DB_FILE}.tmp")
+    if os.path.exists(tmp_db):
+        os.remove(tmp_db)
+    source = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    target = sqlite3.connect(tmp_db)
+    try:
+        source.backup(target)
+        # Dağıtım için tek dosya: WAL kapatılır, boş sayfalar atılır
+        target.execute("PRAGMA journal_mode=DELETE")
+        target.execute("VACUUM")
+    finally:
+        target.close()
+        source.close()
+    os.replace(tmp_db, os.path.join(directory, DB_FILE))
+
+    has_vectors = bool(vector_dir) and os.path.isdir(vector_dir)
+    if has_vectors:
+        replace_tree(vector_dir, os.path.join(directory, VECTOR_DIR))
+    else:
+        shutil.rmtree(os.path.join(directory, VECTOR_DIR), ignore_errors=True)
+
+    manifest = {
+        'format': FORMAT_VERSION,
+        'data_hash': data_hash,
+        'posts': posts,
+        'vectors': has_vectors,
+        'db_bytes': os.path.getsize(os.path.join(directory, DB_FILE)),
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+    with open(f"{manifest_path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    return manifest
+
+
+def build(directory: str = ARTIFACT_DIR) -> Dict:
+    """Geçerli dizindeki veri setinden paketi kur (uygulamanın kendi yükleme yolu kullanılır)"""
+    import app   # Streamlit'i içe aktarır; uygulama bu modülü yalnızca okuma/kurulum için kullanır
+
+    workdir = tempfile.mkdtemp(prefix="yolpedia-index-")
+    try:
+        app.config.DB_PATH = os.path.join(workdir, DB_FILE)
+        app.config.VECTOR_INDEX_DIR = os.path.join(workdir, VECTOR_DIR)
+        app.config.INDEX_ARTIFACT_DIR = ""   # Kurulum eski paketten başlamasın
+        kb = app.KnowledgeBase()
+        kb.close()
+        if kb.data_hash is None:
+            raise RuntimeError("Veri seti yüklenemedi (yolpedia_data/ veya yolpedia_data.json)")
+        conn = sqlite3.connect(app.config.DB_PATH)
+        posts = conn.execute("SELECT COUNT(*) FROM content").fetchone()[0]
+        conn.close()
+        vector_dir = app.config.VECTOR_INDEX_DIR if kb.vector_index is not None else None
+        return write(directory, app.config.DB_PATH, vector_dir, kb.data_hash, posts)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="YolPedia hazır indeks paketini kur")
+    parser.add_argument('--output', default=ARTIFACT_DIR, help="paket dizini")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        manifest = build(args.output)
+    except (OSError, sqlite3.Error, RuntimeError) as e:
+        print(f"❌ Paket kurulamadı: {e}")
+        return 1
+    print(f"✅ {manifest['posts']} yazı, {manifest['db_bytes'] / 1e6:.1f} MB veritabanı"
+          f"{' + vektör indeksi' if manifest['vectors'] else ''} → {args.output} "
+          f"({time.perf_counter() - started:.1f} sn)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,67 +2,244 @@
 # -*- coding: utf-8 -*-
 """
 JSON Temizleyici - Geçersiz kontrol karakterlerini temizler
+Akış (streaming) modunda çalışır: dosya sabit boyutlu parçalarla okunur, kayıtlar tek tek
+doğrulanıp yazılır; bellek kullanımı dosya boyutundan bağımsızdır.
 """
+import codecs
 import json
+import os
 import re
+import shutil
+import tempfile
+from collections import deque
 
 INPUT_FILE = "yolpedia_data.json"
 OUTPUT_FILE = "yolpedia_data_clean.json"
 
-def clean_json_file():
-    print(f"📖 Dosya okunuyor: {INPUT_FILE}")
-    
+CHUNK_SIZE = 1 << 20  # 1 MB
+MAX_RECORD_SIZE = 64 << 20  # Tek kayıt için üst sınır (karakter); kapanmayan metin tamponu büyütemez
+
+# Hata tamponun son bu kadar karakterindeyse kayıt yarım kalmış olabilir (tru, -Inf, 1.5e+, \u00)
+TRUNCATION_WINDOW = 16
+
+# Kontrol karakterleri (tab, newline, return hariç). UTF-8'de bu baytlar çok baytlı
+# dizilerin içinde geçemez, bu yüzden çözmeden önce bayt seviyesinde silinebilir.
+CONTROL_BYTES = re.compile(rb'[\x00-\x08\x0b-\x0c\x0e-\x1f\x7f]')
+
+REQUIRED_FIELDS = ('baslik', 'link')
+
+_WHITESPACE = ' \t\n\r'
+
+
+class CleanError(Exception):
+    """Kayıt sırası ve kaynak dosyadaki bayt konumuyla birlikte JSON hatası"""
+
+    def __init__(self, message, index, offset):
+        super().__init__(f"Kayıt #{index}, bayt {offset}: {message}")
+        self.index = index
+        self.offset = offset
+
+
+class RecordStream:
+    """Üst seviye JSON dizisini parça parça okuyup kayıtları tek tek veren akış"""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE, max_record_size=MAX_RECORD_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.max_record_size = max_record_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.source_read = 0     # Kaynaktan okunan bayt
+        self.consumed = 0        # Tamponun başına kadar işlenmiş temiz bayt
+        self.mark_pos = 0        # Tamponda bayt karşılığı en son ölçülen konum ...
+        self.mark_bytes = 0      # ... ve tampon başından oraya kadar temiz bayt
+        self.removed = deque()   # Henüz geçilmemiş silinen kontrol baytlarının kaynak konumları
+        self.removed_total = 0
+        self.shift = 0           # Geçilmiş silinen bayt sayısı (temiz -> kaynak konum farkı)
+
+    def fill(self):
+        """Tampona bir parça daha oku; dosya bittiyse False"""
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            self.buffer += self.decoder.decode(b'', final=True)
+            return False
+
+        for match in CONTROL_BYTES.finditer(chunk):
+            self.removed.append(self.source_read + match.start())
+            self.removed_total += 1
+        self.source_read += len(chunk)
+
+        # İşlenmiş kısmı at: tampon sadece yarım kalmış kaydı + yeni parçayı tutar
+        self.consumed += self.buffer_bytes()
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(CONTROL_BYTES.sub(b'', chunk))
+        self.pos = 0
+        self.mark_pos = self.mark_bytes = 0
+        return True
+
+    def buffer_bytes(self):
+        """Tampon başından şu anki konuma kadar temiz bayt; sadece son ölçümden sonrası kodlanır"""
+        if self.pos < self.mark_pos:
+            self.mark_pos = self.mark_bytes = 0
+        self.mark_bytes += len(self.buffer[self.mark_pos:self.pos].encode('utf-8'))
+        self.mark_pos = self.pos
+        return self.mark_bytes
+
+    def offset(self):
+        """Şu anki konumun kaynak dosyadaki bayt karşılığı (konumlar sadece ileri gider)"""
+        offset = self.consumed + self.buffer_bytes() + self.shift
+        while self.removed and self.removed[0] <= offset:
+            self.removed.popleft()
+            self.shift += 1
+            offset += 1
+        return offset
+
+    def truncated(self, error):
+        """Hata kaydın tamponun sonunda yarım kalmasından mı (devamı okunmalı), yoksa bozuk kayıttan mı"""
+        if self.eof:
+            return False
+        return error.msg.startswith('Unterminated string') or len(self.buffer) - error.pos <= TRUNCATION_WINDOW
+
+    def skip_whitespace(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.fill():
+                return
+
+    def peek(self):
+        self.skip_whitespace()
+        return self.buffer[self.pos] if self.pos < len(self.buffer) else ''
+
+    def records(self):
+        """(sıra, kayıt, bayt konumu) üreteci"""
+        if self.peek() != '[':
+            raise CleanError("Dosya bir JSON dizisi ('[') ile başlamıyor", 0, self.offset())
+        self.pos += 1
+
+        index = 0
+        while True:
+            char = self.peek()
+            if char == ']':
+                return
+            if index > 0:
+                if char != ',':
+                    raise CleanError(f"',' veya ']' bekleniyordu, '{char}' bulundu", index, self.offset())
+                self.pos += 1
+                self.skip_whitespace()
+            if not self.peek():
+                raise CleanError("Dosya beklenmedik şekilde bitti", index, self.offset())
+
+            start_offset = self.offset()
+            while True:
+                if len(self.buffer) - self.pos > self.max_record_size:
+                    raise CleanError(f"Kayıt {self.max_record_size} karakterden uzun (kapanmamış metin?)",
+                                     index, start_offset)
+                try:
+                    record, end = self.json_decoder.raw_decode(self.buffer, self.pos)
+                    # Tampon sonunda biten sayı/değer yarım olabilir: emin olmak için devamını oku
+                    if end == len(self.buffer) and not self.eof and self.fill():
+                        continue
+                    break
+                except json.JSONDecodeError as e:
+                    # Sadece tamponun sonunda yarım kalmış kayıt için devamı okunur; bozuk kayıtta hemen hata
+                    if not self.truncated(e) or not self.fill():
+                        self.pos = e.pos
+                        raise CleanError(e.msg, index, self.offset())
+            self.pos = end
+            yield index, record, start_offset
+            index += 1
+
+
+def validate_record(record):
+    """Kayıt şemasını doğrula; hata mesajı veya None döner"""
+    if not isinstance(record, dict):
+        return f"nesne bekleniyordu, {type(record).__name__} bulundu"
+    for field in REQUIRED_FIELDS:
+        if not isinstance(record.get(field), str):
+            return f"'{field}' alanı eksik veya metin değil"
+    return None
+
+
+def format_record(record):
+    """json.dump(..., indent=2) ile birebir aynı dizi elemanı biçimi"""
+    text = json.dumps(record, ensure_ascii=False, indent=2)
+    return '\n'.join('  ' + line for line in text.split('\n'))
+
+
+def atomic_copy(source, target):
+    """Dosyayı geçici dosyaya kopyalayıp atomik olarak yerine koy"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(target)), suffix='.tmp')
+    os.close(fd)
+    try:
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def clean_json_file(input_file=INPUT_FILE, output_file=OUTPUT_FILE, chunk_size=CHUNK_SIZE):
+    print(f"📖 Dosya akış modunda okunuyor: {input_file}")
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output_file)), suffix='.tmp')
+    written = skipped = 0
     try:
-        # Dosyayı oku (errors='ignore' ile geçersiz karakterleri atla)
-        with open(INPUT_FILE, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-        
-        print(f"✅ Dosya okundu: {len(content)} karakter")
-        
-        # Kontrol karakterlerini temizle (tab, newline, return hariç)
-        print("🧹 Kontrol karakterleri temizleniyor...")
-        clean_content = re.sub(r'[\x00-\x08\x0b-\x0c\x0e-\x1f\x7f]', '', content)
-        
-        # JSON'u parse et ve yeniden yaz (formatlanmış)
-        print("🔍 JSON parse ediliyor...")
-        data = json.loads(clean_content)
-        
-        print(f"✅ {len(data)} kayıt bulundu")
-        
-        # Temiz JSON'u yaz
-        print(f"💾 Temiz dosya yazılıyor: {OUTPUT_FILE}")
-        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        
-        print(f"\n🎉 Başarılı! Temiz dosya: {OUTPUT_FILE}")
-        print(f"📝 Orijinal dosya yedeklendi: {INPUT_FILE}.backup")
-        
+        with open(input_file, 'rb') as src, os.fdopen(fd, 'w', encoding='utf-8') as out:
+            stream = RecordStream(src, chunk_size)
+
+            # Kontrol karakterleri parça parça temizlenir, kayıtlar tek tek doğrulanıp yazılır
+            print("🧹 Kontrol karakterleri temizleniyor, kayıtlar doğrulanıyor...")
+            out.write('[')
+            for index, record, offset in stream.records():
+                problem = validate_record(record)
+                if problem:
+                    print(f"⚠️ Kayıt #{index} (bayt {offset}) atlandı: {problem}")
+                    skipped += 1
+                    continue
+                out.write(',\n' if written else '\n')
+                out.write(format_record(record))
+                written += 1
+            out.write('\n]' if written else ']')
+            out.flush()
+            os.fsync(out.fileno())
+
+        print(f"✅ {written} kayıt yazıldı, {skipped} kayıt atlandı, "
+              f"{stream.removed_total} kontrol karakteri silindi")
+
+        # Temiz JSON'u atomik olarak yerine koy
+        print(f"💾 Temiz dosya yazılıyor: {output_file}")
+        os.replace(tmp_path, output_file)
+
         # Orijinali yedekle
-        import shutil
-        shutil.copy(INPUT_FILE, f"{INPUT_FILE}.backup")
-        
+        shutil.copyfile(input_file, f"{input_file}.backup")
+        print(f"📝 Orijinal dosya yedeklendi: {input_file}.backup")
+
         # Temiz dosyayı orijinal isimle kaydet
-        shutil.copy(OUTPUT_FILE, INPUT_FILE)
-        print(f"✅ {INPUT_FILE} güncellendi!")
-        
+        atomic_copy(output_file, input_file)
+        print(f"\n🎉 Başarılı! {input_file} güncellendi!")
+        return True
+
     except FileNotFoundError:
-        print(f"❌ HATA: {INPUT_FILE} bulunamadı!")
-    except json.JSONDecodeError as e:
+        print(f"❌ HATA: {input_file} bulunamadı!")
+    except CleanError as e:
         print(f"❌ JSON HATASI: {e}")
-        print("\n🔍 Hatalı satırı bulalım:")
-        
-        # Hatalı bölümü göster
-        lines = clean_content.split('\n')
-        if e.lineno <= len(lines):
-            start = max(0, e.lineno - 3)
-            end = min(len(lines), e.lineno + 2)
-            
-            print(f"\n--- Satır {start+1} - {end+1} ---")
-            for i in range(start, end):
-                marker = ">>> " if i == e.lineno - 1 else "    "
-                print(f"{marker}{i+1}: {lines[i][:100]}")
+        print(f"🔍 Hatalı bölüm (bayt {e.offset} civarı):")
+        with open(input_file, 'rb') as f:
+            f.seek(max(0, e.offset - 80))
+            print(f"    {f.read(160).decode('utf-8', errors='replace')!r}")
     except Exception as e:
         print(f"❌ BEKLENMEYEN HATA: {e}")
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return False
 
 if __name__ == "__main__":
     print("=" * 60)
@@ -0,0 +1,293 @@
+"""
+YolPedia Ölçüm Katmanı - Zamanlama aralıkları (span), yüzdelikli histogramlar, Prometheus metin çıktısı
+Bağımlılıksızdır ve iş parçacığı güvenlidir; süreçteki tüm oturumlar tek `REGISTRY`'yi paylaşır.
+Yavaş istekler için isteğe bağlı cProfile örneklemesi yapılır.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+PREFIX = "yolpedia_"
+
+# Saniye cinsinden kova sınırları (arama ~ms, Gemini cevabı ~sn)
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Adet/karakter gibi büyüklükler için
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+RESERVOIR_SIZE = 1024   # Yüzdelikler son bu kadar örnekten hesaplanır
+QUANTILES = (0.5, 0.95, 0.99)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v).lower() if isinstance(v, bool) else str(v)) for k, v in labels.items()))
+
+
+class Histogram:
+    """Sabit kovalar (Prometheus için toplanabilir) + son örneklerden p50/p95/p99"""
+
+    def __init__(self, buckets: Tuple[float, ...] = TIME_BUCKETS, reservoir: int = RESERVOIR_SIZE):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # Son eleman: +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=reservoir)
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def percentiles(self, quantiles: Iterable[float] = QUANTILES) -> Dict[float, float]:
+        """En yakın sıra yöntemiyle yüzdelikler (örnek yoksa boş)"""
+        values = sorted(self.recent)
+        if not values:
+            return {}
+        return {q: values[min(len(values) - 1, max(0, int(q * len(values) + 0.5) - 1))] for q in quantiles}
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Prometheus `le` kovaları (birikimli)"""
+        total = 0
+        rows = []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            rows.append((format_value(bound), total))
+        rows.append(("+Inf", total + self.counts[-1]))
+        return rows
+
+
+class Span:
+    """Bir işlemin süresi ve ara noktaları (ör. ilk token). Bağlam yöneticisi olarak ya da
+    üreteçlerde elle (`finish`) kullanılır; süre `{name}_seconds`, ara noktalar
+    `{name}_{mark}_seconds` histogramlarına yazılır."""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, labels: Dict[str, object],
+                 profile: bool = False):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.started = time.perf_counter()
+        self.marks: Dict[str, float] = {}
+        self.status = "ok"          # Yedek cevap gibi durumlarda çağıran değiştirir
+        self.elapsed: Optional[float] = None
+        self.finished = False
+        self.profiler = registry.start_profile() if profile else None
+
+    def mark(self, event: str) -> float:
+        """Ara noktayı ilk geçişte kaydet; başlangıçtan geçen süreyi döndür"""
+        elapsed = self.marks.get(event)
+        if elapsed is None:
+            elapsed = self.marks[event] = time.perf_counter() - self.started
+        return elapsed
+
+    def finish(self, status: Optional[str] = None) -> float:
+        if self.finished:
+            return 0.0
+        self.finished = True
+        elapsed = self.elapsed = time.perf_counter() - self.started
+        labels = dict(self.labels, status=status or self.status)
+        self.registry.observe(f"{self.name}_seconds", elapsed, **labels)
+        for event, offset in self.marks.items():
+            self.registry.observe(f"{self.name}_{event}_seconds", offset, **self.labels)
+        if self.profiler is not None:
+            self.registry.finish_profile(self.profiler, self.name, elapsed)
+        return elapsed
+
+    def __enter__(self) -> "Span":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish("error" if exc_type is not None else None)
+        return False
+
+
+class MetricsRegistry:
+    """Süreç geneli sayaçlar, göstergeler ve histogramlar"""
+
+    def __init__(self, profile_slow_seconds: float = 0.0, profile_rate: float = 0.0,
+                 max_profiles: int = 10, max_errors: int = 50):
+        self.lock = threading.Lock()
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self.help: Dict[str, str] = {}
+        self.started = time.time()
+        # Yavaş istek profili: `profile_rate` oranında örneklenir, süre eşiği aşanlar saklanır
+        self.profile_slow_seconds = profile_slow_seconds
+        self.profile_rate = profile_rate
+        self.profiles = deque(maxlen=max_profiles)
+        self.errors = deque(maxlen=max_errors)
+        self._profiling = threading.Lock()
+
+    # ---------- Kayıt ----------
+
+    def describe(self, name: str, text: str):
+        self.help[name] = text
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = TIME_BUCKETS, **labels):
+        key = label_key(labels)
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, name: str, value: float = 1.0, **labels):
+        key = label_key(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self.lock:
+            self.gauges.setdefault(name, {})[label_key(labels)] = value
+
+    def span(self, name: str, profile: bool = False, **labels) -> Span:
+        return Span(self, name, labels, profile)
+
+    def timed(self, name: str, **labels) -> Callable:
+        """Fonksiyon süresini ölçen dekoratör"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def error(self, stage: str, error: BaseException, message: Optional[str] = None):
+        """Hatayı say ve son hatalar listesine ekle; mesaj verilirse (eskisi gibi) konsola da yazılır"""
+        self.increment("errors_total", stage=stage, type=type(error).__name__)
+        with self.lock:
+            self.errors.append({'time': time.time(), 'stage': stage, 'type': type(error).__name__,
+                                'message': message or str(error)})
+        if message:
+            print(message)
+
+    def reset(self):
+        """Tüm serileri sıfırla (ör. yük testinde her eşzamanlılık seviyesi öncesi)"""
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.gauges.clear()
+            self.errors.clear()
+
+    # ---------- Profil ----------
+
+    def start_profile(self) -> Optional[cProfile.Profile]:
+        """Örneklenirse profili başlat (aynı anda tek profil; sadece çağıran iş parçacığı ölçülür)"""
+        if self.profile_slow_seconds <= 0 or self.profile_rate <= 0 or random.random() >= self.profile_rate:
+            return None
+        if not self._profiling.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # Başka bir profil aracı etkin
+            self._profiling.release()
+            return None
+        return profiler
+
+    def finish_profile(self, profiler: cProfile.Profile, name: str, elapsed: float):
+        profiler.disable()
+        self._profiling.release()
+        self.increment("profiles_sampled_total", span=name)
+        if elapsed < self.profile_slow_seconds:
+            return
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(25)
+        with self.lock:
+            self.profiles.append({'time': time.time(), 'span': name,
+                                  'seconds': round(elapsed, 3), 'stats': out.getvalue()})
+
+    # ---------- Okuma ----------
+
+    def summary(self) -> List[Dict]:
+        """Her histogram serisi için adet, ortalama ve p50/p95/p99 (yönetici paneli için)"""
+        rows = []
+        with self.lock:
+            for name in sorted(self.histograms):
+                for key, histogram in sorted(self.histograms[name].items()):
+                    row = {'metric': name, 'labels': ", ".join(f"{k}={v}" for k, v in key),
+                           'count': histogram.count,
+                           'mean': round(histogram.sum / histogram.count, 4) if histogram.count else 0.0}
+                    for q, value in histogram.percentiles().items():
+                        row[f"p{int(q * 100)}"] = round(value, 4)
+                    rows.append(row)
+        return rows
+
+    def prometheus(self) -> str:
+        """Prometheus metin biçimi (text exposition format 0.0.4)"""
+        lines = []
+        with self.lock:
+            for kind, store in (('counter', self.counters), ('gauge', self.gauges)):
+                for name in sorted(store):
+                    full = PREFIX + name
+                    self.header(lines, full, name, kind)
+                    for key, value in sorted(store[name].items()):
+                        lines.append(f"{full}{format_labels(key)} {format_value(value)}")
+            for name in sorted(self.histograms):
+                full = PREFIX + name
+                self.header(lines, full, name, 'histogram')
+                for key, histogram in sorted(self.histograms[name].items()):
+                    for bound, count in histogram.cumulative():
+                        lines.append(f"{full}_bucket{format_labels(key + (('le', bound),))} {count}")
+                    lines.append(f"{full}_sum{format_labels(key)} {format_value(histogram.sum)}")
+                    lines.append(f"{full}_count{format_labels(key)} {histogram.count}")
+        lines.append(f"{PREFIX}process_start_time_seconds {format_value(self.started)}")
+        return "\n".join(lines) + "\n"
+
+    def header(self, lines: List[str], full: str, name: str, kind: str):
+        if name in self.help:
+            lines.append(f"# HELP {full} {self.help[name]}")
+        lines.append(f"# TYPE {full} {kind}")
+
+    def write_textfile(self, path: str):
+        """node_exporter textfile toplayıcısı için atomik yaz"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus())
+        os.replace(tmp_path, path)
+
+
+def format_value(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    pairs = []
+    for k, v in key:
+        v = v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{k}="{v}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+REGISTRY = MetricsRegistry(
+    profile_slow_seconds=float(os.environ.get("YOLPEDIA_PROFILE_SLOW_SECONDS", "0") or 0),
+    profile_rate=float(os.environ.get("YOLPEDIA_PROFILE_RATE", "0.1") or 0),
+)
+
+REGISTRY.describe("errors_total", "Aşama ve hata türüne göre yakalanan hatalar")
+REGISTRY.describe("search_seconds", "KnowledgeBase.search süresi")
+REGISTRY.describe("prompt_build_seconds", "Prompt oluşturma süresi")
+REGISTRY.describe("generate_seconds", "Cevap üretiminin toplam süresi (kuyruk dahil)")
+REGISTRY.describe("generate_first_token_seconds", "İsteğin başından ilk cevap parçasına kadar geçen süre")
+REGISTRY.describe("load_seconds", "Veri seti yükleme/senkron süresi")
+REGISTRY.describe("startup_phase_seconds", "Soğuk başlangıç fazları (hazır indeks, şema, senkron, indeksler, SDK)")
+REGISTRY.describe("crawl_seconds", "Güncelleyici tarama süresi")
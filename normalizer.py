@@ -0,0 +1,72 @@
+"""
+YolPedia Metin Normalizasyonu - Hızlı yol (önceden hesaplanmış çeviri tablosu + derlenmiş desenler)
+Türkçe, Kürtçe/Zazaca ve şapkalı harfler ASCII karşılıklarına indirgenir.
+"""
+
+import os
+import re
+import string
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional
+
+# lower() sonrası kalan harfler; büyük harfler (Ğ, Ş, Î, Û...) lower() ile zaten küçülür.
+# str.translate Unicode çıktıda yavaş olduğundan katlama C seviyesindeki replace ile yapılır.
+# Not: 'ê' (Kurmancî/Zazakî) eski normalize_text ile birebir aynı çıktı için dönüştürülmez.
+_FOLD_PAIRS = (
+    ('ğ', 'g'), ('ü', 'u'), ('ş', 's'), ('ı', 'i'), ('ö', 'o'), ('ç', 'c'),
+    ('â', 'a'), ('î', 'i'), ('û', 'u'),
+)
+
+# ASCII hızlı yolu: \w dışındaki her bayt boşluğa çevrilir, ardından bytes.split() ile bölünür
+_WORD_BYTES = frozenset((string.ascii_letters + string.digits + '_').encode('ascii'))
+_ASCII_TABLE = bytes(b if b in _WORD_BYTES else 0x20 for b in range(256))
+
+# Genel yol: [^\w\s] -> boşluk ve \s+ -> tek boşluk işlemlerinin eşdeğeri
+_WORD_RE = re.compile(r'\w+')
+
+# Toplam bu kadar karakterin altında süreç havuzu kurma maliyeti kazançtan büyük
+PARALLEL_MIN_CHARS = 4_000_000
+
+
+def normalize_text(text: str) -> str:
+    """Türkçe metni normalize et"""
+    if not text:
+        return ""
+
+    text = text.lower()
+    for old, new in _FOLD_PAIRS:
+        if old in text:
+            text = text.replace(old, new)
+
+    if text.isascii():
+        return b' '.join(text.encode('ascii').translate(_ASCII_TABLE).split()).decode('ascii')
+    return ' '.join(_WORD_RE.findall(text))
+
+
+def token_offsets(text: str) -> List[int]:
+    """normalize_text(text).split() ile birebir hizalı token başlangıçları (orijinal metinde)"""
+    if not text:
+        return []
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        # Katlama harfi harfe eşler: kelime sınırları küçük harfli metindekiyle aynıdır
+        return [m.start() for m in _WORD_RE.finditer(lowered)]
+    # Nadir: lower() uzunluğu değiştirdi ("İ" -> "i̇"); her kelime ayrı normalize edilir
+    offsets = []
+    for m in _WORD_RE.finditer(text):
+        offsets.extend([m.start()] * len(normalize_text(m.group()).split()))
+    return offsets
+
+
+def normalize_many(texts: Iterable[str], workers: Optional[int] = None) -> List[str]:
+    """Bir metin listesini tek geçişte normalize et; büyük derlemlerde süreç havuzu kullan"""
+    texts = list(texts)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1 or sum(len(t) for t in texts if t) < PARALLEL_MIN_CHARS:
+        return [normalize_text(t) for t in texts]
+
+    chunksize = max(1, len(texts) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(normalize_text, texts, chunksize=chunksize))
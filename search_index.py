@@ -0,0 +1,280 @@
+"""
+YolPedia Arama İndeksi - Bellek içi ters indeks (inverted index)
+Normalize edilmiş token'lar -> posting listeleri, BM25 tabanlı skorlama
+"""
+
+import heapq
+import math
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+
+class InvertedIndex:
+    """Yükleme anında bir kez kurulan, sorguda tam tarama yapmayan indeks"""
+
+    TITLE_WEIGHT = 3          # Başlıktaki bir geçiş, gövdedekinin 3 katı sayılır
+    K1 = 1.2
+    B = 0.75
+    PREFIX_WEIGHT = 0.6       # "semah" -> "semahlar" gibi ek almış biçimler
+    MAX_PREFIX_EXPANSION = 40
+    MIN_PREFIX_LENGTH = 3
+    PHRASE_BONUS = 1.5
+
+    def __init__(self):
+        self.postings: Dict[str, Tuple[array, array]] = {}  # token -> (doc_id'ler, BM25 katkıları)
+        # token -> (doc_id'lerle hizalı başlangıçlar, gövdedeki konumlar): ifade eşleşmesi için
+        self.positions: Dict[str, Tuple[array, array]] = {}
+        self.vocabulary: List[str] = []
+        self.doc_lengths = array('I')
+        self.titles: List[str] = []
+        self.avg_length = 0.0
+
+    @classmethod
+    def build(cls, docs: Iterable[Tuple[str, str]]) -> "InvertedIndex":
+        """(normalize başlık, normalize içerik) çiftlerinden indeksi kur"""
+        index = cls()
+        raw: Dict[str, Dict[int, int]] = defaultdict(dict)
+        raw_positions: Dict[str, Dict[int, List[int]]] = defaultdict(dict)
+
+        for doc_id, (title, body) in enumerate(docs):
+            title_tokens = title.split()
+            body_tokens = body.split()
+
+            for token in title_tokens:
+                tfs = raw[token]
+                tfs[doc_id] = tfs.get(doc_id, 0) + cls.TITLE_WEIGHT
+            for position, token in enumerate(body_tokens):
+                tfs = raw[token]
+                tfs[doc_id] = tfs.get(doc_id, 0) + 1
+                raw_positions[token].setdefault(doc_id, []).append(position)
+
+            index.doc_lengths.append(len(title_tokens) * cls.TITLE_WEIGHT + len(body_tokens))
+            index.titles.append(title)
+
+        if index.doc_lengths:
+            index.avg_length = sum(index.doc_lengths) / len(index.doc_lengths)
+
+        # BM25 katkıları (idf * tf doygunluğu) kurulumda bir kez hesaplanır,
+        # sorgu sırasında sadece toplama yapılır
+        n_docs = len(index.doc_lengths)
+        for token, tfs in raw.items():
+            doc_ids = sorted(tfs)
+            idf = math.log(1 + (n_docs - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            impacts = array('f')
+            for doc_id in doc_ids:
+                tf = tfs[doc_id]
+                norm = cls.K1 * (1 - cls.B + cls.B * index.doc_lengths[doc_id] / index.avg_length)
+                impacts.append(idf * tf * (cls.K1 + 1) / (tf + norm))
+            index.postings[token] = (array('I', doc_ids), impacts)
+
+            # Sadece başlıkta geçtiği dokümanlarda konum aralığı boş kalır
+            doc_positions = raw_positions.get(token, {})
+            starts, flat = array('I', [0]), array('I')
+            for doc_id in doc_ids:
+                flat.extend(doc_positions.get(doc_id, ()))
+                starts.append(len(flat))
+            index.positions[token] = (starts, flat)
+
+        index.vocabulary = sorted(index.postings)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def expand(self, token: str) -> List[Tuple[str, float]]:
+        """Token'ı tam eşleşme + önek eşleşmeleri olarak sözlükte çöz"""
+        terms = []
+        if token in self.postings:
+            terms.append((token, 1.0))
+        if len(token) < self.MIN_PREFIX_LENGTH:
+            return terms
+
+        start = bisect_left(self.vocabulary, token)
+        for term in self.vocabulary[start:start + self.MAX_PREFIX_EXPANSION + 1]:
+            if not term.startswith(token):
+                break
+            if term != token:
+                terms.append((term, self.PREFIX_WEIGHT))
+        return terms
+
+    def term_positions(self, term: str, doc_id: int) -> array:
+        """Terimin dokümanın gövdesindeki konumları (posting listesinden)"""
+        doc_ids = self.postings[term][0]
+        i = bisect_left(doc_ids, doc_id)
+        if i == len(doc_ids) or doc_ids[i] != doc_id:
+            return array('I')
+        starts, flat = self.positions[term]
+        return flat[starts[i]:starts[i + 1]]
+
+    def has_phrase(self, tokens: List[str], doc_id: int) -> bool:
+        """Token'lar gövdede art arda geçiyor mu (konumların kesişimi)"""
+        if any(token not in self.postings for token in tokens):
+            return False
+        starts = set(self.term_positions(tokens[0], doc_id))
+        for offset, token in enumerate(tokens[1:], 1):
+            if not starts:
+                break
+            starts &= {p - offset for p in self.term_positions(token, doc_id)}
+        return bool(starts)
+
+    def search(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """Normalize sorgu için (doc_id, skor) listesi döndür"""
+        tokens = list(dict.fromkeys(query.split()))
+        if not tokens or not self.doc_lengths:
+            return []
+
+        scores: Dict[int, float] = defaultdict(float)
+        matched: Dict[int, int] = defaultdict(int)
+
+        for token in tokens:
+            seen = set()
+            for term, weight in self.expand(token):
+                doc_ids, impacts = self.postings[term]
+                for doc_id, impact in zip(doc_ids, impacts):
+                    scores[doc_id] += weight * impact
+                seen.update(doc_ids)
+            for doc_id in seen:
+                matched[doc_id] += 1
+
+        if not scores:
+            return []
+
+        # Önce daha çok sorgu kelimesini karşılayanlar, sonra skor
+        def rank_key(doc_id):
+            return matched[doc_id], scores[doc_id]
+
+        ranked = heapq.nlargest(limit * 5, scores, key=rank_key)
+
+        # İfade (phrase) doğrulaması sadece en iyi adaylarda yapılır
+        if len(tokens) > 1:
+            phrase = query.split()
+            for doc_id in ranked:
+                if query in self.titles[doc_id]:
+                    scores[doc_id] *= self.PHRASE_BONUS * 2
+                elif self.has_phrase(phrase, doc_id):
+                    scores[doc_id] *= self.PHRASE_BONUS
+            ranked.sort(key=rank_key, reverse=True)
+
+        return [(doc_id, scores[doc_id]) for doc_id in ranked[:limit]]
+
+
+class TrigramIndex:
+    """Yazım hatasına dayanıklı eşleşme için karakter trigram indeksi
+
+    Terimler uzunluğa göre sıralı id alır; böylece her trigram'ın posting listesi aynı zamanda
+    uzunluğa göre sıralıdır ve uzunluk penceresi dışındaki terimler bisect ile hiç taranmaz.
+    """
+
+    MIN_JACCARD = 0.2     # Kısa kelimelerde tek hata trigram'ların yarısını bozabilir
+    MAX_VERIFY = 200      # Mesafe hesabı yapılacak en çok aday (en çok trigram paylaşanlar)
+
+    def __init__(self):
+        self.terms: List[str] = []
+        self.term_set = frozenset()
+        self.lengths = array('I')
+        self.trigram_counts = array('H')
+        self.postings: Dict[str, array] = {}
+
+    @staticmethod
+    def trigrams(text: str) -> set:
+        padded = f"  {text} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    @classmethod
+    def build(cls, terms: Iterable[str], known: Iterable[str] = ()) -> "TrigramIndex":
+        """terms: düzeltme adayları; known: sadece "sözlükte var" sayılan ek terimler"""
+        index = cls()
+        candidates = set(t for t in terms if t)
+        index.term_set = frozenset(candidates.union(known))
+        index.terms = sorted(candidates, key=lambda t: (len(t), t))
+        raw: Dict[str, List[int]] = defaultdict(list)
+        for term_id, term in enumerate(index.terms):
+            grams = cls.trigrams(term)
+            index.lengths.append(len(term))
+            index.trigram_counts.append(min(len(grams), 65535))
+            for gram in grams:
+                raw[gram].append(term_id)
+        index.postings = {gram: array('I', ids) for gram, ids in raw.items()}
+        return index
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.term_set
+
+    @staticmethod
+    def max_distance(word: str) -> int:
+        return 1 if len(word) <= 5 else 2
+
+    def search(self, word: str, limit: int = 5, max_distance: int = None) -> List[Tuple[str, int]]:
+        """Benzer terimler: (terim, düzenleme mesafesi), en yakından uzağa"""
+        if not self.terms or not word:
+            return []
+        if max_distance is None:
+            max_distance = self.max_distance(word)
+
+        # Uzunluk penceresi: |len(a) - len(b)| > mesafe ise eşleşme imkansız
+        lo = bisect_left(self.lengths, max(0, len(word) - max_distance))
+        hi = bisect_left(self.lengths, len(word) + max_distance + 1)
+
+        grams = self.trigrams(word)
+        # Counter.update sayımı C seviyesinde yapar; posting'ler tek tek Python'da gezilmez
+        overlap: Counter = Counter()
+        for gram in grams:
+            postings = self.postings.get(gram)
+            if postings is not None:
+                overlap.update(postings[bisect_left(postings, lo):bisect_left(postings, hi)])
+
+        # q-gram sınırı: her düzenleme (yer değiştirme dahil) en fazla 4 trigram'ı bozar
+        min_shared = max(1, len(grams) - 4 * max_distance)
+        counts = self.trigram_counts
+        n_grams = len(grams)
+        scored = [(shared / (n_grams + counts[term_id] - shared), term_id)
+                  for term_id, shared in overlap.items() if shared >= min_shared]
+
+        # En benzer adaylardan başlayarak doğrula; yeterince yakın eşleşme bulununca dur
+        candidates = []
+        for jaccard, term_id in heapq.nlargest(self.MAX_VERIFY, scored):
+            if jaccard < self.MIN_JACCARD:
+                break
+            distance = bounded_levenshtein(word, self.terms[term_id], max_distance)
+            if distance <= max_distance:
+                candidates.append((distance, -jaccard, self.terms[term_id]))
+                if sum(1 for c in candidates if c[0] <= 1) >= limit:
+                    break
+
+        candidates.sort()
+        return [(term, distance) for distance, _, term in candidates[:limit]]
+
+
+def bounded_levenshtein(a: str, b: str, max_distance: int) -> int:
+    """Düzenleme mesafesi (yer değiştirme dahil, "semha" -> "semah" = 1); yalnızca köşegen
+    çevresindeki max_distance genişliğindeki bant hesaplanır, aşılınca max_distance + 1 döner"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if a == b:
+        return 0
+
+    limit = max_distance + 1
+    before = None
+    previous = [min(j, limit) for j in range(len(b) + 1)]
+    for i, char_a in enumerate(a, 1):
+        current = [limit] * (len(b) + 1)
+        if i <= max_distance:
+            current[0] = i
+        row_min = current[0]
+        for j in range(max(1, i - max_distance), min(len(b), i + max_distance) + 1):
+            char_b = b[j - 1]
+            cost = min(previous[j - 1] + (char_a != char_b), previous[j] + 1, current[j - 1] + 1)
+            if before is not None and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                cost = min(cost, before[j - 2] + 1)
+            current[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > max_distance:
+            return limit
+        before, previous = previous, current
+    return min(previous[-1], limit)
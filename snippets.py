@@ -0,0 +1,236 @@
+"""
+YolPedia Alıntı Motoru - Sorguya göre bağlam pencereleri (keyword-in-context) ve pasajlar
+Yükleme anında kaydedilen token ofsetleriyle eşleşmenin en yoğun olduğu bölgeler kesilir;
+sorguda makale yeniden normalize edilmez, sadece normalize token listesi karşılaştırılır.
+Uzun yazılar aynı ofsetlerle örtüşen pasajlara bölünür (pasaj düzeyinde indeks için).
+"""
+
+import math
+import re
+import sys
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import Dict, List, Optional, Sequence, Tuple
+
+MIN_PREFIX_LENGTH = 3      # search_index.InvertedIndex ile aynı: "semah" -> "semahlar"
+WINDOW_TOKENS = 24         # Bir pencerede birlikte sayılan eşleşmelerin en büyük uzaklığı
+MERGE_GAP = 40             # Aralarında bu kadar karakterden az olan pencereler birleşir
+MIN_FRAGMENT_CHARS = 60    # Bütçeden bundan az kaldıysa yeni pencere eklenmez
+ELLIPSIS = "…"
+
+_WORD_RE = re.compile(r'\w+')
+_MARKDOWN_RE = re.compile(r'([\\`*_\[\]$<>#~|])')
+
+
+# ===================== OFSET SAKLAMA =====================
+
+def encode_offsets(offsets: Sequence[int]) -> bytes:
+    """Ofsetleri ardışık farklar olarak sıkıştır (farklar küçük, zlib iyi sıkıştırır)"""
+    deltas = array('I', offsets[:1])
+    deltas.extend([b - a for a, b in zip(offsets, offsets[1:])])
+    if sys.byteorder == 'big':   # Veritabanı taşınabilir kalsın: her zaman little-endian
+        deltas.byteswap()
+    return zlib.compress(deltas.tobytes())
+
+
+def decode_offsets(blob: bytes) -> array:
+    deltas = array('I')
+    deltas.frombytes(zlib.decompress(blob))
+    if sys.byteorder == 'big':
+        deltas.byteswap()
+    return array('I', accumulate(deltas))
+
+
+# ===================== PASAJLAR =====================
+
+def passage_spans(token_count: int, size: int, overlap: int, max_passages: int) -> List[Tuple[int, int]]:
+    """Örtüşen token aralıkları [ilk, son); kısa kuyruk ayrı pasaj olmaz, sonuncuya eklenir"""
+    if token_count == 0:
+        return [(0, 0)]   # Gövdesi boş yazı da başlığıyla bulunabilsin
+    stride = max(1, size - overlap)
+    spans = []
+    start = 0
+    while len(spans) < max_passages:
+        end = min(token_count, start + size)
+        if token_count - end < stride // 2:
+            end = token_count
+        spans.append((start, end))
+        if end >= token_count:
+            break
+        start += stride
+    return spans
+
+
+def passages(text: str, tokens: Sequence[str], offsets: Optional[Sequence[int]], size: int,
+             overlap: int, max_passages: int) -> List[Tuple[int, int, int, str]]:
+    """Yazıyı pasajlara böl: (sıra, başlangıç karakteri, bitiş karakteri, normalize metin).
+    Ofsetler yoksa (hizalanamadıysa) tüm yazı tek pasajdır."""
+    if offsets is None or len(offsets) != len(tokens):
+        return [(0, 0, len(text), ' '.join(tokens))]
+    result = []
+    for seq, (first, last) in enumerate(passage_spans(len(tokens), size, overlap, max_passages)):
+        if first == last:
+            result.append((seq, 0, 0, ''))
+            continue
+        result.append((seq, offsets[first], word_end(text, offsets[last - 1]), ' '.join(tokens[first:last])))
+    return result
+
+
+# ===================== EŞLEŞME =====================
+
+def match_positions(tokens: Sequence[str], terms: Sequence[str]) -> List[Tuple[int, str]]:
+    """Sorgu terimleriyle eşleşen token sıraları: (sıra, terim); uzun terimler önek olarak eşleşir"""
+    terms = sorted(set(terms), key=len, reverse=True)   # En uzun eşleşen terim sayılır
+    exact = {t for t in terms if len(t) < MIN_PREFIX_LENGTH}
+    prefixes = tuple(t for t in terms if len(t) >= MIN_PREFIX_LENGTH)
+    positions = []
+    for i, token in enumerate(tokens):
+        if token in exact:
+            positions.append((i, token))
+        elif prefixes and token.startswith(prefixes):
+            positions.append((i, next(t for t in prefixes if token.startswith(t))))
+    return positions
+
+
+def term_weights(positions: List[Tuple[int, str]], token_count: int) -> Dict[str, float]:
+    """Doküman içi nadirlik: metnin her yerinde geçen terim ("ile") bölge seçiminde az sayılır"""
+    counts: Dict[str, int] = {}
+    for _, term in positions:
+        counts[term] = counts.get(term, 0) + 1
+    return {term: math.log(1 + token_count / count) for term, count in counts.items()}
+
+
+def best_windows(positions: List[Tuple[int, str]], weights: Dict[str, float],
+                 max_windows: int) -> List[Tuple[int, int]]:
+    """Farklı terimleri en çok kapsayan, çakışmayan token aralıkları (skora göre sıralı)"""
+    remaining = list(positions)
+    windows = []
+    first_score = 0.0
+    while remaining and len(windows) < max_windows:
+        best, best_score = None, 0.0
+        end = 0
+        for start in range(len(remaining)):
+            end = max(end, start)
+            while end + 1 < len(remaining) and remaining[end + 1][0] - remaining[start][0] < WINDOW_TOKENS:
+                end += 1
+            window = remaining[start:end + 1]
+            # Farklı terimler önce, eşleşme sayısı eşitlik bozucu
+            score = sum(weights[t] for t in {t for _, t in window}) + 0.01 * len(window)
+            if score > best_score:
+                best, best_score = (remaining[start][0], remaining[end][0]), score
+        # Sonraki pencereler ancak ilkinin yarısı kadar değerliyse eklenir (tek "ile" için yer harcanmaz)
+        if best_score < first_score / 2:
+            break
+        first_score = first_score or best_score
+        windows.append(best)
+        remaining = [p for p in remaining if not best[0] - WINDOW_TOKENS < p[0] < best[1] + WINDOW_TOKENS]
+    return windows
+
+
+# ===================== ALINTI =====================
+
+def word_end(text: str, offset: int) -> int:
+    match = _WORD_RE.match(text, offset)
+    return match.end() if match else offset
+
+
+def fit_span(text: str, offsets: Sequence[int], first: int, last: int,
+             context_tokens: int, budget: int) -> Tuple[int, int]:
+    """Eşleşme çekirdeğini bütçe kadar iki yana bağlamla genişlet (token sınırlarında)"""
+    core_start, core_end = offsets[first], word_end(text, offsets[last])
+    if core_end - core_start >= budget:
+        cut = text.rfind(' ', core_start, core_start + budget)
+        return core_start, cut if cut > core_start else core_start + budget
+    lo = offsets[max(0, first - context_tokens)]
+    hi = word_end(text, offsets[min(len(offsets) - 1, last + context_tokens)])
+    extra = budget - (core_end - core_start)
+    left = min(core_start - lo, extra // 2)
+    right = min(hi - core_end, extra - left)
+    left = min(core_start - lo, extra - right)
+    # Başlangıç bir token başına, bitiş bir token sonuna oturur
+    start = offsets[bisect_left(offsets, core_start - left)]
+    end_index = bisect_right(offsets, core_end + right) - 1
+    end = core_end
+    while end_index > last:
+        candidate = word_end(text, offsets[end_index])
+        if candidate <= core_end + right:
+            end = candidate
+            break
+        end_index -= 1
+    return start, end
+
+
+def escape_markdown(text: str) -> str:
+    return _MARKDOWN_RE.sub(r'\\\1', text)
+
+
+def render(text: str, spans: List[Tuple[int, int]], hits: List[Tuple[int, int]]) -> Tuple[str, str]:
+    """(düz alıntı, eşleşmeleri **kalın** gösteren markdown alıntı)"""
+    plain, marked = [], []
+    for start, end in spans:
+        pieces, cursor = [], start
+        for hit_start, hit_end in hits[bisect_left(hits, (start, 0)):]:
+            if hit_end > end:
+                break
+            if hit_start < cursor:
+                continue
+            pieces.append(escape_markdown(text[cursor:hit_start]))
+            pieces.append(f"**{escape_markdown(text[hit_start:hit_end])}**")
+            cursor = hit_end
+        pieces.append(escape_markdown(text[cursor:end]))
+        plain.append(' '.join(text[start:end].split()))
+        marked.append(' '.join(''.join(pieces).split()))
+    prefix = ELLIPSIS if spans[0][0] > 0 else ""
+    suffix = ELLIPSIS if spans[-1][1] < len(text.rstrip()) else ""
+    joiner = f" {ELLIPSIS} "
+    return prefix + joiner.join(plain) + suffix, prefix + joiner.join(marked) + suffix
+
+
+def extract(text: str, tokens: Sequence[str], offsets: Sequence[int], terms: Sequence[str],
+            max_chars: int, context_tokens: int = 12, max_windows: int = 3) -> Optional[Tuple[str, str]]:
+    """Sorgu terimlerinin en yoğun geçtiği bölgelerden bütçeli alıntı: (düz, vurgulu) ya da
+    eşleşme yoksa None. `tokens` normalize gövde token'ları, `offsets` bunların metindeki başlangıçları."""
+    if not text or not terms or len(tokens) != len(offsets):
+        return None
+    positions = match_positions(tokens, terms)
+    if not positions:
+        return None
+
+    weights = term_weights(positions, len(tokens))
+    spans = []
+    budget = max_chars
+    for first, last in best_windows(positions, weights, max_windows):
+        if budget < MIN_FRAGMENT_CHARS and spans:
+            break
+        start, end = fit_span(text, offsets, first, last, context_tokens, budget)
+        spans.append((start, end))
+        budget -= end - start + len(ELLIPSIS) + 2
+
+    # Metindeki sırayla; yakın/çakışan pencereler tek parça olur
+    spans.sort()
+    merged = [spans[0]]
+    for start, end in spans[1:]:
+        if start <= merged[-1][1] + MERGE_GAP:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    # Aralarında sadece boşluk olan eşleşmeler tek vurgu: "**Hacı Bektaş**"
+    hits = []
+    for start, end in sorted({(offsets[i], word_end(text, offsets[i])) for i, _ in positions}):
+        if hits and start >= hits[-1][1] and not text[hits[-1][1]:start].strip():
+            hits[-1] = (hits[-1][0], end)
+        else:
+            hits.append((start, end))
+    return render(text, merged, hits)
+
+
+def lead(text: str, max_chars: int) -> str:
+    """Eşleşme yoksa (ör. sadece başlıkta geçiyorsa) metnin başı, kelime sınırından"""
+    text = ' '.join(text.split())
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(' ', 0, max_chars - 1)
+    return text[:cut if cut > max_chars // 2 else max_chars - 1] + ELLIPSIS
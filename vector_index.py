@@ -0,0 +1,221 @@
+"""
+YolPedia Vektör Arama - Ağsız, yerel TF-IDF (kelime + karakter n-gram) motoru
+Matris diske .npy olarak yazılır ve salt okunur mmap ile açılır; böylece aynı makinedeki
+tüm worker süreçleri işletim sisteminin sayfa önbelleğindeki tek kopyayı paylaşır.
+"""
+
+import json
+import os
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+class VectorIndex:
+    """Özellik -> doküman (CSC) düzeninde, satır normalize TF-IDF matrisi"""
+
+    DIMS = 1 << 18                # Hashing trick: sözlük saklamadan sabit boyut
+    NGRAM_SIZES = (3, 4, 5)       # Türkçe ekler için karakter n-gram'ları ("semahlar" ~ "semah")
+    MAX_FEATURES_PER_DOC = 1500   # Doküman başına en ağırlıklı özellikler tutulur (statik budama)
+    FILES = ('indptr', 'indices', 'data', 'idf', 'doc_ids')
+
+    def __init__(self, indptr, indices, data, idf, doc_ids, meta: Optional[Dict] = None):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.idf = idf
+        self.doc_ids = doc_ids
+        self.meta = meta or {}
+        self._feature_cache: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    # ---------- Özellik çıkarımı ----------
+
+    @classmethod
+    def _hash(cls, feature: str) -> int:
+        # Python hash()'i süreçten sürece değişir; crc32 sabittir
+        return zlib.crc32(feature.encode('utf-8')) & (cls.DIMS - 1)
+
+    @classmethod
+    def word_features(cls, word: str, cache: Dict[str, np.ndarray]) -> np.ndarray:
+        """Kelimenin kendisi + sınır işaretli karakter n-gram'ları"""
+        features = cache.get(word)
+        if features is None:
+            padded = f"<{word}>"
+            ids = [cls._hash(f"w:{word}")]
+            for n in cls.NGRAM_SIZES:
+                ids.extend(cls._hash(padded[i:i + n]) for i in range(len(padded) - n + 1))
+            features = np.array(ids, dtype=np.int64)
+            cache[word] = features
+        return features
+
+    @classmethod
+    def text_features(cls, text: str, cache: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Normalize metin -> (tekil özellik id'leri, alt-doğrusal tf ağırlıkları)"""
+        counts = Counter(text.split())
+        if not counts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        arrays = [cls.word_features(word, cache) for word in counts]
+        features = np.concatenate(arrays)
+        weights = np.repeat(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)),
+                            [len(a) for a in arrays])
+        ids, inverse = np.unique(features, return_inverse=True)
+        tf = np.bincount(inverse, weights=weights)
+        return ids, (1.0 + np.log(tf)).astype(np.float32)
+
+    # ---------- Kurulum ----------
+
+    @classmethod
+    def build(cls, docs: Iterable[Tuple[int, str]], meta: Optional[Dict] = None) -> "VectorIndex":
+        """(içerik id, normalize metin) çiftlerinden indeksi kur"""
+        cache: Dict[str, np.ndarray] = {}
+        doc_ids, rows, cols, tfs = [], [], [], []
+
+        for row, (doc_id, text) in enumerate(docs):
+            ids, tf = cls.text_features(text, cache)
+            doc_ids.append(doc_id)
+            rows.append(np.full(len(ids), row, dtype=np.int32))
+            cols.append(ids)
+            tfs.append(tf)
+
+        n_docs = len(doc_ids)
+        if n_docs == 0:
+            return cls(np.zeros(cls.DIMS + 1, dtype=np.int64), np.empty(0, dtype=np.int32),
+                       np.empty(0, dtype=np.float32), np.zeros(cls.DIMS, dtype=np.float32),
+                       np.empty(0, dtype=np.int64), meta)
+
+        df = np.bincount(np.concatenate(cols), minlength=cls.DIMS)
+        idf = (np.log((n_docs + 1) / (df + 1)) + 1.0).astype(np.float32)
+
+        # Doküman başına TF-IDF, budama ve L2 normalizasyonu
+        for i in range(n_docs):
+            weights = tfs[i] * idf[cols[i]]
+            if len(weights) > cls.MAX_FEATURES_PER_DOC:
+                keep = np.argpartition(-weights, cls.MAX_FEATURES_PER_DOC)[:cls.MAX_FEATURES_PER_DOC]
+                rows[i], cols[i], weights = rows[i][keep], cols[i][keep], weights[keep]
+            norm = np.linalg.norm(weights)
+            tfs[i] = weights / norm if norm > 0 else weights
+
+        rows_all = np.concatenate(rows)
+        cols_all = np.concatenate(cols)
+        data_all = np.concatenate(tfs).astype(np.float32)
+
+        # CSC: özelliğe göre sırala -> her sorgu özelliği için bitişik bir doküman dilimi
+        order = np.argsort(cols_all, kind='stable')
+        indptr = np.zeros(cls.DIMS + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cols_all, minlength=cls.DIMS), out=indptr[1:])
+
+        return cls(indptr, rows_all[order], data_all[order], idf,
+                   np.array(doc_ids, dtype=np.int64), meta)
+
+    # ---------- Disk / mmap ----------
+
+    def save(self, directory: str):
+        """Dizine atomik olarak yaz: önce dosyalar, en son meta.json"""
+        os.makedirs(directory, exist_ok=True)
+        for name in self.FILES:
+            tmp_path = os.path.join(directory, f"{name}.tmp.npy")
+            np.save(tmp_path, getattr(self, name))
+            os.replace(tmp_path, os.path.join(directory, f"{name}.npy"))
+        meta = dict(self.meta, version=FORMAT_VERSION, dims=self.DIMS, docs=len(self))
+        tmp_meta = os.path.join(directory, "meta.json.tmp")
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, os.path.join(directory, "meta.json"))
+
+    @staticmethod
+    def read_meta(directory: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(directory, "meta.json"), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if meta.get('version') != FORMAT_VERSION or meta.get('dims') != VectorIndex.DIMS:
+            return None
+        return meta
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["VectorIndex"]:
+        """Salt okunur mmap ile aç (kopyalama yok, süreçler arasında paylaşılır)"""
+        meta = cls.read_meta(directory)
+        if meta is None:
+            return None
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r') for name in cls.FILES}
+        return cls(meta=meta, **arrays)
+
+    # ---------- Sorgu ----------
+
+    def query_vectors(self, queries: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Sorguları seyrek (sorgu no, özellik, ağırlık) üçlülerine çevir"""
+        q_rows, q_cols, q_vals = [], [], []
+        for q, text in enumerate(queries):
+            ids, tf = self.text_features(text, self._feature_cache)
+            if not len(ids):
+                continue
+            weights = tf * self.idf[ids]
+            norm = np.linalg.norm(weights)
+            q_rows.append(np.full(len(ids), q, dtype=np.int64))
+            q_cols.append(ids)
+            q_vals.append(weights / norm if norm > 0 else weights)
+        # Sorgu önbelleği sınırsız büyümesin
+        if len(self._feature_cache) > 50000:
+            self._feature_cache.clear()
+        if not q_rows:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0, dtype=np.float32)
+        return np.concatenate(q_rows), np.concatenate(q_cols), np.concatenate(q_vals)
+
+    def score_batch(self, queries: Sequence[str]) -> np.ndarray:
+        """Toplu seyrek çarpım: (sorgu sayısı x doküman sayısı) kosinüs skorları"""
+        n_docs = len(self)
+        scores = np.zeros(len(queries) * n_docs, dtype=np.float64)
+        q_rows, q_cols, q_vals = self.query_vectors(queries)
+        if not len(q_cols) or not n_docs:
+            return scores.reshape(len(queries), n_docs)
+
+        starts = self.indptr[q_cols]
+        lengths = self.indptr[q_cols + 1] - starts
+        total = int(lengths.sum())
+        if total:
+            # Her sorgu özelliğinin doküman dilimini tek seferde topla
+            owner = np.repeat(np.arange(len(q_cols)), lengths)
+            offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            positions = np.repeat(starts, lengths) + offsets
+            docs = self.indices[positions]
+            weights = self.data[positions] * q_vals[owner]
+            scores += np.bincount(q_rows[owner] * n_docs + docs, weights=weights,
+                                  minlength=len(queries) * n_docs)
+        return scores.reshape(len(queries), n_docs)
+
+    def search_batch(self, queries: Sequence[str], k: int, min_score: float = 0.0) -> List[List[Tuple[int, float]]]:
+        """Her sorgu için en iyi k (içerik id, skor); argpartition ile tam sıralama yapılmaz.
+        Kosinüsü `min_score` altında kalanlar (n-gram gürültüsü) sonuca girmez."""
+        scores = self.score_batch(queries)
+        results = []
+        for row in scores:
+            k_eff = min(k, len(row))
+            if k_eff == 0:
+                results.append([])
+                continue
+            top = np.argpartition(-row, k_eff - 1)[:k_eff]
+            top = top[np.argsort(-row[top])]
+            results.append([(int(self.doc_ids[i]), float(row[i])) for i in top if row[i] > 0 and row[i] >= min_score])
+        return results
+
+    def search(self, query: str, k: int, min_score: float = 0.0) -> List[Tuple[int, float]]:
+        return self.search_batch([query], k, min_score)[0]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Tuple[Sequence[int], float]], k: int = 60) -> List[Tuple[int, float]]:
+    """Sıralı id listelerini ağırlıklı RRF ile birleştir: skor = Σ w / (k + sıra)"""
+    fused: Dict[int, float] = {}
+    for ids, weight in rankings:
+        for rank, doc_id in enumerate(ids, 1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)